@@ -0,0 +1 @@
+"""Benchmarks y generadores de datos sintéticos del Analytics Microservice."""
@@ -0,0 +1,154 @@
+"""
+Generadores deterministas de datos sintéticos para benchmarks.
+
+Todos los generadores reciben una semilla, de modo que el mismo tamaño
+produce exactamente el mismo dataset en cualquier máquina. Se construyen
+con numpy (vectorizado) y se devuelven como DataFrame; `as_records`
+los convierte a la lista de diccionarios que reciben los engines.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEED = 20240101
+
+BRANCHES = ["Bogota", "Medellin", "Cali", "Barranquilla", "Bucaramanga", "Pereira"]
+DOC_TYPES = ["Factura electronica", "Nota credito", "Nota debito"]
+CATEGORIES = ["Alimentos", "Bebidas", "Aseo", "Ferreteria", "Papeleria", "Tecnologia", "Hogar", "Salud"]
+
+
+def _rng(seed: int) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def _nits(rng: np.random.Generator, n: int, n_customers: int) -> np.ndarray:
+    """NITs colombianos de 9 dígitos, con distribución sesgada (pocos clientes concentran ventas)."""
+    base = 800000000 + np.arange(n_customers) * 137
+    weights = 1.0 / np.arange(1, n_customers + 1)
+    weights /= weights.sum()
+    return rng.choice(base, size=n, p=weights)
+
+
+def _cufes(rng: np.random.Generator, n: int, offset: int = 0) -> np.ndarray:
+    """CUFE sintético: hash hexadecimal de 96 caracteres derivado de un entero único."""
+    ids = np.arange(offset, offset + n, dtype=np.uint64)
+    salt = rng.integers(0, 2**32, dtype=np.uint64)
+    mixed = (ids * np.uint64(0x9E3779B97F4A7C15)) ^ salt
+    hexes = pd.Series(mixed).map("{:016x}".format)
+    return (hexes * 6).to_numpy()
+
+
+def _dates(rng: np.random.Generator, n: int, start: str = "2024-01-01", days: int = 365) -> pd.DatetimeIndex:
+    offsets = rng.integers(0, days, size=n)
+    return pd.Timestamp(start) + pd.to_timedelta(offsets, unit="D")
+
+
+def sap_invoices(n: int, seed: int = DEFAULT_SEED, missing_cufe_pct: float = 0.15) -> pd.DataFrame:
+    """
+    Facturas estilo SAP Business One (OINV).
+    Incluye una fracción de registros con `U_CUFE` vacío, como en producción.
+    """
+    rng = _rng(seed)
+    n_customers = max(10, min(5000, n // 50))
+    nits = _nits(rng, n, n_customers)
+    doc_dates = _dates(rng, n)
+    totals = np.round(rng.lognormal(mean=13.0, sigma=1.2, size=n), 2)
+
+    cufes = _cufes(rng, n)
+    missing = rng.random(n) < missing_cufe_pct
+    cufes = np.where(missing, "", cufes)
+
+    return pd.DataFrame({
+        "DocEntry": np.arange(1, n + 1),
+        "DocNum": np.arange(100000, 100000 + n),
+        "CardCode": pd.Series(nits).map("C{}".format).to_numpy(),
+        "CardName": pd.Series(nits % 100000).map("Cliente {:05d} S.A.S".format).to_numpy(),
+        "FederalTaxID": nits.astype(str),
+        "DocDate": doc_dates.strftime("%Y-%m-%dT00:00:00"),
+        "DocDueDate": (doc_dates + pd.Timedelta(days=30)).strftime("%Y-%m-%dT00:00:00"),
+        "DocTotal": totals,
+        "VatSum": np.round(totals * 0.19 / 1.19, 2),
+        "Branch": rng.choice(BRANCHES, size=n),
+        "U_CUFE": cufes,
+    })
+
+
+def dian_documents(n: int, seed: int = DEFAULT_SEED, overlap_with: int = 0, overlap_pct: float = 0.8) -> pd.DataFrame:
+    """
+    Documentos estilo DIAN (facturación electrónica).
+    Con `overlap_with` > 0 reutiliza los CUFE de `sap_invoices(overlap_with, seed)`
+    para que una fracción `overlap_pct` de los documentos crucen con SAP.
+    """
+    rng = _rng(seed + 1)
+    nits = _nits(rng, n, max(10, min(5000, n // 50)))
+    totals = np.round(rng.lognormal(mean=13.0, sigma=1.2, size=n), 2)
+
+    cufes = _cufes(rng, n, offset=10**12)
+    if overlap_with:
+        sap_cufes = _cufes(_rng_after_sap(seed, overlap_with), overlap_with)
+        n_shared = min(int(n * overlap_pct), overlap_with)
+        cufes[:n_shared] = sap_cufes[:n_shared]
+        # Variamos mayúsculas/espacios para ejercitar la normalización de claves
+        cufes[: n_shared // 10] = np.char.upper(cufes[: n_shared // 10].astype(str))
+
+    return pd.DataFrame({
+        "cufe": cufes,
+        "nit_emisor": nits.astype(str),
+        "nombre_emisor": pd.Series(nits % 100000).map("Proveedor {:05d}".format).to_numpy(),
+        "fecha_emision": _dates(rng, n).strftime("%Y-%m-%d"),
+        "valor_total": totals,
+        "tipo_documento": rng.choice(DOC_TYPES, size=n, p=[0.9, 0.07, 0.03]),
+        "prefijo": rng.choice(["FE", "SETP", "FV"], size=n),
+        "folio": np.arange(1, n + 1),
+    })
+
+
+def _rng_after_sap(seed: int, n: int) -> np.random.Generator:
+    """Reproduce el estado del RNG de `sap_invoices` justo antes de generar sus CUFE."""
+    rng = _rng(seed)
+    n_customers = max(10, min(5000, n // 50))
+    _nits(rng, n, n_customers)
+    _dates(rng, n)
+    rng.lognormal(mean=13.0, sigma=1.2, size=n)
+    return rng
+
+
+def mixed_columns(n: int, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Dataset genérico con columnas numéricas, categóricas y de fecha (con nulos)."""
+    rng = _rng(seed + 2)
+    amount = np.round(rng.normal(loc=50000, scale=15000, size=n), 2)
+    amount[rng.random(n) < 0.02] = np.nan
+
+    return pd.DataFrame({
+        "id": np.arange(n),
+        "categoria": rng.choice(CATEGORIES, size=n),
+        "sucursal": rng.choice(BRANCHES, size=n),
+        "cantidad": rng.integers(1, 100, size=n),
+        "precio": np.round(rng.uniform(1000, 200000, size=n), 2),
+        "monto": amount,
+        "fecha": _dates(rng, n).strftime("%Y-%m-%d"),
+        "activo": rng.random(n) < 0.7,
+    })
+
+
+def daily_series(n_days: int = 365, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """Serie diaria con tendencia, estacionalidad semanal y ruido (para forecast y gráficos de línea)."""
+    rng = _rng(seed + 3)
+    t = np.arange(n_days)
+    values = 1_000_000 + 1500 * t + 120_000 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 50_000, n_days)
+    return pd.DataFrame({
+        "fecha": pd.date_range("2024-01-01", periods=n_days, freq="D").strftime("%Y-%m-%d"),
+        "total": np.round(values, 2),
+    })
+
+
+def as_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convierte a la forma JSON (lista de dicts) que reciben los engines."""
+    return df.to_dict(orient="records")
+
+
+def reconcile_pair(n: int, seed: int = DEFAULT_SEED) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Par SAP/DIAN del mismo tamaño con ~80% de CUFE en común."""
+    return sap_invoices(n, seed), dian_documents(n, seed, overlap_with=n)
@@ -0,0 +1,501 @@
+"""
+Prueba de carga HTTP del Analytics Microservice.
+
+Levanta la app localmente (uvicorn en un subproceso) o apunta a un servidor
+existente (`--url`), y reproduce una mezcla configurable de llamadas a
+`/execute`, `/stats/*`, `/transform/*`, `/visuals/*` y reconciliación con
+payloads sintéticos (`benchmarks/generators.py`) del tamaño pedido, con
+`--concurrency` clientes concurrentes.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.load_test                                    # mezcla por defecto, 1k filas, 30 s
+    python -m benchmarks.load_test --rows 100k --concurrency 16 --duration 60
+    python -m benchmarks.load_test --mix stats.mean=3,reconcile=1 --server-workers 4
+    python -m benchmarks.load_test --env ANALYTICS_COMPUTE_SLOTS=8 --label slots8 --output slots8.json
+    python -m benchmarks.load_test --compare slots4.json slots8.json  # tabla lado a lado
+
+Reporta, por escenario y en total: throughput, latencia p50/p95/p99/máx,
+tasa de error (HTTP >= 400 o fallo de conexión; los 429 por saturación se
+cuentan aparte) y el RSS del servidor en el tiempo (suma del proceso y sus
+workers; con `--url` se usa el RSS que informa `/compute/status`).
+
+Los clientes son hilos con conexiones keep-alive (`http.client`) y los
+cuerpos se serializan una sola vez antes de empezar: el generador de carga no
+compite por CPU con el servidor más de lo necesario. En máquinas pequeñas
+conviene igual correr el servidor en otra máquina (`--url`).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# --- FIX DE RUTAS (mismo criterio que src/main.py) ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+for path in (project_root, src_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+
+from benchmarks import generators as gen
+from benchmarks.run_benchmarks import CHART_POINTS, parse_size, size_label
+from utils.serialization import dumps
+
+DEFAULT_PORT = 8765
+DEFAULT_MIX = (
+    "execute.mean=2,execute.aggregate=2,stats.mean=2,stats.median=1,transform.aggregate=2,"
+    "transform.filter=1,transform.top_n=1,visuals.bar=1,reconcile=1"
+)
+STARTUP_TIMEOUT = 60
+PERCENTILES = (50, 95, 99)
+
+
+# ==========================================
+# 1. ESCENARIOS (payloads sintéticos)
+# ==========================================
+
+Request = Tuple[str, bytes]
+
+
+def build_scenarios(n: int, seed: int) -> Dict[str, Request]:
+    """Escenario -> (ruta, cuerpo JSON ya serializado)."""
+    sap_df, dian_df = gen.reconcile_pair(n, seed)
+    mixed_df = gen.mixed_columns(n, seed)
+    mixed = gen.as_records(mixed_df)
+    sap = gen.as_records(sap_df)
+    # Los gráficos reciben datos ya agregados, como en producción
+    chart_points = gen.as_records(
+        mixed_df.groupby("categoria", as_index=False)["monto"].sum().head(CHART_POINTS)
+    )
+
+    def execute(tool: str, payload: Dict[str, Any]) -> Request:
+        return "/execute", dumps({"tool_name": tool, "payload": payload})
+
+    return {
+        "execute.mean": execute("analytics_stat_mean", {"data": mixed, "column": "monto"}),
+        "execute.aggregate": execute("analytics_transform_aggregate", {
+            "data": sap, "group_by": "CardName", "target_column": "DocTotal", "operation": "sum"}),
+        "stats.mean": ("/stats/mean", dumps({"data": mixed, "column": "monto"})),
+        "stats.median": ("/stats/median", dumps({"data": mixed, "column": "monto"})),
+        "stats.mode": ("/stats/mode", dumps({"data": mixed, "column": "categoria"})),
+        "transform.aggregate": ("/transform/aggregate", dumps({
+            "data": mixed, "group_by": "categoria", "target_column": "monto", "operation": "mean"})),
+        "transform.filter": ("/transform/filter", dumps({
+            "data": mixed, "column": "monto", "operator": ">", "value": 80000})),
+        "transform.top_n": ("/transform/top_n", dumps({"data": sap, "column": "DocTotal", "n": 10})),
+        "visuals.bar": ("/visuals/bar", dumps({"data": chart_points, "x_col": "categoria", "y_col": "monto"})),
+        "visuals.line": ("/visuals/line", dumps({
+            "data": gen.as_records(gen.daily_series(CHART_POINTS * 4, seed)), "x_col": "fecha", "y_col": "total"})),
+        "reconcile": execute("analytics_reconcile_datasets", {
+            "data_a": sap, "data_b": gen.as_records(dian_df),
+            "key_column_a": "U_CUFE", "key_column_b": "cufe", "mode": "missing_in_a"}),
+    }
+
+
+def parse_mix(spec: str, available: Dict[str, Request]) -> List[Tuple[str, float]]:
+    """'stats.mean=3,reconcile=1' -> [(escenario, peso)]; sin '=' el peso es 1."""
+    mix = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.strip().partition("=")
+        if name not in available:
+            raise ValueError(f"Escenario '{name}' no existe. Disponibles: {', '.join(sorted(available))}.")
+        mix.append((name, float(weight) if weight else 1.0))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError("La mezcla no tiene escenarios con peso positivo.")
+    return mix
+
+
+# ==========================================
+# 2. SERVIDOR LOCAL Y RSS
+# ==========================================
+
+class LocalServer:
+    """uvicorn en un subproceso con las variables de entorno de la configuración a medir."""
+
+    def __init__(self, port: int, workers: int, env: Dict[str, str]):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app", "--app-dir", src_dir,
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ]
+        if workers > 1:
+            command += ["--workers", str(workers)]
+        # stderr a un archivo: un pipe sin leer bloquearía al servidor al llenarse
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            command, env={**os.environ, "ANALYTICS_WORKERS": str(workers), **env},
+            stdout=subprocess.DEVNULL, stderr=self.log,
+        )
+
+    def wait_ready(self) -> None:
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                raise RuntimeError(f"El servidor terminó al arrancar:\n{self.log.read().decode(errors='replace')}")
+            try:
+                status, _ = request_once(self.url, "GET", "/health", None)
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"El servidor no respondió /health en {STARTUP_TIMEOUT}s.")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def _process_tree_rss(root_pid: int) -> int:
+    """RSS (bytes) del proceso y todos sus descendientes, leído de /proc."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    page = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                fields = fh.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        pid = int(entry)
+        # Tras el nombre: estado, ppid, ...; rss (páginas) es el campo 24 del stat
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * page
+    total, pending = 0, [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class RSSSampler(threading.Thread):
+    """Muestrea el RSS del servidor cada `interval` segundos: [(segundos, bytes)]."""
+
+    def __init__(self, url: str, pid: Optional[int], interval: float):
+        super().__init__(daemon=True)
+        self.url = url
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._halt = threading.Event()
+        self._origin = time.perf_counter()
+
+    def read(self) -> Optional[int]:
+        if self.pid is not None and os.path.isdir("/proc"):
+            return _process_tree_rss(self.pid)
+        try:
+            status, body = request_once(self.url, "GET", "/compute/status", None)
+            return int(json.loads(body)["memory"]["rss_bytes"]) if status == 200 else None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def run(self) -> None:
+        while not self._halt.is_set():
+            value = self.read()
+            if value:
+                self.samples.append((round(time.perf_counter() - self._origin, 2), value))
+            self._halt.wait(self.interval)
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+
+# ==========================================
+# 3. GENERACIÓN DE CARGA
+# ==========================================
+
+def request_once(url: str, method: str, path: str, body: Optional[bytes]) -> Tuple[int, bytes]:
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+class Client:
+    """Un cliente con su conexión keep-alive; se reconecta si el servidor la cierra."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def post(self, path: str, body: bytes) -> int:
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = self.connection.getresponse()
+                response.read()
+                return response.status
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Conexión keep-alive cerrada por el servidor: un reintento con conexión nueva
+                self.close()
+                if attempt:
+                    raise
+        return 0
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+Sample = Tuple[str, float, float, int]  # (escenario, inicio relativo, latencia s, status; 0 = fallo)
+
+
+def run_load(url: str, scenarios: Dict[str, Request], mix: List[Tuple[str, float]], concurrency: int,
+             duration: float, max_requests: Optional[int], timeout: float, seed: int) -> Tuple[List[Sample], float]:
+    names = [name for name, _ in mix]
+    weights = np.array([w for _, w in mix], dtype="float64")
+    weights /= weights.sum()
+    lock = threading.Lock()
+    issued = [0]
+    samples: List[Sample] = []
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def worker(index: int) -> None:
+        rng = np.random.default_rng(seed + index)
+        client = Client(url, timeout)
+        local: List[Sample] = []
+        try:
+            while time.perf_counter() < deadline:
+                with lock:
+                    if max_requests is not None and issued[0] >= max_requests:
+                        break
+                    issued[0] += 1
+                name = names[rng.choice(len(names), p=weights)]
+                path, body = scenarios[name]
+                begin = time.perf_counter()
+                try:
+                    status = client.post(path, body)
+                except OSError:
+                    status = 0
+                    client.close()
+                local.append((name, begin - started, time.perf_counter() - begin, status))
+        finally:
+            client.close()
+            with lock:
+                samples.extend(local)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+# ==========================================
+# 4. REPORTE
+# ==========================================
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    latencies = np.array([s[2] for s in samples], dtype="float64") * 1000
+    statuses = np.array([s[3] for s in samples], dtype=np.int64)
+    rejected = int((statuses == 429).sum())
+    errors = int(((statuses == 0) | ((statuses >= 400) & (statuses != 429))).sum())
+    ok = statuses[(statuses > 0) & (statuses < 400)].size
+    summary: Dict[str, Any] = {
+        "requests": len(samples),
+        "ok": int(ok),
+        "errors": errors,
+        "rejected_429": rejected,
+        "error_rate": round((errors + rejected) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if samples:
+        for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+            summary[f"p{p}_ms"] = round(float(value), 2)
+        summary["max_ms"] = round(float(latencies.max()), 2)
+    return summary
+
+
+def timeline(samples: List[Sample], rss: List[Tuple[float, int]], elapsed: float, step: float) -> List[Dict[str, Any]]:
+    """Throughput, p95 y RSS por ventana de `step` segundos."""
+    buckets = int(np.ceil(elapsed / step)) if elapsed > 0 else 0
+    rows = []
+    for b in range(buckets):
+        low, high = b * step, (b + 1) * step
+        window = [s for s in samples if low <= s[1] + s[2] < high]
+        in_window = [value for t, value in rss if low <= t < high]
+        rows.append({
+            "t": round(high, 2),
+            "rps": round(len(window) / step, 2),
+            "p95_ms": round(float(np.percentile([s[2] for s in window], 95)) * 1000, 2) if window else None,
+            "rss_mib": round(max(in_window) / 2**20, 1) if in_window else None,
+        })
+    return rows
+
+
+def build_report(label: str, config: Dict[str, Any], samples: List[Sample], elapsed: float,
+                 rss: List[Tuple[float, int]], step: float) -> Dict[str, Any]:
+    by_scenario: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_scenario.setdefault(sample[0], []).append(sample)
+    rss_values = [value for _, value in rss]
+    return {
+        "label": label,
+        "config": config,
+        "elapsed_s": round(elapsed, 2),
+        "total": summarize(samples, elapsed),
+        "scenarios": {name: summarize(group, elapsed) for name, group in sorted(by_scenario.items())},
+        "rss": {
+            "start_mib": round(rss_values[0] / 2**20, 1) if rss_values else None,
+            "peak_mib": round(max(rss_values) / 2**20, 1) if rss_values else None,
+            "end_mib": round(rss_values[-1] / 2**20, 1) if rss_values else None,
+            "median_mib": round(statistics.median(rss_values) / 2**20, 1) if rss_values else None,
+        },
+        "timeline": timeline(samples, rss, elapsed, step),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['label']} — {report['elapsed_s']} s")
+    header = f"   {'escenario':<22} {'req':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9} {'err':>6} {'429':>6}"
+    print(header)
+    rows = list(report["scenarios"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        print(
+            f"   {name:<22} {s['requests']:>7} {s['throughput_rps']:>8.2f} {s.get('p50_ms', 0):>9.1f} "
+            f"{s.get('p95_ms', 0):>9.1f} {s.get('p99_ms', 0):>9.1f} {s.get('max_ms', 0):>9.1f} {s['errors']:>6} {s['rejected_429']:>6}"
+        )
+    rss = report["rss"]
+    if rss["peak_mib"] is not None:
+        print(f"   RSS servidor: inicio {rss['start_mib']} MiB, pico {rss['peak_mib']} MiB, final {rss['end_mib']} MiB")
+    print(f"\n   {'t (s)':>7} {'req/s':>8} {'p95 ms':>9} {'RSS MiB':>9}")
+    for row in report["timeline"]:
+        p95 = f"{row['p95_ms']:.1f}" if row["p95_ms"] is not None else "-"
+        rss_mib = f"{row['rss_mib']:.1f}" if row["rss_mib"] is not None else "-"
+        print(f"   {row['t']:>7} {row['rps']:>8.2f} {p95:>9} {rss_mib:>9}")
+
+
+def print_comparison(reports: List[Dict[str, Any]]) -> None:
+    """Tabla lado a lado (una columna por reporte) de las métricas principales."""
+    labels = [r["label"] for r in reports]
+    width = max(14, *(len(label) + 2 for label in labels))
+    print(f"\n📊 Comparación: {' vs '.join(labels)}")
+    print(f"   {'métrica':<36}" + "".join(f"{label:>{width}}" for label in labels))
+    names = sorted({name for r in reports for name in r["scenarios"]}) + ["TOTAL"]
+    for name in names:
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"):
+            values = []
+            for r in reports:
+                s = r["total"] if name == "TOTAL" else r["scenarios"].get(name, {})
+                value = s.get(metric)
+                values.append("-" if value is None else f"{value:.4f}" if metric == "error_rate" else f"{value:.1f}")
+            print(f"   {name + ' ' + metric:<36}" + "".join(f"{v:>{width}}" for v in values))
+    for metric in ("peak_mib", "median_mib"):
+        values = [r["rss"].get(metric) for r in reports]
+        print(f"   {'rss ' + metric:<36}" + "".join(f"{'-' if v is None else v:>{width}}" for v in values))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP con percentiles de latencia y RSS del servidor.")
+    parser.add_argument("--url", default=None, help="Servidor existente (sin esto se levanta uno local).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto del servidor local.")
+    parser.add_argument("--server-workers", type=int, default=1, help="Procesos uvicorn del servidor local (ANALYTICS_WORKERS).")
+    parser.add_argument("--env", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Variable de entorno del servidor local (repetible), ej: ANALYTICS_COMPUTE_SLOTS=8.")
+    parser.add_argument("--rows", default="1k", help="Filas de cada payload (1k, 100k, 1m).")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Escenarios y pesos: 'stats.mean=3,reconcile=1'.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes concurrentes.")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga.")
+    parser.add_argument("--requests", type=int, default=None, help="Máximo de requests (corta antes que --duration).")
+    parser.add_argument("--warmup", type=int, default=1, help="Requests de calentamiento por escenario (no se miden).")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout por request en segundos.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre muestras de RSS y ventana del timeline.")
+    parser.add_argument("--seed", type=int, default=gen.DEFAULT_SEED)
+    parser.add_argument("--label", default=None, help="Nombre de esta corrida en el reporte y la comparación.")
+    parser.add_argument("--output", default=None, help="Escribe el reporte en este JSON.")
+    parser.add_argument("--compare", nargs="+", default=None, metavar="REPORTE",
+                        help="Solo compara reportes JSON guardados con --output (no genera carga).")
+    parser.add_argument("--list", action="store_true", help="Lista los escenarios disponibles.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as fh:
+                reports.append(json.load(fh))
+        print_comparison(reports)
+        return 0
+
+    rows = parse_size(args.rows)
+    print(f"📦 Generando payloads de {size_label(rows)} filas...")
+    scenarios = build_scenarios(rows, args.seed)
+    if args.list:
+        for name, (path, body) in scenarios.items():
+            print(f"   {name:<22} POST {path:<22} {len(body) / 2**20:8.2f} MiB")
+        return 0
+    mix = parse_mix(args.mix, scenarios)
+    env = dict(item.split("=", 1) for item in args.env)
+
+    server = None
+    url = args.url
+    if url is None:
+        print(f"🚀 Levantando servidor local en el puerto {args.port} ({args.server_workers} worker(s))...")
+        server = LocalServer(args.port, args.server_workers, env)
+        url = server.url
+    try:
+        if server is not None:
+            server.wait_ready()
+        warm = Client(url, args.timeout)
+        for name, _ in mix:
+            for _ in range(args.warmup):
+                status = warm.post(*scenarios[name])
+                if status >= 400:
+                    print(f"   ⚠️ {name}: el calentamiento respondió HTTP {status}")
+        warm.close()
+
+        sampler = RSSSampler(url, server.process.pid if server else None, args.interval)
+        sampler.start()
+        print(f"🔥 Carga: {args.concurrency} clientes, {args.duration:g} s, mezcla {', '.join(f'{n}={w:g}' for n, w in mix)}")
+        samples, elapsed = run_load(url, scenarios, mix, args.concurrency, args.duration, args.requests, args.timeout, args.seed)
+        sampler.stop()
+    finally:
+        if server is not None:
+            server.stop()
+
+    label = args.label or f"{size_label(rows)}x{args.concurrency}"
+    config = {
+        "url": args.url, "server_workers": args.server_workers if server else None, "env": env,
+        "rows": rows, "mix": dict(mix), "concurrency": args.concurrency, "duration_s": args.duration,
+    }
+    report = build_report(label, config, samples, elapsed, sampler.samples, args.interval)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\n💾 Reporte guardado en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Escalamiento de la ejecución particionada (engines.parallel) de 1 a N núcleos.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.parallel_scaling                         # 5m filas, 1..N núcleos
+    python -m benchmarks.parallel_scaling --rows 20m --workers 1,2,4,8,16
+
+Con 1 núcleo se mide el engine normal (pandas, un solo proceso); con más, la
+ejecución particionada con ese número de procesos. Se reporta el mejor tiempo
+de `--repeat` corridas y el speedup contra 1 núcleo. El umbral
+ANALYTICS_PARALLEL_MIN_ROWS se ignora (se fuerza la partición).
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# --- FIX DE RUTAS (mismo criterio que src/main.py) ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+for path in (project_root, src_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks import generators as gen
+from benchmarks.run_benchmarks import parse_size, size_label
+from engines.descriptive.central import get_smart_mean, get_smart_median, get_smart_mode
+from engines.parallel import partitioned
+from engines.transform.grouping import group_and_aggregate
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def default_workers() -> str:
+    cores = os.cpu_count() or 1
+    steps = [1]
+    while steps[-1] * 2 <= cores:
+        steps.append(steps[-1] * 2)
+    if steps[-1] != cores:
+        steps.append(cores)
+    return ",".join(str(s) for s in steps)
+
+
+def build_cases(n: int, seed: int) -> List[Case]:
+    # DataFrames ya construidos: se mide el cálculo, no la conversión del payload
+    sap, _ = gen.reconcile_pair(n, seed)
+    mixed = gen.mixed_columns(n, seed)
+    return [
+        ("transform.aggregate_sum", lambda: group_and_aggregate(sap, "CardName", "DocTotal", "sum")),
+        ("transform.aggregate_mean", lambda: group_and_aggregate(mixed, "categoria", "monto", "mean")),
+        ("stats.mean", lambda: get_smart_mean(mixed, "monto")),
+        ("stats.median", lambda: get_smart_median(mixed, "monto")),
+        ("stats.mode", lambda: get_smart_mode(mixed, "categoria")),
+    ]
+
+
+def best_time(fn: Callable[[], Any], repeat: int) -> float:
+    fn()  # calentamiento (arranque de procesos, caché de parseo)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(n: int, workers: List[int], repeat: int, seed: int, only: Optional[str]) -> Dict[str, Dict[int, float]]:
+    cases = [(name, fn) for name, fn in build_cases(n, seed) if not only or only in name]
+    # Pool del tamaño máximo; cada corrida usa tantas particiones (procesos) como núcleos
+    partitioned.PARALLEL_WORKERS = max(workers)
+    partitioned.PARALLEL_MIN_ROWS = 0
+    partitioned._get_pool()
+
+    results: Dict[str, Dict[int, float]] = {name: {} for name, _ in cases}
+    for count in workers:
+        partitioned.PARALLEL_WORKERS = count
+        for name, fn in cases:
+            results[name][count] = best_time(fn, repeat)
+    return results
+
+
+def print_table(n: int, results: Dict[str, Dict[int, float]], workers: List[int]) -> None:
+    header = f"{'caso':<28}" + "".join(f"{f'{w} núcleo(s)':>22}" for w in workers)
+    print(f"\n=== {size_label(n)} filas ===")
+    print(header)
+    print("-" * len(header))
+    for name, timings in results.items():
+        base = timings[workers[0]]
+        cells = "".join(f"{f'{timings[w] * 1000:.0f} ms (x{base / timings[w]:.2f})':>22}" for w in workers)
+        print(f"{name:<28}{cells}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Escalamiento de la ejecución particionada")
+    parser.add_argument("--rows", default="5m", help="Filas del dataset (ej: 5m, 20m)")
+    parser.add_argument("--workers", default=default_workers(), help="Núcleos a medir (ej: 1,2,4,8)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", default=None, help="Solo casos cuyo nombre contenga este texto")
+    args = parser.parse_args(argv)
+
+    n = parse_size(args.rows)
+    workers = sorted({max(1, int(w)) for w in args.workers.split(",")})
+    if workers[0] != 1:
+        workers.insert(0, 1)
+    print(f"Núcleos disponibles: {os.cpu_count()} | start method: {partitioned.START_METHOD}")
+    print_table(n, run(n, workers, args.repeat, args.seed, args.only), workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
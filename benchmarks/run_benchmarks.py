@@ -0,0 +1,289 @@
+"""
+Micro-benchmarks de los engines del Analytics Microservice.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.run_benchmarks                       # 1k y 100k filas
+    python -m benchmarks.run_benchmarks --sizes 1k,1m,10m     # tamaños explícitos
+    python -m benchmarks.run_benchmarks --save-baseline       # guarda la línea base
+    python -m benchmarks.run_benchmarks --compare             # compara contra la línea base
+
+Cada caso se mide en dos fases: tiempo (mejor y mediana de `--repeat` corridas,
+sin instrumentación) y memoria pico (una corrida adicional bajo `tracemalloc`,
+que también rastrea las asignaciones de numpy/pandas). Con `--compare` el
+proceso termina con código 1 si algún caso supera la línea base por más de
+`--threshold` (fracción, 0.25 = 25%).
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# --- FIX DE RUTAS (mismo criterio que src/main.py) ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+for path in (project_root, src_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pandas as pd
+
+from benchmarks import generators as gen
+from engines.descriptive.central import get_smart_mean, get_smart_median, get_smart_mode
+from engines.transform.grouping import group_and_aggregate
+from engines.transform.filtering import apply_filter
+from engines.transform.top_n_records import get_top_n_records
+from engines.predictive.regression import analytics_linear_forecast
+from engines.reconcile import reconcile_datasets
+from engines.visualizers.charts.bar import generate_bar_chart
+from engines.visualizers.charts.line import generate_line_chart
+from engines.visualizers.charts.pie import generate_pie_chart
+from utils.parsing import parse_numeric, parse_dates
+from utils.serialization import dumps, frame_to_records, frame_to_columnar
+
+DEFAULT_BASELINE = os.path.join(current_dir, "baseline.json")
+DEFAULT_SIZES = "1k,100k"
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+# Los gráficos no escalan con el tamaño del dataset (nadie grafica 1M de barras):
+# se alimentan con datos ya agregados, igual que en producción.
+CHART_POINTS = 30
+
+
+def parse_size(label: str) -> int:
+    label = label.strip().lower()
+    if label[-1] in SIZE_SUFFIXES:
+        return int(float(label[:-1]) * SIZE_SUFFIXES[label[-1]])
+    return int(label)
+
+
+def size_label(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}m"
+    if n >= 1_000 and n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+# ==========================================
+# 1. CASOS
+# ==========================================
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def build_cases(n: int, seed: int) -> List[Case]:
+    """Genera los datasets de un tamaño y devuelve los casos (nombre, callable) a medir."""
+    sap_df, dian_df = gen.reconcile_pair(n, seed)
+    mixed_df = gen.mixed_columns(n, seed)
+
+    sap = gen.as_records(sap_df)
+    dian = gen.as_records(dian_df)
+    mixed = gen.as_records(mixed_df)
+    del sap_df, dian_df
+
+    series = gen.as_records(gen.daily_series(365, seed))
+    chart_points = gen.as_records(
+        mixed_df.groupby("categoria", as_index=False)["monto"].sum().head(CHART_POINTS)
+    )
+    line_points = series[:CHART_POINTS * 4]
+
+    # Montos y fechas como texto, tal como llegan de exportes SAP/Excel
+    montos_co = mixed_df["monto"].map(lambda v: f"${v:,.2f}".replace(",", "_").replace(".", ",").replace("_", "."))
+    fechas_sap = pd.Series(pd.date_range("2024-01-01", periods=n, freq="min").strftime("%d.%m.%Y"))
+
+    return [
+        # Ida y vuelta dict -> DataFrame -> dict (costo fijo de todos los engines)
+        ("roundtrip.dict_frame_dict", lambda: pd.DataFrame(mixed).to_dict(orient="records")),
+        ("roundtrip.dict_frame", lambda: pd.DataFrame(mixed)),
+        ("roundtrip.dict_frame_records_fast", lambda: frame_to_records(pd.DataFrame(mixed))),
+
+        # Serialización de la respuesta (registros vs columnar)
+        ("serialize.records_json", lambda: dumps(frame_to_records(mixed_df))),
+        ("serialize.columnar_json", lambda: dumps(frame_to_columnar(mixed_df))),
+
+        # Parseo de texto (vectorizado, sin caché)
+        ("parse.currency_co", lambda: parse_numeric(montos_co)),
+        ("parse.dates_sap", lambda: parse_dates(fechas_sap)),
+
+        # Descriptivos
+        ("stats.mean", lambda: get_smart_mean(mixed, "monto")),
+        ("stats.median", lambda: get_smart_median(mixed, "monto")),
+        ("stats.mode", lambda: get_smart_mode(mixed, "categoria")),
+        ("stats.mode_high_cardinality", lambda: get_smart_mode(sap, "U_CUFE")),
+
+        # Transformación
+        ("transform.aggregate_sum", lambda: group_and_aggregate(sap, "CardName", "DocTotal", "sum")),
+        ("transform.aggregate_mean", lambda: group_and_aggregate(mixed, "categoria", "monto", "mean")),
+        ("transform.filter_numeric", lambda: apply_filter(mixed, "monto", ">", 50000)),
+        ("transform.filter_text", lambda: apply_filter(mixed, "sucursal", "==", "Bogota")),
+        ("transform.top_n_10", lambda: get_top_n_records(sap, "DocTotal", 10, False)),
+        ("transform.top_n_10pct", lambda: get_top_n_records(sap, "DocTotal", max(1, n // 10), False)),
+
+        # Predictivo
+        ("predict.linear_forecast", lambda: analytics_linear_forecast(series, "fecha", "total", 7)),
+
+        # Reconciliación SAP vs DIAN
+        ("reconcile.missing_in_a", lambda: reconcile_datasets(sap, dian, "U_CUFE", "cufe", mode="missing_in_a")),
+        ("reconcile.missing_in_b", lambda: reconcile_datasets(sap, dian, "U_CUFE", "cufe", mode="missing_in_b")),
+        ("reconcile.intersection", lambda: reconcile_datasets(sap, dian, "U_CUFE", "cufe", mode="intersection")),
+
+        # Visualización (datos pre-agregados, tamaño fijo)
+        ("charts.bar", lambda: generate_bar_chart(chart_points, "categoria", "monto", "Bench")),
+        ("charts.line", lambda: generate_line_chart(line_points, "fecha", "total", "Bench")),
+        ("charts.pie", lambda: generate_pie_chart(chart_points, "categoria", "monto", "Bench")),
+    ]
+
+
+# ==========================================
+# 2. MEDICIÓN
+# ==========================================
+
+def time_case(fn: Callable[[], Any], repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "best_s": min(samples),
+        "median_s": statistics.median(samples),
+    }
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    """Memoria pico (bytes) asignada durante una ejecución, medida con tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(sizes: List[int], repeat: int, warmup: int, seed: int, only: Optional[str], measure_memory: bool) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for n in sizes:
+        label = size_label(n)
+        print(f"\n📦 Generando datasets de {label} filas...")
+        cases = build_cases(n, seed)
+        for name, fn in cases:
+            if only and only not in name:
+                continue
+            # Los casos caros a 1M+ filas se corren una sola vez
+            case_repeat = repeat if n < 1_000_000 else 1
+            case_warmup = warmup if n < 1_000_000 else 0
+            timing = time_case(fn, case_repeat, case_warmup)
+            entry: Dict[str, Any] = {"rows": n, **timing}
+            if measure_memory:
+                entry["peak_bytes"] = peak_memory(fn)
+            key = f"{name}@{label}"
+            results[key] = entry
+            mem = f"{entry['peak_bytes'] / 2**20:9.1f} MiB" if measure_memory else ""
+            print(f"   {key:<42} best {timing['best_s'] * 1000:10.2f} ms   median {timing['median_s'] * 1000:10.2f} ms {mem}")
+        del cases
+        gc.collect()
+    return results
+
+
+# ==========================================
+# 3. LÍNEA BASE
+# ==========================================
+
+def environment_info() -> Dict[str, str]:
+    import numpy as np
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]]) -> None:
+    existing: Dict[str, Any] = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            existing = json.load(fh).get("results", {})
+    existing.update(results)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"environment": environment_info(), "results": existing}, fh, indent=2, sort_keys=True)
+    print(f"\n💾 Línea base guardada en {path} ({len(results)} casos).")
+
+
+def compare(path: str, results: Dict[str, Dict[str, Any]], threshold: float) -> List[str]:
+    """Devuelve la lista de regresiones (tiempo o memoria) por encima del umbral."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe la línea base '{path}'. Corre primero con --save-baseline.")
+    with open(path, encoding="utf-8") as fh:
+        baseline = json.load(fh).get("results", {})
+
+    regressions = []
+    print(f"\n📊 Comparación contra {path} (umbral {threshold:.0%}):")
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"   {key:<42} (sin línea base)")
+            continue
+        checks = [("tiempo", "best_s")]
+        if "peak_bytes" in current and "peak_bytes" in base:
+            checks.append(("memoria", "peak_bytes"))
+        for label, metric in checks:
+            if not base[metric]:
+                continue
+            ratio = current[metric] / base[metric]
+            flag = "❌" if ratio > 1 + threshold else "✅"
+            print(f"   {flag} {key:<40} {label:<8} x{ratio:5.2f}")
+            if ratio > 1 + threshold:
+                regressions.append(f"{key} ({label} x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los engines de analytics.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Tamaños separados por coma: 1k,100k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=5, help="Corridas medidas por caso (<1M filas).")
+    parser.add_argument("--warmup", type=int, default=1, help="Corridas de calentamiento por caso (<1M filas).")
+    parser.add_argument("--seed", type=int, default=gen.DEFAULT_SEED)
+    parser.add_argument("--only", default=None, help="Filtra casos cuyo nombre contenga este texto.")
+    parser.add_argument("--no-memory", action="store_true", help="Omite la medición de memoria pico.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Ruta del JSON de línea base.")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda/actualiza la línea base con estos resultados.")
+    parser.add_argument("--compare", action="store_true", help="Compara contra la línea base y falla si hay regresión.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Regresión tolerada (0.25 = 25%%).")
+    parser.add_argument("--output", default=None, help="Escribe los resultados crudos en este JSON.")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.repeat, args.warmup, args.seed, args.only, not args.no_memory)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"environment": environment_info(), "results": results}, fh, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+
+    if args.compare:
+        regressions = compare(args.baseline, results, args.threshold)
+        if regressions:
+            print(f"\n💀 {len(regressions)} regresiones: " + ", ".join(regressions))
+            return 1
+        print("\n✅ Sin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
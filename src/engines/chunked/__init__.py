@@ -0,0 +1,5 @@
+"""Ejecución por bloques (out-of-core) sobre archivos locales."""
+
+from .file_engine import file_filter, file_group_and_aggregate, file_reconcile, file_statistic
+
+__all__ = ['file_filter', 'file_group_and_aggregate', 'file_reconcile', 'file_statistic']
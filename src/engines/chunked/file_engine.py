@@ -0,0 +1,539 @@
+"""
+Ejecución por bloques (out-of-core) sobre archivos Parquet/CSV locales.
+
+Para entradas que no caben en memoria (ej: un año de documentos DIAN) las
+estadísticas, filtros, agrupaciones y reconciliaciones se calculan leyendo el
+archivo en bloques de `ANALYTICS_CHUNK_ROWS` filas y combinando parciales
+(`engines.chunked.partials`). La memoria queda acotada por el bloque y por el
+tamaño del resultado, no por el archivo.
+
+- Solo se leen archivos bajo `ANALYTICS_DATA_ROOT` (si no está definido, la
+  lectura de archivos está deshabilitada). Un directorio se lee como la
+  secuencia de sus archivos Parquet (en orden de nombre).
+- Parquet: se leen solo las columnas necesarias y, en los filtros, se saltan
+  los row groups que por sus estadísticas (mín/máx) no pueden tener filas
+  que cumplan la condición.
+- CSV: las columnas de agrupación y las claves se leen como texto (el tipo
+  inferido por bloque podría cambiar entre bloques).
+- Los resultados coinciden con los engines en memoria (`engines.descriptive`,
+  `engines.transform`, `engines.reconcile`). Filtros y reconciliaciones con
+  más de `ANALYTICS_CHUNKED_MAX_RESULT_ROWS` filas deben escribirse a un
+  archivo (`output_path`, Parquet bajo el mismo directorio raíz).
+"""
+
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from engines.chunked.partials import GroupPartial, Moments, RankSelector, ValueCounts, quantile_ranks
+from engines.chunked.sketches import ColumnSketch
+from engines.reconcile.reconcile_engine import VALID_MODES, build_key_series, build_summary
+from engines.transform.filtering import filter_frame
+from utils.instrumentation import stage
+from utils.jobs import report_progress
+from utils.memory_budget import frame_bytes, track_allocation
+from utils.parsing import infer_column_type, parse_numeric
+from utils.serialization import OUTPUT_SHAPES, shape_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = pq = None
+
+DATA_ROOT = os.getenv("ANALYTICS_DATA_ROOT")
+CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "250000"))
+MAX_RESULT_ROWS = int(os.getenv("ANALYTICS_CHUNKED_MAX_RESULT_ROWS", "100000"))
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+CSV_EXTENSIONS = (".csv", ".csv.gz", ".txt")
+FILTER_OPERATORS = (">", "<", "==", "!=", ">=", "<=")
+
+RowFilter = Tuple[str, str, Any]
+
+
+# ==========================================
+# 1. RUTAS Y FUENTES
+# ==========================================
+def resolve_path(path: str, must_exist: bool = True) -> str:
+    """Ruta absoluta dentro de ANALYTICS_DATA_ROOT (rechaza '..' y enlaces que salgan de él)."""
+    if not DATA_ROOT:
+        raise ValueError("La lectura de archivos está deshabilitada: define ANALYTICS_DATA_ROOT.")
+    root = os.path.realpath(DATA_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"La ruta '{path}' está fuera del directorio de datos permitido.")
+    if must_exist and not os.path.exists(full):
+        raise ValueError(f"El archivo '{path}' no existe.")
+    return full
+
+
+def _detect_format(full_path: str) -> str:
+    lowered = full_path.lower()
+    if os.path.isdir(full_path) or lowered.endswith(PARQUET_EXTENSIONS):
+        return "parquet"
+    if lowered.endswith(CSV_EXTENSIONS):
+        return "csv"
+    raise ValueError("Formato no soportado. Usa Parquet (.parquet, directorio) o CSV (.csv).")
+
+
+def _sniff_separator(full_path: str) -> str:
+    opener = open
+    if full_path.lower().endswith(".gz"):
+        import gzip
+        opener = gzip.open
+    with opener(full_path, "rt", encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    return ";" if header.count(";") > header.count(",") else ","
+
+
+def _parquet_files(full_path: str) -> List[str]:
+    if not os.path.isdir(full_path):
+        return [full_path]
+    files = []
+    for directory, subdirs, names in os.walk(full_path):
+        subdirs.sort()
+        files += [os.path.join(directory, n) for n in sorted(names) if n.lower().endswith(PARQUET_EXTENSIONS)]
+    if not files:
+        raise ValueError("El directorio no contiene archivos Parquet.")
+    return files
+
+
+def _row_group_may_match(statistics: Any, operator: str, value: Any) -> bool:
+    """False solo si el mín/máx del row group descarta toda fila (nunca con '!=')."""
+    if statistics is None or not statistics.has_min_max or operator == "!=":
+        return True
+    low, high = statistics.min, statistics.max
+    try:
+        if operator == ">":
+            return high > value
+        if operator == ">=":
+            return high >= value
+        if operator == "<":
+            return low < value
+        if operator == "<=":
+            return low <= value
+        return low <= value <= high
+    except TypeError:
+        # Tipos no comparables (ej: estadísticas binarias contra un número)
+        return True
+
+
+class FileSource:
+    """Archivo Parquet o CSV leído por bloques de DataFrame."""
+
+    def __init__(self, path: str, chunk_rows: int = CHUNK_ROWS):
+        self.path = path
+        self.full_path = resolve_path(path)
+        self.format = _detect_format(self.full_path)
+        self.chunk_rows = chunk_rows
+        if self.format == "parquet":
+            if pa is None:
+                raise ValueError("Leer archivos Parquet requiere pyarrow instalado.")
+            self._files = _parquet_files(self.full_path)
+            self._schema = pq.read_schema(self._files[0])
+            self.columns = list(self._schema.names)
+        else:
+            self._separator = _sniff_separator(self.full_path)
+            self.columns = [str(c) for c in pd.read_csv(self.full_path, sep=self._separator, nrows=0).columns]
+
+    def require(self, *columns: str) -> None:
+        for column in columns:
+            if column not in self.columns:
+                raise ValueError(f"Columna '{column}' no existe en '{self.path}'.")
+
+    def find_column(self, target_name: str) -> str:
+        """Búsqueda sin distinguir mayúsculas (como la reconciliación en memoria)."""
+        for column in self.columns:
+            if column.lower() == target_name.lower():
+                return column
+        raise ValueError(
+            f"Column '{target_name}' not found in dataset. "
+            f"Available columns: {', '.join(self.columns)}"
+        )
+
+    def _prunable(self, row_filter: Optional[RowFilter]) -> bool:
+        """Solo se podan row groups cuando la comparación de Parquet es la misma que en pandas."""
+        if row_filter is None or self.format != "parquet":
+            return False
+        column, _, value = row_filter
+        arrow_type = self._schema.field(column).type
+        if isinstance(value, bool):
+            return False
+        if isinstance(value, (int, float)):
+            return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+        return isinstance(value, str) and (pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type))
+
+    def _parquet_batches(self, columns: Optional[List[str]], row_filter: Optional[RowFilter]) -> Iterator[pd.DataFrame]:
+        prune = self._prunable(row_filter)
+        for path in self._files:
+            parquet = pq.ParquetFile(path)
+            groups = range(parquet.num_row_groups)
+            if prune:
+                column, operator, value = row_filter
+                index = parquet.schema_arrow.get_field_index(column)
+                groups = [
+                    g for g in groups
+                    if _row_group_may_match(parquet.metadata.row_group(g).column(index).statistics, operator, value)
+                ]
+                if not groups:
+                    continue
+            # iter_batches decodifica row group por row group (el scanner de datasets adelanta varios)
+            for batch in parquet.iter_batches(batch_size=self.chunk_rows, columns=columns, row_groups=list(groups)):
+                yield batch.to_pandas()
+
+    def frames(self, columns: Optional[Sequence[str]] = None, row_filter: Optional[RowFilter] = None,
+               text_columns: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+        """
+        Bloques del archivo en orden, con proyección (`columns`). `row_filter`
+        (columna, operador, valor) solo sirve para saltar row groups: las filas
+        de los bloques devueltos se deben filtrar igual.
+        """
+        columns = list(columns) if columns is not None else None
+        if self.format == "parquet":
+            chunks = self._parquet_batches(columns, row_filter)
+        else:
+            chunks = pd.read_csv(
+                self.full_path, sep=self._separator, usecols=columns, chunksize=self.chunk_rows,
+                dtype={column: "str" for column in text_columns},
+            )
+        while True:
+            with stage("frame"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            # El bloque (no el archivo) es lo que ocupa memoria en el request
+            track_allocation(frame_bytes(chunk), transient=True)
+            # Progreso del trabajo asíncrono (y punto de cancelación)
+            report_progress(len(chunk))
+            yield chunk
+
+
+# ==========================================
+# 2. PARSEO NUMÉRICO CONSISTENTE ENTRE BLOQUES
+# ==========================================
+class NumericReader:
+    """
+    Convierte una columna a float64 bloque a bloque. El tipo y el separador
+    decimal se detectan una vez con el primer bloque (la misma muestra que usa
+    `numeric_column` en memoria) y se aplican a todos.
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+        self._decimal: Optional[str] = None
+        self._ready = False
+
+    def parse(self, series: pd.Series) -> pd.Series:
+        if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            return series.astype("float64") if series.dtype == "float32" else series
+        if not self._ready and series.notna().any():
+            _, params = infer_column_type(series)
+            self._decimal = params.get("decimal")
+            self._ready = True
+        return parse_numeric(series, self._decimal)
+
+    def values(self, source: FileSource) -> Iterator[np.ndarray]:
+        """Valores numéricos válidos (sin NaN) de cada bloque."""
+        for chunk in source.frames([self.column]):
+            values = self.parse(chunk[self.column]).to_numpy(dtype="float64", na_value=np.nan)
+            yield values[~np.isnan(values)]
+
+
+# ==========================================
+# 3. ESTADÍSTICAS (equivalentes a engines.descriptive.central)
+# ==========================================
+def _moments(source: FileSource, reader: NumericReader) -> Moments:
+    moments = Moments()
+    for values in reader.values(source):
+        moments.update(values)
+    return moments
+
+
+def file_statistic(path: str, column: str, statistic: str, method: str = "exact", top_k: int = 5) -> Dict[str, Any]:
+    """
+    Media, mediana o moda de una columna de un archivo, con memoria acotada.
+    La moda exacta guarda las frecuencias de todos los valores distintos; con
+    `method="sketch"` la memoria es fija (ver `engines.chunked.sketches`).
+    """
+    if method not in ("exact", "sketch"):
+        raise ValueError("Método no soportado. Usa: exact, sketch.")
+    source = FileSource(path)
+    source.require(column)
+
+    if statistic == "mode" and method == "sketch":
+        sketch = ColumnSketch()
+        for chunk in source.frames([column]):
+            sketch.update(chunk[column])
+        return sketch.mode_result(top_k)
+
+    if statistic == "mode":
+        counts = ValueCounts()
+        for chunk in source.frames([column]):
+            counts.update(chunk[column])
+        result = counts.result()
+        if result.empty:
+            raise ValueError("Columna vacía.")
+        return {
+            "top_value": result.index[0],
+            "dominance_pct": round((result.iloc[0] / counts.total) * 100, 1),
+            "tie": bool(len(result) > 1 and result.iloc[0] == result.iloc[1]),
+        }
+
+    reader = NumericReader(column)
+    moments = _moments(source, reader)
+    if moments.count == 0:
+        raise ValueError("Sin datos numéricos.")
+
+    if statistic == "mean":
+        return {"mean": round(moments.mean, 2), "volatility": round(moments.std(), 2)}
+
+    if statistic == "median":
+        quantiles = (0.25, 0.5, 0.75)
+        ranks = []
+        for q in quantiles:
+            lower, upper, _ = quantile_ranks(moments.count, q)
+            ranks += [lower, upper]
+        selector = RankSelector(ranks, moments.count, moments.minimum, moments.maximum)
+        # Cada pasada relee solo la columna y reduce el intervalo de cada rango
+        while selector.pending:
+            selector.start_pass()
+            for values in reader.values(source):
+                selector.observe(values)
+            selector.finish_pass()
+        q1, median, q3 = (selector.quantile(moments.count, q) for q in quantiles)
+        return {"median": round(median, 2), "iqr": round(q3 - q1, 2)}
+
+    raise ValueError("Estadística no soportada. Usa: mean, median, mode.")
+
+
+# ==========================================
+# 4. AGRUPACIÓN (equivalente a engines.transform.grouping)
+# ==========================================
+def file_group_and_aggregate(path: str, group_by_col: str, agg_col: str, operation: str = "sum",
+                             output_shape: str = "records") -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    source = FileSource(path)
+    source.require(group_by_col, agg_col)
+    partial = GroupPartial(operation)
+    reader = NumericReader(agg_col)
+
+    rows = 0
+    for chunk in source.frames([group_by_col, agg_col], text_columns=[group_by_col]):
+        rows += len(chunk)
+        keys = chunk[group_by_col]
+        values = reader.parse(chunk[agg_col])
+        valid = keys.notna() & values.notna()
+        partial.update(keys[valid], values[valid])
+    if rows == 0:
+        raise ValueError("Dataset vacío.")
+    return shape_frame(partial.result(group_by_col, agg_col), output_shape)
+
+
+# ==========================================
+# 5. RESULTADOS CON MUCHAS FILAS
+# ==========================================
+class ResultSink:
+    """
+    Acumula las filas resultado: en memoria hasta `max_rows` o, con
+    `output_path`, escritas bloque a bloque a un archivo Parquet.
+    """
+
+    def __init__(self, output_path: Optional[str] = None, max_rows: int = MAX_RESULT_ROWS):
+        self.output_path = output_path
+        self.max_rows = max_rows
+        self.count = 0
+        self._frames: List[pd.DataFrame] = []
+        self._writer = None
+        self._schema = None
+        self._full_path = None
+        if output_path:
+            if pa is None:
+                raise ValueError("Escribir resultados a archivo requiere pyarrow instalado.")
+            self._full_path = resolve_path(output_path, must_exist=False)
+            if not self._full_path.lower().endswith(PARQUET_EXTENSIONS):
+                raise ValueError("output_path debe ser un archivo .parquet.")
+
+    def add(self, frame: pd.DataFrame) -> None:
+        self.count += len(frame)
+        if self._full_path is None:
+            if self.count > self.max_rows:
+                raise ValueError(
+                    f"El resultado supera {self.max_rows:,} filas (ANALYTICS_CHUNKED_MAX_RESULT_ROWS); "
+                    "usa output_path para escribirlo a un archivo."
+                )
+            self._frames.append(frame)
+            return
+        if frame.empty and self._writer is not None:
+            return
+        try:
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"Los bloques tienen tipos incompatibles para escribir el resultado: {e}")
+        if self._writer is None:
+            self._schema = table.schema
+            os.makedirs(os.path.dirname(self._full_path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self._full_path + ".tmp", self._schema)
+        self._writer.write_table(table)
+
+    def finish(self, columns: Sequence[str], output_shape: str) -> Any:
+        """Filas en la forma pedida o, si se escribieron a archivo, su ubicación."""
+        if self._full_path is not None:
+            if self._writer is None:
+                self.add(pd.DataFrame({column: [] for column in columns}))
+            self._writer.close()
+            os.replace(self._full_path + ".tmp", self._full_path)
+            return {"output_path": self.output_path, "row_count": self.count}
+        if not self._frames:
+            return shape_frame(pd.DataFrame({column: [] for column in columns}), output_shape)
+        frame = self._frames[0] if len(self._frames) == 1 else pd.concat(self._frames, ignore_index=True)
+        return shape_frame(frame, output_shape)
+
+
+# ==========================================
+# 6. FILTRO (equivalente a engines.transform.filtering)
+# ==========================================
+def file_filter(path: str, column: str, operator: str, value: Union[float, int, str],
+                output_shape: str = "records", output_path: Optional[str] = None,
+                max_rows: int = MAX_RESULT_ROWS) -> Any:
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"Operador '{operator}' no soportado.")
+    if output_shape not in OUTPUT_SHAPES:
+        raise ValueError(f"output_shape '{output_shape}' no soportado. Usa: {', '.join(OUTPUT_SHAPES)}.")
+    source = FileSource(path)
+    sink = ResultSink(output_path, max_rows)
+    if column not in source.columns:
+        # Igual que en memoria: columna inexistente -> resultado vacío
+        return sink.finish(source.columns, output_shape)
+
+    numeric = isinstance(value, (int, float))
+    reader = NumericReader(column)
+    for chunk in source.frames(row_filter=(column, operator, value)):
+        if numeric:
+            # Parseo con el formato del primer bloque; filter_frame ya recibe números
+            chunk[column] = reader.parse(chunk[column])
+        sink.add(filter_frame(chunk, column, operator, value))
+    return sink.finish(source.columns, output_shape)
+
+
+# ==========================================
+# 7. RECONCILIACIÓN (equivalente a engines.reconcile)
+# ==========================================
+def _key_index(source: FileSource, key_column: str) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Hash de 64 bits de cada clave normalizada y la posición de su última
+    aparición (la última fila gana, como en memoria). Ocupa 16 bytes por
+    clave, no la fila completa.
+
+    Returns:
+        (hashes únicos ordenados, posición de la última fila de cada uno, filas totales)
+    """
+    hashes, positions = [], []
+    offset = 0
+    for chunk in source.frames([key_column], text_columns=[key_column]):
+        keys = build_key_series(chunk, key_column)
+        valid = keys.notna().to_numpy()
+        # categorize=False: las claves casi nunca se repiten, factorizar antes solo cuesta
+        hashes.append(pd.util.hash_array(keys[valid].to_numpy(dtype=object), categorize=False))
+        positions.append(np.flatnonzero(valid) + offset)
+        offset += len(chunk)
+    if offset == 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), 0
+    hashes_all = np.concatenate(hashes)[::-1]
+    positions_all = np.concatenate(positions)[::-1]
+    unique, first_in_reversed = np.unique(hashes_all, return_index=True)
+    return unique, positions_all[first_in_reversed], offset
+
+
+def _keys_for_hashes(source: FileSource, key_column: str, wanted: np.ndarray) -> set:
+    """
+    Claves normalizadas reales cuyo hash está en `wanted` (ordenado). Sirve
+    para descartar colisiones del hash de 64 bits; ocupa memoria solo por las
+    claves en `wanted`.
+    """
+    found = set()
+    for chunk in source.frames([key_column], text_columns=[key_column]):
+        keys = build_key_series(chunk, key_column).dropna()
+        hashes = pd.util.hash_array(keys.to_numpy(dtype=object), categorize=False)
+        found.update(keys[np.isin(hashes, wanted)].tolist())
+    return found
+
+
+def _select_rows(source: FileSource, positions: np.ndarray, sink: ResultSink, text_columns: Sequence[str],
+                 key_filter: Optional[Tuple[str, set]] = None) -> None:
+    """
+    Segunda pasada: copia al resultado las filas en `positions` (ordenadas).
+    Con `key_filter` (columna, claves) solo pasan las filas cuya clave
+    normalizada está en el conjunto.
+    """
+    offset = 0
+    for chunk in source.frames(text_columns=text_columns):
+        start = np.searchsorted(positions, offset)
+        end = np.searchsorted(positions, offset + len(chunk))
+        rows = chunk.iloc[positions[start:end] - offset]
+        if key_filter is not None:
+            column, keys = key_filter
+            rows = rows[build_key_series(rows, column).isin(keys).to_numpy()]
+        sink.add(rows)
+        offset += len(chunk)
+
+
+def file_reconcile(path_a: str, path_b: str, key_column_a: Optional[str] = None,
+                   key_column_b: Optional[str] = None, key_column: str = "CUFE",
+                   mode: str = "missing_in_a", output_shape: str = "records",
+                   output_path: Optional[str] = None, max_rows: int = MAX_RESULT_ROWS) -> Dict[str, Any]:
+    """
+    Reconcilia dos archivos con la misma semántica que `reconcile_datasets`
+    (claves normalizadas, filas sin clave ignoradas, la última fila gana).
+    """
+    if mode not in VALID_MODES:
+        raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(VALID_MODES)}")
+    if output_shape not in OUTPUT_SHAPES:
+        raise ValueError(f"Invalid output_shape '{output_shape}'. Must be one of: {', '.join(OUTPUT_SHAPES)}")
+
+    source_a, source_b = FileSource(path_a), FileSource(path_b)
+    try:
+        resolved_a = source_a.find_column(key_column_a or key_column)
+    except ValueError as e:
+        raise ValueError(f"Error in dataset A: {str(e)}")
+    try:
+        resolved_b = source_b.find_column(key_column_b or key_column)
+    except ValueError as e:
+        raise ValueError(f"Error in dataset B: {str(e)}")
+
+    unique_a, last_a, total_a = _key_index(source_a, resolved_a)
+    unique_b, last_b, total_b = _key_index(source_b, resolved_b)
+    if total_a == 0:
+        raise ValueError("data_a is empty")
+    if total_b == 0:
+        raise ValueError("data_b is empty")
+
+    key_filter = None
+    if mode == "missing_in_a":
+        source, key, positions = source_b, resolved_b, last_b[~np.isin(unique_b, unique_a, assume_unique=True)]
+    elif mode == "missing_in_b":
+        source, key, positions = source_a, resolved_a, last_a[~np.isin(unique_a, unique_b, assume_unique=True)]
+    else:  # intersection
+        matched = np.isin(unique_a, unique_b, assume_unique=True)
+        source, key, positions = source_a, resolved_a, last_a[matched]
+        # Un hash igual no garantiza la misma clave: se confirma contra las claves reales de B
+        key_filter = (resolved_a, _keys_for_hashes(source_b, resolved_b, unique_a[matched]))
+
+    sink = ResultSink(output_path, max_rows)
+    _select_rows(source, np.sort(positions), sink, text_columns=[key], key_filter=key_filter)
+    count = sink.count
+    return {
+        "summary": build_summary(mode, count),
+        "match_count": count,
+        "mode_used": mode,
+        "key_column_a": resolved_a,
+        "key_column_b": resolved_b,
+        "data": sink.finish(source.columns, output_shape),
+        "metadata": {
+            "total_records_a": total_a,
+            "total_records_b": total_b,
+            "valid_keys_a": len(unique_a),
+            "valid_keys_b": len(unique_b),
+        },
+    }
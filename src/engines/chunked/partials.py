@@ -0,0 +1,263 @@
+"""
+Agregados parciales combinables para la ejecución por bloques.
+
+Cada parcial se alimenta bloque a bloque (`update`) y ocupa memoria acotada
+por el resultado (grupos, valores distintos), nunca por las filas leídas. Los
+resultados coinciden con los engines en memoria:
+
+- `Moments`: conteo, media y suma de cuadrados centrada (algoritmo de Chan),
+  para media y desviación estándar muestral.
+- `GroupPartial`: sum / count / mean por grupo.
+- `ValueCounts`: frecuencias con el mismo orden que `Series.value_counts`
+  (desempate por primera aparición).
+- `RankSelector`: estadísticos de orden exactos (mediana, cuartiles) en
+  varias pasadas de histograma sobre el archivo, sin ordenar la columna.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Grupos acumulados antes de recombinar los parciales
+COMPACT_GROUPS = 200_000
+
+
+# ==========================================
+# 1. MOMENTOS (media / desviación)
+# ==========================================
+class Moments:
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        n = len(values)
+        if n == 0:
+            return
+        part = Moments()
+        part.count = n
+        part.mean = float(values.mean())
+        part.m2 = float(((values - part.mean) ** 2).sum())
+        part.minimum = float(values.min())
+        part.maximum = float(values.max())
+        self.merge(part)
+
+    def merge(self, other: "Moments") -> None:
+        """Combina los momentos de otro bloque o partición."""
+        if other.count == 0:
+            return
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+
+    def std(self) -> float:
+        """Desviación estándar muestral (ddof=1, como pandas)."""
+        if self.count < 2:
+            return float("nan")
+        return float(np.sqrt(self.m2 / (self.count - 1)))
+
+
+# ==========================================
+# 2. AGRUPACIÓN
+# ==========================================
+class GroupPartial:
+    """Sumas y conteos por grupo, recombinados cuando crecen."""
+
+    def __init__(self, operation: str):
+        if operation not in ("sum", "count", "mean"):
+            raise ValueError("Operación no soportada. Usa: sum, count, mean.")
+        self.operation = operation
+        self._parts: List[pd.DataFrame] = []
+        self._groups = 0
+
+    @staticmethod
+    def summarize(keys: pd.Series, values: pd.Series) -> pd.DataFrame:
+        """Parcial [sum, count] por grupo de un bloque o partición."""
+        return values.groupby(keys, observed=True, sort=False).agg(["sum", "count"])
+
+    def update(self, keys: pd.Series, values: pd.Series) -> None:
+        if keys.empty:
+            return
+        self.merge(self.summarize(keys, values))
+
+    def merge(self, part: pd.DataFrame) -> None:
+        if part.empty:
+            return
+        self._parts.append(part)
+        self._groups += len(part)
+        if self._groups > COMPACT_GROUPS and len(self._parts) > 1:
+            self._compact()
+
+    def _compact(self) -> None:
+        merged = pd.concat(self._parts).groupby(level=0, sort=False).sum()
+        self._parts = [merged]
+        self._groups = len(merged)
+
+    def result(self, group_by: str, agg_col: str) -> pd.DataFrame:
+        """Frame [group_by, agg_col] ordenado por grupo (igual que groupby en memoria)."""
+        if not self._parts:
+            return pd.DataFrame({group_by: [], agg_col: []})
+        merged = pd.concat(self._parts).groupby(level=0, sort=True).sum()
+        if self.operation == "sum":
+            values = merged["sum"]
+        elif self.operation == "count":
+            values = merged["count"]
+        else:
+            values = merged["sum"] / merged["count"]
+        values.index.name = group_by
+        return values.rename(agg_col).reset_index()
+
+
+# ==========================================
+# 3. FRECUENCIAS (moda)
+# ==========================================
+class ValueCounts:
+    def __init__(self):
+        self._parts: List[pd.Series] = []
+        self.total = 0
+
+    def update(self, series: pd.Series) -> None:
+        series = series.dropna()
+        if series.empty:
+            return
+        self.merge(series.value_counts(sort=False))
+
+    def merge(self, counts: pd.Series) -> None:
+        """Suma las frecuencias de otro bloque (en orden de lectura)."""
+        if counts.empty:
+            return
+        self.total += int(counts.sum())
+        self._parts.append(counts)
+        if len(self._parts) > 16:
+            self._parts = [self._merged()]
+
+    def _merged(self) -> pd.Series:
+        # sort=False conserva el orden de primera aparición entre bloques
+        return pd.concat(self._parts).groupby(level=0, sort=False).sum()
+
+    def result(self) -> pd.Series:
+        if not self._parts:
+            return pd.Series(dtype="int64")
+        return self._merged().sort_values(ascending=False, kind="stable")
+
+
+# ==========================================
+# 4. ESTADÍSTICOS DE ORDEN EXACTOS
+# ==========================================
+def _lerp(a: float, b: float, t: float) -> float:
+    # Misma interpolación que numpy (y pandas) en quantile(method="linear")
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def quantile_ranks(count: int, q: float) -> tuple:
+    """(rango inferior, rango superior, fracción) de la interpolación lineal."""
+    position = (count - 1) * q
+    lower = int(np.floor(position))
+    return lower, min(lower + 1, count - 1), position - lower
+
+
+class RankSelector:
+    """
+    Encuentra los valores en posiciones (rangos) dadas del orden de la columna.
+    Cada pasada cuenta los valores en un histograma del intervalo que contiene
+    al rango y lo reduce al bin correspondiente; cuando quedan pocos valores
+    (`collect_limit`) los recolecta y ordena. La memoria es `bins` contadores
+    más, al final, `collect_limit` valores.
+    """
+
+    def __init__(self, ranks: Iterable[int], count: int, minimum: float, maximum: float,
+                 bins: int = 4096, collect_limit: int = 1_000_000):
+        self.bins = bins
+        self.collect_limit = collect_limit
+        self.values: Dict[int, float] = {}
+        self._targets = []
+        for rank in sorted(set(ranks)):
+            target = {"rank": rank, "lo": minimum, "hi": maximum, "closed": True, "inside": count}
+            if minimum == maximum:
+                self.values[rank] = minimum
+            else:
+                self._targets.append(target)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._targets)
+
+    def start_pass(self) -> None:
+        for target in self._targets:
+            target["below"] = 0
+            target["collect"] = target["inside"] <= self.collect_limit
+            if target["collect"]:
+                target["collected"] = []
+            else:
+                target["edges"] = np.linspace(target["lo"], target["hi"], self.bins + 1)
+                target["hist"] = np.zeros(self.bins, dtype=np.int64)
+
+    def plan(self) -> List[Dict[str, Any]]:
+        """Intervalos de la pasada actual, para observarlos en otro proceso (`tally`)."""
+        keys = ("lo", "hi", "closed", "collect", "edges")
+        return [{key: target[key] for key in keys if key in target} for target in self._targets]
+
+    @staticmethod
+    def tally(plan: List[Dict[str, Any]], values: np.ndarray, bins: int) -> List[tuple]:
+        """(valores bajo el intervalo, histograma o valores recolectados) por objetivo."""
+        observations = []
+        for target in plan:
+            lo, hi = target["lo"], target["hi"]
+            below = int(np.count_nonzero(values < lo))
+            inside = (values >= lo) & ((values <= hi) if target["closed"] else (values < hi))
+            selected = values[inside]
+            if target["collect"]:
+                observations.append((below, selected))
+                continue
+            positions = np.searchsorted(target["edges"], selected, side="right") - 1
+            np.clip(positions, 0, bins - 1, out=positions)
+            observations.append((below, np.bincount(positions, minlength=bins)))
+        return observations
+
+    def absorb(self, observations: List[tuple]) -> None:
+        for target, (below, observed) in zip(self._targets, observations):
+            target["below"] += below
+            if target["collect"]:
+                target["collected"].append(observed)
+            else:
+                target["hist"] += observed
+
+    def observe(self, values: np.ndarray) -> None:
+        self.absorb(self.tally(self.plan(), values, self.bins))
+
+    def finish_pass(self) -> None:
+        remaining = []
+        for target in self._targets:
+            offset = target["rank"] - target["below"]
+            if target["collect"]:
+                values = np.sort(np.concatenate(target.pop("collected")))
+                self.values[target["rank"]] = float(values[offset])
+                continue
+            cumulative = np.cumsum(target.pop("hist"))
+            index = int(np.searchsorted(cumulative, offset, side="right"))
+            edges = target.pop("edges")
+            inside = int(cumulative[index] - (cumulative[index - 1] if index else 0))
+            target.update(
+                lo=float(edges[index]), hi=float(edges[index + 1]),
+                closed=target["closed"] and index == self.bins - 1, inside=inside,
+            )
+            if target["lo"] == target["hi"]:
+                self.values[target["rank"]] = target["lo"]
+            else:
+                remaining.append(target)
+        self._targets = remaining
+
+    def quantile(self, count: int, q: float) -> Optional[float]:
+        lower, upper, fraction = quantile_ranks(count, q)
+        return _lerp(self.values[lower], self.values[upper], fraction)
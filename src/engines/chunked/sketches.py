@@ -0,0 +1,301 @@
+"""
+Sketches combinables de memoria fija: distintos y valores frecuentes.
+
+`Series.value_counts()` construye una tabla hash con cada valor distinto; en
+columnas de alta cardinalidad (CUFE, códigos de producto) sobre decenas de
+millones de filas eso domina el costo y no se puede combinar entre bloques
+sin guardar la tabla completa. Estos sketches se alimentan por bloques
+(`update`), se combinan entre bloques y procesos (`merge`) y se serializan a
+JSON (`to_dict` / `from_dict`):
+
+- `HyperLogLog`: número de valores distintos. Error relativo típico
+  1.04 / sqrt(2^p) (p=14: ~0.8%, 16 KiB).
+- `FrequentItems`: Misra-Gries con `k` contadores conserva los candidatos
+  (todo valor con frecuencia > total / (k + 1) está garantizado) y un
+  count-min de `depth` x `width` estima la frecuencia de cada candidato.
+  La frecuencia reportada es una cota superior: min(count-min, Misra-Gries +
+  error máximo de Misra-Gries).
+
+Los valores se identifican por un hash de 64 bits estable entre procesos
+(`hash_values`): numéricos como float64 (1 y 1.0 son el mismo valor, igual
+que en `value_counts`) y el resto como texto.
+"""
+
+import base64
+import os
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+HLL_PRECISION = int(os.getenv("ANALYTICS_SKETCH_HLL_PRECISION", "14"))
+TOP_K_COUNTERS = int(os.getenv("ANALYTICS_SKETCH_COUNTERS", "1024"))
+CMS_WIDTH = int(os.getenv("ANALYTICS_SKETCH_CMS_WIDTH", "16384"))
+CMS_DEPTH = int(os.getenv("ANALYTICS_SKETCH_CMS_DEPTH", "4"))
+
+
+# ==========================================
+# 1. HASH Y SERIALIZACIÓN
+# ==========================================
+def hash_values(series: pd.Series) -> np.ndarray:
+    """Hash uint64 de cada valor (sin nulos), igual en cualquier bloque o proceso."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.util.hash_array(series.to_numpy(dtype="float64"))
+    return pd.util.hash_array(series.astype(str).to_numpy(dtype=object))
+
+
+def distinct_counts(series: pd.Series) -> Tuple[np.ndarray, np.ndarray, pd.Series]:
+    """
+    (hashes, frecuencias, valores) de los distintos de un bloque sin nulos. Se
+    hashea cada distinto una vez, no cada fila: la tabla del bloque (factorize)
+    es más barata que hashear millones de valores repetidos.
+    """
+    codes, uniques = pd.factorize(series)
+    values = pd.Series(uniques, dtype=series.dtype)
+    return hash_values(values), np.bincount(codes, minlength=len(values)), values
+
+
+def _pack(array: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes())).decode("ascii")
+
+
+def _unpack(text: str, dtype: str) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).copy()
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bits significativos de cada entero (< 2^53, exacto en float64) vía el exponente."""
+    return np.frexp(values.astype(np.float64))[1]
+
+
+# ==========================================
+# 2. HYPERLOGLOG (valores distintos)
+# ==========================================
+class HyperLogLog:
+    __slots__ = ("p", "registers")
+
+    def __init__(self, p: int = HLL_PRECISION):
+        # p >= 11: los 64 - p bits restantes caben exactos en un float64 (`_bit_length`)
+        if not 11 <= p <= 18:
+            raise ValueError("La precisión de HyperLogLog debe estar entre 11 y 18.")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        rest_bits = 64 - self.p
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Posición del primer 1 en los bits restantes (ceros a la izquierda + 1)
+        rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, series: pd.Series) -> None:
+        # Los repetidos no cambian los registros: basta un hash por distinto
+        self.update_hashes(distinct_counts(series.dropna())[0])
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError("Solo se combinan sketches HyperLogLog con la misma precisión.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int((self.registers == 0).sum())
+        # Rango bajo: conteo lineal sobre los registros vacíos
+        if raw <= 2.5 * m and zeros:
+            raw = m * np.log(m / zeros)
+        return int(round(raw))
+
+    def relative_error(self) -> float:
+        return float(1.04 / np.sqrt(len(self.registers)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "hll", "p": self.p, "registers": _pack(self.registers)}
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "HyperLogLog":
+        sketch = cls(int(payload["p"]))
+        sketch.registers = _unpack(payload["registers"], "uint8")
+        return sketch
+
+
+# ==========================================
+# 3. VALORES FRECUENTES (Misra-Gries + count-min)
+# ==========================================
+class FrequentItems:
+    __slots__ = ("k", "width", "depth", "total", "table", "hashes", "counts", "values")
+
+    def __init__(self, k: int = TOP_K_COUNTERS, width: int = CMS_WIDTH, depth: int = CMS_DEPTH):
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Resumen Misra-Gries: hash, contador y un valor representativo por candidato
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.values: List[Any] = []
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        """Columna del count-min de cada hash en cada fila (doble hashing)."""
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((low[None, :] + rows * high[None, :]) % np.uint64(self.width)).astype(np.intp)
+
+    def update(self, series: pd.Series) -> None:
+        series = series.dropna()
+        if series.empty:
+            return
+        self.update_counts(*distinct_counts(series))
+
+    def update_counts(self, hashes: np.ndarray, counts: np.ndarray, values: pd.Series) -> None:
+        """Bloque ya reducido a sus distintos (ver `distinct_counts`)."""
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=counts, minlength=self.width).astype(np.int64)
+
+        keep = self._reduce(counts)
+        part = FrequentItems(self.k, self.width, self.depth)
+        part.total = int(counts.sum())
+        part.hashes = hashes[keep]
+        part.counts = counts[keep] - self._threshold(counts)
+        part.values = values.iloc[keep].tolist()
+        self._merge_summary(part)
+        self.total += part.total
+
+    def _threshold(self, counts: np.ndarray) -> int:
+        """Decremento Misra-Gries: el (k+1)-ésimo contador más grande (0 si caben todos)."""
+        if len(counts) <= self.k:
+            return 0
+        return int(np.partition(counts, len(counts) - self.k - 1)[len(counts) - self.k - 1])
+
+    def _reduce(self, counts: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(counts > self._threshold(counts))
+
+    def _merge_summary(self, other: "FrequentItems") -> None:
+        hashes = np.concatenate([self.hashes, other.hashes])
+        if len(hashes) == 0:
+            return
+        counts = np.concatenate([self.counts, other.counts])
+        values = self.values + other.values
+        codes, uniques = pd.factorize(hashes)
+        merged = np.bincount(codes, weights=counts).astype(np.int64)
+        first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+        keep = self._reduce(merged)
+        self.hashes = uniques[keep].astype(np.uint64)
+        self.counts = merged[keep] - self._threshold(merged)
+        self.values = [values[i] for i in first[keep]]
+
+    def merge(self, other: "FrequentItems") -> None:
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Solo se combinan count-min con el mismo ancho y profundidad.")
+        self.table += other.table
+        self._merge_summary(other)
+        self.total += other.total
+
+    def error_bound(self) -> int:
+        """Subconteo máximo de Misra-Gries para cualquier valor."""
+        return int((self.total - int(self.counts.sum())) // (self.k + 1))
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        """Los `n` candidatos más frecuentes con su frecuencia estimada (cota superior) y cota inferior."""
+        if len(self.hashes) == 0:
+            return []
+        columns = self._columns(self.hashes)
+        count_min = self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+        estimate = np.minimum(count_min, self.counts + self.error_bound())
+        order = np.lexsort((-self.counts, -estimate))[:n]
+        return [
+            {"value": self.values[i], "count": int(estimate[i]), "lower_bound": int(self.counts[i])}
+            for i in order
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "frequent",
+            "k": self.k,
+            "width": self.width,
+            "depth": self.depth,
+            "total": self.total,
+            "table": _pack(self.table),
+            "hashes": _pack(self.hashes),
+            "counts": _pack(self.counts),
+            "values": [v.item() if isinstance(v, np.generic) else v for v in self.values],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "FrequentItems":
+        sketch = cls(int(payload["k"]), int(payload["width"]), int(payload["depth"]))
+        sketch.total = int(payload["total"])
+        sketch.table = _unpack(payload["table"], "int64").reshape(sketch.depth, sketch.width)
+        sketch.hashes = _unpack(payload["hashes"], "uint64")
+        sketch.counts = _unpack(payload["counts"], "int64")
+        sketch.values = list(payload["values"])
+        return sketch
+
+
+# ==========================================
+# 4. SKETCH DE COLUMNA (distintos + frecuentes)
+# ==========================================
+class ColumnSketch:
+    """HyperLogLog y FrequentItems de una columna, alimentados con un solo hash por bloque."""
+
+    __slots__ = ("distinct", "frequent")
+
+    def __init__(self):
+        self.distinct = HyperLogLog()
+        self.frequent = FrequentItems()
+
+    @property
+    def total(self) -> int:
+        return self.frequent.total
+
+    def update(self, series: pd.Series) -> None:
+        series = series.dropna()
+        if series.empty:
+            return
+        hashes, counts, values = distinct_counts(series)
+        self.distinct.update_hashes(hashes)
+        self.frequent.update_counts(hashes, counts, values)
+
+    def merge(self, other: "ColumnSketch") -> None:
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+
+    def mode_result(self, top_k: int) -> Dict[str, Any]:
+        """Misma forma que `get_smart_mode` más las estimaciones del sketch."""
+        total = self.total
+        if total == 0:
+            raise ValueError("Columna vacía.")
+        # Sin candidatos ningún valor supera total / (k + 1) (ej: claves únicas)
+        top = self.frequent.top(max(top_k, 2))
+        return {
+            "top_value": top[0]["value"] if top else None,
+            "dominance_pct": round((top[0]["count"] / total) * 100, 1) if top else 0,
+            "tie": bool(len(top) > 1 and top[0]["count"] == top[1]["count"]),
+            "approximate": True,
+            "total": total,
+            "distinct_estimate": self.distinct.estimate(),
+            "distinct_error_pct": round(self.distinct.relative_error() * 100, 2),
+            "top_values": [
+                {**item, "dominance_pct": round((item["count"] / total) * 100, 2)}
+                for item in top[:top_k]
+            ],
+            "max_undercount": self.frequent.error_bound(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "column", "distinct": self.distinct.to_dict(), "frequent": self.frequent.to_dict()}
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "ColumnSketch":
+        sketch = cls()
+        sketch.distinct = HyperLogLog.from_dict(payload["distinct"])
+        sketch.frequent = FrequentItems.from_dict(payload["frequent"])
+        return sketch
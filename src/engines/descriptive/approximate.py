@@ -0,0 +1,152 @@
+"""
+Estimaciones sobre muestras con intervalos de confianza (modo aproximado).
+
+Opt-in (`approximate=True`) en media, mediana, agrupación y gráficos: en
+lugar de recorrer el dataset se calcula sobre su muestra (`utils.sampling`)
+y se devuelve el intervalo de confianza de cada estimación, para que quien
+llama decida cuánta precisión cambia por latencia.
+
+- Media: media muestral ± z · s / sqrt(n) con corrección por población finita.
+- Mediana: intervalo por estadísticos de orden (sin suponer normalidad).
+- Agrupación: muestra estratificada por la columna de agrupación; cada grupo
+  se estima con su propia muestra y su tamaño real (los grupos pequeños
+  quedan completos y salen exactos, con intervalo de ancho cero).
+"""
+
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.processor import build_frame, numeric_column
+from utils.sampling import SAMPLES, Sample
+
+
+def _z(confidence: float) -> float:
+    if not 0 < confidence < 1:
+        raise ValueError("El nivel de confianza debe estar entre 0 y 1 (ej: 0.95).")
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def _fpc(sampled: Any, population: Any) -> Any:
+    """Corrección por población finita (0 cuando la muestra es toda la población)."""
+    return np.sqrt(np.clip(1 - sampled / np.maximum(population, 1), 0, 1))
+
+
+def sample_frame(data: Any, stratify: Optional[str] = None) -> Tuple[pd.DataFrame, Sample]:
+    """Filas muestreadas del dataset (uniforme o estratificada por `stratify`) y su muestra."""
+    df = build_frame(data)
+    if df.empty:
+        raise ValueError("Dataset vacío.")
+    if stratify is not None and stratify not in df.columns:
+        raise ValueError(f"Columna '{stratify}' no existe.")
+    sample = SAMPLES.sample(df, stratify)
+    return sample.frame(df), sample
+
+
+def _sample_values(data: Any, column: str) -> Tuple[pd.Series, Sample]:
+    df = build_frame(data)
+    if df.empty or column not in df.columns:
+        raise ValueError(f"Columna '{column}' no encontrada o datos vacíos.")
+    sample = SAMPLES.sample(df)
+    # Solo se parsean las filas muestreadas
+    values = numeric_column(sample.frame(df), column).dropna()
+    if values.empty:
+        raise ValueError("Sin datos numéricos.")
+    return values, sample
+
+
+def _interval(low: float, high: float) -> list:
+    return [round(float(low), 2), round(float(high), 2)]
+
+
+def approximate_mean(data: Any, column: str, confidence: float = 0.95) -> Dict[str, Any]:
+    z = _z(confidence)
+    values, sample = _sample_values(data, column)
+    mean = float(values.mean())
+    std = float(values.std()) if len(values) > 1 else 0.0
+    margin = z * std / np.sqrt(len(values)) * float(_fpc(len(sample.positions), sample.population))
+    return {
+        "mean": round(mean, 2),
+        "volatility": round(std, 2),
+        "mean_ci": _interval(mean - margin, mean + margin),
+        "confidence": confidence,
+        "approximate": True,
+        **sample.describe(),
+    }
+
+
+def approximate_median(data: Any, column: str, confidence: float = 0.95) -> Dict[str, Any]:
+    z = _z(confidence)
+    values, sample = _sample_values(data, column)
+    ordered = np.sort(values.to_numpy(dtype="float64"))
+    n = len(ordered)
+    median = float(np.median(ordered))
+    q1, q3 = np.quantile(ordered, [0.25, 0.75])
+    if sample.exact:
+        low = high = median
+    else:
+        # Rangos j, k con P(x_(j) <= mediana <= x_(k)) ~ confianza (binomial con p = 0.5)
+        half_width = z * np.sqrt(n) / 2
+        low = ordered[max(int(np.floor(n / 2 - half_width)), 0)]
+        high = ordered[min(int(np.ceil(n / 2 + half_width)), n - 1)]
+    return {
+        "median": round(median, 2),
+        "iqr": round(float(q3 - q1), 2),
+        "median_ci": _interval(low, high),
+        "confidence": confidence,
+        "approximate": True,
+        **sample.describe(),
+    }
+
+
+def approximate_group(data: Any, group_by: str, agg_col: str, operation: str = "sum",
+                      confidence: float = 0.95) -> Tuple[pd.DataFrame, Sample]:
+    """
+    Frame [group_by, agg_col, agg_col_ci_low, agg_col_ci_high] ordenado por
+    grupo (como `group_and_aggregate`) estimado sobre la muestra estratificada.
+    """
+    if operation not in ("sum", "count", "mean"):
+        raise ValueError("Operación no soportada. Usa: sum, count, mean.")
+    z = _z(confidence)
+    rows, sample = sample_frame(data, stratify=group_by)
+    if agg_col not in rows.columns:
+        raise ValueError(f"Columna '{agg_col}' no existe.")
+
+    values = numeric_column(rows, agg_col).to_numpy(dtype="float64", na_value=np.nan)
+    present = ~np.isnan(values)
+    frame = pd.DataFrame({
+        "key": sample.keys.to_numpy(),
+        # Suma y conteo son totales de una variable por fila (el valor o 0, 1 si hay valor)
+        "total": np.where(present, values, 0.0),
+        "present": present.astype(np.float64),
+        "value": values,
+    })
+    grouped = frame.groupby("key", sort=True)
+    stats = grouped.agg(
+        sampled=("present", "size"), valid=("present", "sum"),
+        total_mean=("total", "mean"), total_std=("total", "std"),
+        present_mean=("present", "mean"), present_std=("present", "std"),
+        value_mean=("value", "mean"), value_std=("value", "std"),
+    )
+    # Los grupos sin ningún valor de la medida no aparecen (el recorrido completo los descarta)
+    stats = stats[stats["valid"] > 0]
+    population = sample.strata.reindex(stats.index).to_numpy(dtype="float64")
+    fpc = _fpc(stats["sampled"].to_numpy(dtype="float64"), population)
+
+    if operation == "mean":
+        estimate = stats["value_mean"].to_numpy()
+        se = stats["value_std"].fillna(0).to_numpy() / np.sqrt(stats["valid"].to_numpy()) * fpc
+    else:
+        column = "total" if operation == "sum" else "present"
+        estimate = population * stats[f"{column}_mean"].to_numpy()
+        se = population * stats[f"{column}_std"].fillna(0).to_numpy() / np.sqrt(stats["sampled"].to_numpy()) * fpc
+
+    result = pd.DataFrame({
+        group_by: stats.index,
+        agg_col: estimate,
+        f"{agg_col}_ci_low": estimate - z * se,
+        f"{agg_col}_ci_high": estimate + z * se,
+    })
+    return result, sample
@@ -1,31 +1,61 @@
+import os
 import pandas as pd
 from typing import List, Dict, Any
+from utils.processor import build_frame, numeric_column
+# Datasets grandes: el cálculo se reparte en varios núcleos (mismos resultados)
+from engines.parallel import (
+    partitioned_moments, partitioned_quantiles, partitioned_sketch, partitioned_value_counts, should_partition
+)
+from engines.chunked.sketches import ColumnSketch
+from engines.descriptive.approximate import approximate_mean, approximate_median
+
+MODE_METHODS = ("exact", "sketch")
+# Filas por bloque al alimentar el sketch (acota la tabla hash de cada bloque)
+SKETCH_BLOCK_ROWS = int(os.getenv("ANALYTICS_SKETCH_BLOCK_ROWS", "1000000"))
 
 # --- HELPER ---
-def _get_series(data: List[Dict[str, Any]], column: str) -> pd.Series:
-    df = pd.DataFrame(data)
+def _get_frame(data: List[Dict[str, Any]], column: str) -> pd.DataFrame:
+    df = build_frame(data)
     if df.empty or column not in df.columns:
         raise ValueError(f"Columna '{column}' no encontrada o datos vacíos.")
-    return df[column]
+    return df
+
+def _get_series(data: List[Dict[str, Any]], column: str) -> pd.Series:
+    return _get_frame(data, column)[column]
 
-def _to_numeric(series: pd.Series) -> pd.Series:
-    return pd.to_numeric(series, errors='coerce').dropna()
+def _to_numeric(data: List[Dict[str, Any]], column: str) -> pd.Series:
+    # Parseo locale-aware ("$1.234,56") cacheado por dataset
+    return numeric_column(_get_frame(data, column), column).dropna()
 
 # --- 1. MEDIA CONTEXTUAL (Promedio + Volatilidad) ---
-def get_smart_mean(data: List[Dict[str, Any]], column: str) -> Dict[str, Any]:
-    series = _to_numeric(_get_series(data, column))
+def get_smart_mean(data: List[Dict[str, Any]], column: str, approximate: bool = False, confidence: float = 0.95) -> Dict[str, Any]:
+    """Con `approximate=True` se estima sobre la muestra del dataset, con intervalo de confianza."""
+    if approximate:
+        return approximate_mean(data, column, confidence)
+    series = _to_numeric(data, column)
     if series.empty: raise ValueError("Sin datos numéricos.")
 
+    if should_partition(len(series)):
+        moments = partitioned_moments(series)
+        return {"mean": round(moments.mean, 2), "volatility": round(moments.std(), 2)}
+
     return {
         "mean": round(float(series.mean()), 2),
         "volatility": round(float(series.std()), 2) 
     }
 
 # --- 2. MEDIANA CONTEXTUAL (Centro + Concentración) ---
-def get_smart_median(data: List[Dict[str, Any]], column: str) -> Dict[str, Any]:
-    series = _to_numeric(_get_series(data, column))
+def get_smart_median(data: List[Dict[str, Any]], column: str, approximate: bool = False, confidence: float = 0.95) -> Dict[str, Any]:
+    """Con `approximate=True` se estima sobre la muestra del dataset, con intervalo de confianza."""
+    if approximate:
+        return approximate_median(data, column, confidence)
+    series = _to_numeric(data, column)
     if series.empty: raise ValueError("Sin datos numéricos.")
 
+    if should_partition(len(series)):
+        q1, median, q3 = partitioned_quantiles(series, (0.25, 0.5, 0.75))
+        return {"median": round(median, 2), "iqr": round(q3 - q1, 2)}
+
     # IQR = Q3 - Q1 (Donde vive la mayoría de la gente normal)
     q1 = series.quantile(0.25)
     q3 = series.quantile(0.75)
@@ -36,13 +66,33 @@ def get_smart_median(data: List[Dict[str, Any]], column: str) -> Dict[str, Any]:
     }
 
 # --- 3. MODA CONTEXTUAL (Ganador + Fuerza) ---
-def get_smart_mode(data: List[Dict[str, Any]], column: str) -> Dict[str, Any]:
+def get_smart_mode(data: List[Dict[str, Any]], column: str, method: str = "exact", top_k: int = 5) -> Dict[str, Any]:
+    """
+    Moda y dominancia. `method="sketch"` usa HyperLogLog + Misra-Gries/count-min
+    (memoria fija, aproximado) y agrega distintos estimados y los `top_k` más
+    frecuentes; conviene en columnas de alta cardinalidad (CUFE, códigos).
+    """
+    if method not in MODE_METHODS:
+        raise ValueError(f"Método no soportado. Usa: {', '.join(MODE_METHODS)}.")
     series = _get_series(data, column).dropna() # Aceptamos texto y números
     if series.empty: raise ValueError("Columna vacía.")
 
+    if method == "sketch":
+        if should_partition(len(series)):
+            sketch = partitioned_sketch(series)
+        else:
+            sketch = ColumnSketch()
+            for start in range(0, len(series), SKETCH_BLOCK_ROWS):
+                sketch.update(series.iloc[start:start + SKETCH_BLOCK_ROWS])
+        return sketch.mode_result(top_k)
+
     # Conteo rápido
-    counts = series.value_counts()
-    total = len(series)
+    if should_partition(len(series)):
+        partial = partitioned_value_counts(series)
+        counts, total = partial.result(), partial.total
+    else:
+        counts = series.value_counts()
+        total = len(series)
     
     if counts.empty: return {"top_value": None, "dominance_pct": 0, "tie": False}
 
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Tuple
+from utils.processor import build_frame, numeric_column
+from engines.visualizers.charts.heatmap import generate_heatmap
+
+CORRELATION_METHODS = ("pearson", "spearman", "covariance")
+MAX_CORRELATION_COLUMNS = int(os.getenv("ANALYTICS_CORRELATION_MAX_COLUMNS", "100"))
+# Pares más fuertes que se resumen en la respuesta
+TOP_PAIRS = 10
+
+
+# --- HELPERS ---
+def _numeric_matrix(df: pd.DataFrame, columns: Optional[List[str]]) -> Tuple[List[str], np.ndarray]:
+    """Matriz filas x columnas (float, NaN = nulo). Sin `columns`, usa las columnas numéricas."""
+    if columns:
+        missing = [c for c in columns if c not in df.columns]
+        if missing: raise ValueError(f"Columnas no encontradas: {', '.join(missing)}.")
+        names = list(dict.fromkeys(columns))
+    else:
+        names = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    if len(names) < 2: raise ValueError("Se necesitan al menos 2 columnas numéricas.")
+    if len(names) > MAX_CORRELATION_COLUMNS:
+        raise ValueError(f"Máximo {MAX_CORRELATION_COLUMNS} columnas por matriz (recibidas {len(names)}).")
+
+    # Montos como texto ("$1.234,56") se parsean con la caché del dataset
+    matrix = np.empty((len(df), len(names)), dtype="float64")
+    for i, name in enumerate(names):
+        matrix[:, i] = numeric_column(df, name).to_numpy(dtype="float64", na_value=np.nan)
+    return [str(n) for n in names], matrix
+
+
+def _pairwise_moments(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Conteos, covarianzas y varianzas pairwise-complete en productos de matrices:
+    cada par (i, j) usa solo las filas donde ambas columnas tienen valor.
+    var[i, j] es la varianza de i sobre las filas del par (i, j).
+    """
+    present = ~np.isnan(matrix)
+    # Centrar por columna evita la cancelación de sumar cuadrados de montos grandes
+    centered = np.where(present, matrix - np.nanmean(matrix, axis=0), 0.0)
+    weights = present.astype("float64")
+
+    count = weights.T @ weights
+    sums = centered.T @ weights               # sums[i, j] = suma de i en las filas del par
+    squares = (centered * centered).T @ weights
+    products = centered.T @ centered
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (products - sums * sums.T / count) / (count - 1)
+        var = (squares - sums * sums / count) / (count - 1)
+    return count, cov, np.maximum(var, 0.0)
+
+
+def _strongest_pairs(names: List[str], values: np.ndarray, count: np.ndarray, limit: int, decimals: int) -> List[Dict[str, Any]]:
+    upper_i, upper_j = np.triu_indices(len(names), k=1)
+    pair_values = values[upper_i, upper_j]
+    valid = ~np.isnan(pair_values)
+    upper_i, upper_j, pair_values = upper_i[valid], upper_j[valid], pair_values[valid]
+    order = np.argsort(-np.abs(pair_values), kind="stable")[:limit]
+    return [
+        {
+            "a": names[upper_i[k]],
+            "b": names[upper_j[k]],
+            "value": round(float(pair_values[k]), decimals),
+            "n": int(count[upper_i[k], upper_j[k]]),
+        }
+        for k in order
+    ]
+
+
+def _compact(values: np.ndarray, decimals: int) -> List[List[Optional[float]]]:
+    rounded = np.round(values, decimals).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+# --- MATRIZ DE CORRELACIÓN / COVARIANZA ---
+def get_correlation_matrix(
+    data: List[Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+    method: str = "pearson",
+    min_periods: int = 2,
+    include_chart: bool = False
+) -> Dict[str, Any]:
+    """
+    Correlación (Pearson, Spearman) o covarianza entre columnas numéricas,
+    calculada como una sola operación matricial con nulos pairwise-complete
+    (igual que DataFrame.corr / DataFrame.cov). Spearman es Pearson sobre los
+    rangos de cada columna (empates promediados). Con `include_chart` agrega
+    el mapa de calor en `image_base64`.
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Método no soportado. Usa: {', '.join(CORRELATION_METHODS)}.")
+    df = build_frame(data)
+    if df.empty: raise ValueError("Dataset vacío.")
+
+    names, matrix = _numeric_matrix(df, columns)
+    if method == "spearman":
+        matrix = pd.DataFrame(matrix).rank(method="average").to_numpy(dtype="float64")
+
+    count, cov, var = _pairwise_moments(matrix)
+    if method == "covariance":
+        values = cov
+        decimals = 6
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+        # La diagonal es 1 exacto si la columna tiene variación
+        diagonal = np.diag(var) > 0
+        values[np.diag_indices_from(values)] = np.where(diagonal, 1.0, np.nan)
+        decimals = 4
+    values[count < max(min_periods, 2)] = np.nan
+
+    result = {
+        "method": method,
+        "columns": names,
+        "matrix": _compact(values, decimals),
+        "rows": int(len(df)),
+        "min_pair_count": int(count.min()),
+        "top_pairs": _strongest_pairs(names, values, count, TOP_PAIRS, decimals),
+    }
+    if include_chart:
+        correlation = method != "covariance"
+        result["image_base64"] = generate_heatmap(
+            result["matrix"], names, f"Matriz de {method}",
+            center=0.0 if correlation else None, bounds=(-1.0, 1.0) if correlation else None
+        )
+    return result
@@ -0,0 +1,183 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Tuple, Union
+from utils.processor import build_frame, numeric_column
+
+BIN_METHODS = ("fixed", "quantile", "fd")
+OUTLIER_METHODS = ("iqr", "zscore", "mad")
+# Umbral por defecto de cada método: k x IQR, |z|, |z modificado| (Iglewicz-Hoaglin)
+DEFAULT_THRESHOLDS = {"iqr": 1.5, "zscore": 3.0, "mad": 3.5}
+MAX_BINS = int(os.getenv("ANALYTICS_HISTOGRAM_MAX_BINS", "1000"))
+MAX_GROUPS = int(os.getenv("ANALYTICS_DISTRIBUTION_MAX_GROUPS", "100"))
+MAX_OUTLIER_INDICES = int(os.getenv("ANALYTICS_OUTLIER_MAX_INDICES", "1000"))
+
+
+# --- HELPERS ---
+def _values_and_groups(data: List[Dict[str, Any]], column: str, group_by: Optional[str]) -> Tuple[pd.Series, np.ndarray, list]:
+    """
+    Valores numéricos (posición original como índice, sin nulos), código de
+    grupo por valor y etiquetas de los grupos. Sin `group_by` hay un solo grupo.
+    """
+    df = build_frame(data)
+    if df.empty or column not in df.columns:
+        raise ValueError(f"Columna '{column}' no encontrada o datos vacíos.")
+    values = numeric_column(df, column).reset_index(drop=True)
+
+    if group_by is None:
+        codes = np.zeros(len(values), dtype=np.int64)
+        labels = [None]
+    else:
+        if group_by not in df.columns: raise ValueError(f"Columna '{group_by}' no existe.")
+        codes, uniques = pd.factorize(df[group_by], sort=True)
+        if len(uniques) > MAX_GROUPS:
+            raise ValueError(f"Máximo {MAX_GROUPS} grupos (la columna '{group_by}' tiene {len(uniques)}).")
+        labels = uniques.tolist()
+
+    # Los nulos (valor o grupo) no participan
+    keep = values.notna().to_numpy() & (codes >= 0)
+    values = values[keep]
+    if values.empty: raise ValueError("Sin datos numéricos.")
+    return values.astype("float64"), codes[keep], labels
+
+
+def _bin_edges(values: np.ndarray, bins: int, method: str) -> np.ndarray:
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    if method == "quantile":
+        # Bins de igual frecuencia; los empates pueden fusionar bordes
+        return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+    if method == "fd":
+        # Freedman-Diaconis: ancho = 2 IQR / n^(1/3), acotado a MAX_BINS bins
+        q1, q3 = np.quantile(values, [0.25, 0.75])
+        width = 2 * (q3 - q1) / np.cbrt(len(values))
+        bins = int(np.ceil((high - low) / width)) if width > 0 else 1
+    return np.linspace(low, high, min(max(bins, 1), MAX_BINS) + 1)
+
+
+def _round_list(values: Union[np.ndarray, List[float]], decimals: int = 4) -> List[float]:
+    return [round(float(v), decimals) for v in values]
+
+
+# --- 1. HISTOGRAMA ---
+def get_histogram(
+    data: List[Dict[str, Any]],
+    column: str,
+    bins: int = 10,
+    method: str = "fixed",
+    group_by: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Histograma de una columna numérica con bins fijos, por cuantiles (igual
+    frecuencia) o Freedman-Diaconis. Con `group_by`, todos los grupos comparten
+    los mismos bordes y se cuentan en una sola pasada (bincount por grupo y bin).
+    """
+    if method not in BIN_METHODS:
+        raise ValueError(f"Método de bins no soportado. Usa: {', '.join(BIN_METHODS)}.")
+    if bins < 1 or bins > MAX_BINS:
+        raise ValueError(f"bins debe estar entre 1 y {MAX_BINS}.")
+
+    series, codes, labels = _values_and_groups(data, column, group_by)
+    values = series.to_numpy()
+    edges = _bin_edges(values, bins, method)
+    n_bins = len(edges) - 1
+
+    # Bin de cada valor; el borde superior es inclusivo (como np.histogram)
+    positions = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_bins - 1)
+    counts = np.bincount(codes * n_bins + positions, minlength=len(labels) * n_bins).reshape(len(labels), n_bins)
+
+    result = {
+        "column": column,
+        "method": method,
+        "bin_edges": _round_list(edges),
+        "counts": counts.sum(axis=0).tolist(),
+        "total": int(len(values)),
+        "skew": round(float(series.skew()), 4) if len(values) > 2 else None,
+    }
+    if group_by is not None:
+        result["groups"] = [
+            {"group": label, "counts": row.tolist(), "total": int(row.sum())}
+            for label, row in zip(labels, counts)
+            if row.sum() > 0
+        ]
+    return result
+
+
+# --- 2. OUTLIERS ---
+def detect_outliers(
+    data: List[Dict[str, Any]],
+    column: str,
+    method: str = "iqr",
+    threshold: Optional[float] = None,
+    group_by: Optional[str] = None,
+    max_indices: int = MAX_OUTLIER_INDICES
+) -> Dict[str, Any]:
+    """
+    Marca outliers por cercas IQR (Q1 - k IQR, Q3 + k IQR), z-score o MAD
+    (z modificado = 0.6745 (x - mediana) / MAD) en una pasada vectorizada;
+    con `group_by` los estadísticos se calculan por grupo. Devuelve las
+    posiciones de fila (0-based, en el orden recibido) de los outliers más
+    extremos primero, no el dataset.
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Método no soportado. Usa: {', '.join(OUTLIER_METHODS)}.")
+    k = DEFAULT_THRESHOLDS[method] if threshold is None else float(threshold)
+    if k <= 0: raise ValueError("threshold debe ser mayor que 0.")
+
+    series, codes, labels = _values_and_groups(data, column, group_by)
+    grouped = series.groupby(codes)
+
+    # Cercas inferior/superior por grupo; `scale` normaliza la severidad
+    if method == "iqr":
+        q1, q3 = grouped.quantile(0.25), grouped.quantile(0.75)
+        iqr = q3 - q1
+        lower, upper, center, scale = q1 - k * iqr, q3 + k * iqr, (q1 + q3) / 2, iqr
+    elif method == "zscore":
+        center, scale = grouped.mean(), grouped.std()
+        lower, upper = center - k * scale, center + k * scale
+    else:
+        center = grouped.median()
+        scale = (series - center.reindex(codes).to_numpy()).abs().groupby(codes).median() / 0.6745
+        lower, upper = center - k * scale, center + k * scale
+
+    values = series.to_numpy()
+    row_lower = lower.reindex(codes).to_numpy()
+    row_upper = upper.reindex(codes).to_numpy()
+    # Grupos sin dispersión (std/IQR/MAD = 0 o NaN) no marcan outliers
+    spread = scale.reindex(codes).to_numpy()
+    flagged = (spread > 0) & ((values < row_lower) | (values > row_upper))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        severity = np.abs(values - center.reindex(codes).to_numpy()) / spread
+    positions = series.index.to_numpy()[flagged]
+    order = np.argsort(-severity[flagged], kind="stable")[:max(0, max_indices)]
+    low = flagged & (values < row_lower)
+
+    result = {
+        "column": column,
+        "method": method,
+        "threshold": k,
+        "total": int(len(values)),
+        "outlier_count": int(flagged.sum()),
+        "outlier_pct": round(float(flagged.mean()) * 100, 2),
+        "low_count": int(low.sum()),
+        "high_count": int(flagged.sum() - low.sum()),
+        "indices": positions[order].tolist(),
+        "values": _round_list(values[flagged][order], 2),
+        "truncated": bool(flagged.sum() > len(order)),
+    }
+    if group_by is None:
+        result["bounds"] = {"lower": round(float(lower.iloc[0]), 4), "upper": round(float(upper.iloc[0]), 4)}
+    else:
+        group_counts = np.bincount(codes[flagged], minlength=len(labels))
+        result["groups"] = [
+            {
+                "group": labels[code],
+                "lower": None if np.isnan(lower[code]) else round(float(lower[code]), 4),
+                "upper": None if np.isnan(upper[code]) else round(float(upper[code]), 4),
+                "outliers": int(group_counts[code]),
+            }
+            for code in lower.index
+        ]
+    return result
@@ -0,0 +1,19 @@
+"""Ejecución particionada en varios procesos (multi-núcleo)."""
+
+from .partitioned import (
+    partitioned_group,
+    partitioned_moments,
+    partitioned_quantiles,
+    partitioned_sketch,
+    partitioned_value_counts,
+    should_partition,
+)
+
+__all__ = [
+    'partitioned_group',
+    'partitioned_moments',
+    'partitioned_quantiles',
+    'partitioned_sketch',
+    'partitioned_value_counts',
+    'should_partition',
+]
@@ -0,0 +1,270 @@
+"""
+Ejecución particionada multi-núcleo de agrupaciones y estadísticas.
+
+pandas agrupa y calcula estadísticos en un solo núcleo. Por encima de
+`ANALYTICS_PARALLEL_MIN_ROWS` filas, `group_and_aggregate` y las estadísticas
+de `engines.descriptive.central` reparten el trabajo así:
+
+1. Las columnas necesarias se publican UNA vez como archivo Arrow IPC en
+   memoria compartida (`/dev/shm`); cada proceso lo abre con memory map y lee
+   su rango de filas sin copiarlo ni recibirlo por pickle.
+2. Cada proceso calcula un agregado parcial combinable de su partición
+   (`engines.chunked.partials`: sum/count por grupo, momentos, frecuencias,
+   histogramas de rangos).
+3. El proceso del request combina los parciales (pequeños) en el resultado.
+
+Los resultados coinciden con la ejecución en un solo proceso (salvo el
+redondeo de las sumas en coma flotante, que se acumulan en otro orden).
+Columnas que Arrow no puede representar (ej: tipos mezclados) se calculan
+en el proceso del request.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engines.chunked.partials import GroupPartial, Moments, RankSelector, ValueCounts, quantile_ranks
+from engines.chunked.sketches import ColumnSketch
+from utils.instrumentation import stage
+from utils.jobs import report_progress
+from utils.memory_budget import track_allocation
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+
+def _default_workers() -> int:
+    # Los núcleos se reparten entre los workers de uvicorn
+    workers = max(1, int(os.getenv("ANALYTICS_WORKERS", "1")))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+PARALLEL_MIN_ROWS = int(os.getenv("ANALYTICS_PARALLEL_MIN_ROWS", "2000000"))
+PARALLEL_WORKERS = int(os.getenv("ANALYTICS_PARALLEL_WORKERS", str(_default_workers())))
+# forkserver: los procesos no heredan los hilos (ni los locks) del servidor
+START_METHOD = os.getenv(
+    "ANALYTICS_PARALLEL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+SHARED_DIR = os.getenv("ANALYTICS_PARALLEL_SHARED_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) if pa is not None else ()
+
+
+def should_partition(rows: int) -> bool:
+    """True si un cálculo de `rows` filas debe repartirse entre procesos."""
+    return pa is not None and PARALLEL_WORKERS > 1 and rows >= PARALLEL_MIN_ROWS
+
+
+# ==========================================
+# 1. POOL DE PROCESOS
+# ==========================================
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == "forkserver":
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS, mp_context=context)
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ==========================================
+# 2. KERNELS (se ejecutan en cada partición)
+# ==========================================
+def _kernel_group(frame: pd.DataFrame) -> pd.DataFrame:
+    return GroupPartial.summarize(frame["k"], frame["v"])
+
+
+def _kernel_moments(frame: pd.DataFrame) -> Moments:
+    moments = Moments()
+    moments.update(frame["v"].to_numpy(dtype="float64"))
+    return moments
+
+
+def _kernel_tally(frame: pd.DataFrame, plan: List[Dict[str, Any]], bins: int) -> List[tuple]:
+    return RankSelector.tally(plan, frame["v"].to_numpy(dtype="float64"), bins)
+
+
+def _kernel_counts(frame: pd.DataFrame) -> pd.Series:
+    return frame["v"].value_counts(sort=False)
+
+
+def _kernel_sketch(frame: pd.DataFrame) -> ColumnSketch:
+    sketch = ColumnSketch()
+    sketch.update(frame["v"])
+    return sketch
+
+
+_KERNELS: Dict[str, Callable[..., Any]] = {
+    "group": _kernel_group,
+    "moments": _kernel_moments,
+    "tally": _kernel_tally,
+    "counts": _kernel_counts,
+    "sketch": _kernel_sketch,
+}
+
+
+def _run_partition(path: str, start: int, stop: int, kernel: str, args: tuple) -> Any:
+    # Lectura por memory map: el rango de filas no se copia hasta to_pandas
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all().slice(start, stop - start)
+    return _KERNELS[kernel](table.to_pandas(), *args)
+
+
+# ==========================================
+# 3. FRAME COMPARTIDO
+# ==========================================
+def partition_bounds(rows: int, parts: int) -> List[Tuple[int, int]]:
+    """Rangos [inicio, fin) de `parts` particiones de tamaño similar."""
+    edges = np.linspace(0, rows, max(1, min(parts, rows)) + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+class SharedFrame:
+    """
+    Frame publicado en memoria compartida para los procesos del pool. Si Arrow
+    no puede representarlo, `path` es None y los kernels corren en el proceso
+    actual sobre el frame completo.
+    """
+
+    def __init__(self, frame: pd.DataFrame, workers: Optional[int] = None):
+        self.frame = frame
+        self.workers = max(1, workers or PARALLEL_WORKERS)
+        self.path: Optional[str] = None
+        if self.workers < 2:
+            return
+        with stage("share"):
+            try:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+            except _ARROW_ERRORS:
+                return
+            track_allocation(table.nbytes)
+            fd, path = tempfile.mkstemp(prefix="analytics-partition-", suffix=".arrow", dir=SHARED_DIR)
+            try:
+                with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            except BaseException:
+                os.unlink(path)
+                raise
+            self.path = path
+
+    def __enter__(self) -> "SharedFrame":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.path is not None:
+            os.unlink(self.path)
+            self.path = None
+
+    def map(self, kernel: str, *args: Any) -> List[Any]:
+        """Parciales del kernel, uno por partición y en orden de filas."""
+        if self.path is None:
+            return [_KERNELS[kernel](self.frame, *args)]
+        pool = _get_pool()
+        bounds = partition_bounds(len(self.frame), self.workers)
+        try:
+            futures = [
+                pool.submit(_run_partition, self.path, start, stop, kernel, args)
+                for start, stop in bounds
+            ]
+            try:
+                parts = []
+                for future, (start, stop) in zip(futures, bounds):
+                    parts.append(future.result())
+                    report_progress(stop - start)
+                return parts
+            finally:
+                for future in futures:
+                    future.cancel()
+        except BrokenProcessPool:
+            # Un proceso murió (ej: OOM killer): el próximo request crea otro pool
+            _reset_pool()
+            raise RuntimeError("La ejecución particionada falló (un proceso del pool terminó inesperadamente).")
+
+
+# ==========================================
+# 4. OPERACIONES
+# ==========================================
+def partitioned_group(keys: pd.Series, values: pd.Series, operation: str,
+                      workers: Optional[int] = None) -> pd.DataFrame:
+    """Equivalente a `values.groupby(keys).<operation>().reset_index()` (sin nulos)."""
+    partial = GroupPartial(operation)
+    with SharedFrame(pd.DataFrame({"k": keys.array, "v": values.array}), workers) as shared:
+        with stage("partitions"):
+            for part in shared.map("group"):
+                partial.merge(part)
+    return partial.result(keys.name, values.name)
+
+
+def partitioned_moments(values: pd.Series, workers: Optional[int] = None) -> Moments:
+    """Conteo, media, desviación, mínimo y máximo de una serie numérica sin nulos."""
+    moments = Moments()
+    with SharedFrame(pd.DataFrame({"v": values.to_numpy(dtype="float64")}), workers) as shared:
+        with stage("partitions"):
+            for part in shared.map("moments"):
+                moments.merge(part)
+    return moments
+
+
+def partitioned_quantiles(values: pd.Series, quantiles: Sequence[float],
+                          workers: Optional[int] = None) -> List[float]:
+    """Cuantiles exactos (interpolación lineal, como pandas) de una serie numérica sin nulos."""
+    with SharedFrame(pd.DataFrame({"v": values.to_numpy(dtype="float64")}), workers) as shared:
+        with stage("partitions"):
+            moments = Moments()
+            for part in shared.map("moments"):
+                moments.merge(part)
+            ranks = []
+            for q in quantiles:
+                lower, upper, _ = quantile_ranks(moments.count, q)
+                ranks += [lower, upper]
+            selector = RankSelector(ranks, moments.count, moments.minimum, moments.maximum)
+            # Cada pasada: histogramas por partición en paralelo, reducción aquí
+            while selector.pending:
+                selector.start_pass()
+                for observations in shared.map("tally", selector.plan(), selector.bins):
+                    selector.absorb(observations)
+                selector.finish_pass()
+    return [selector.quantile(moments.count, q) for q in quantiles]
+
+
+def partitioned_value_counts(series: pd.Series, workers: Optional[int] = None) -> ValueCounts:
+    """Frecuencias de una serie sin nulos (mismo orden que `Series.value_counts`)."""
+    counts = ValueCounts()
+    with SharedFrame(pd.DataFrame({"v": series.array}), workers) as shared:
+        with stage("partitions"):
+            for part in shared.map("counts"):
+                counts.merge(part)
+    return counts
+
+
+def partitioned_sketch(series: pd.Series, workers: Optional[int] = None) -> ColumnSketch:
+    """Sketch de distintos y valores frecuentes de una serie sin nulos (un sketch por partición, combinados)."""
+    sketch = ColumnSketch()
+    with SharedFrame(pd.DataFrame({"v": series.array}), workers) as shared:
+        with stage("partitions"):
+            for part in shared.map("sketch"):
+                sketch.merge(part)
+    return sketch
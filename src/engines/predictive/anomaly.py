@@ -0,0 +1,316 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import List, Dict, Any, Optional, Tuple
+from utils.processor import build_frame, date_column, numeric_column
+
+ANOMALY_METHODS = ("rolling_mad", "seasonal_zscore")
+AGGREGATIONS = ("sum", "count", "mean")
+# Tamaño del bucket -> frecuencia de pandas (Period)
+BUCKET_FREQS = {"hour": "h", "day": "D", "week": "W", "month": "M"}
+DEFAULT_THRESHOLDS = {"rolling_mad": 3.5, "seasonal_zscore": 3.0}
+MAD_SCALE = 1.4826  # MAD -> desviación estándar bajo normalidad
+MAX_SERIES = int(os.getenv("ANALYTICS_ANOMALY_MAX_SERIES", "5000"))
+MAX_ANOMALIES = int(os.getenv("ANALYTICS_ANOMALY_MAX_RESULTS", "1000"))
+# Elementos (buckets x series x ventana) por bloque del cálculo batch
+BLOCK_CELLS = 4_000_000
+STATE_VERSION = 1
+
+
+# ==========================================
+# 1. PARÁMETROS Y BASELINE (compartido batch / streaming)
+# ==========================================
+def _settings(method: str, bucket: str, agg: str, window: int, season: int, threshold: Optional[float]) -> Dict[str, Any]:
+    if method not in ANOMALY_METHODS: raise ValueError(f"Método no soportado. Usa: {', '.join(ANOMALY_METHODS)}.")
+    if bucket not in BUCKET_FREQS: raise ValueError(f"Bucket no soportado. Usa: {', '.join(BUCKET_FREQS)}.")
+    if agg not in AGGREGATIONS: raise ValueError(f"Agregación no soportada. Usa: {', '.join(AGGREGATIONS)}.")
+    if window < 3: raise ValueError("window debe ser al menos 3 buckets.")
+    if method == "seasonal_zscore" and (season < 1 or window // season < 2):
+        raise ValueError("Con seasonal_zscore, window debe cubrir al menos 2 temporadas (window >= 2 x season).")
+    return {
+        "method": method, "bucket": bucket, "agg": agg, "window": int(window), "season": int(season),
+        "threshold": float(DEFAULT_THRESHOLDS[method] if threshold is None else threshold),
+    }
+
+
+def _min_history(settings: Dict[str, Any]) -> int:
+    if settings["method"] == "rolling_mad":
+        return max(3, settings["window"] // 2)
+    return max(2, settings["window"] // settings["season"] // 2)
+
+
+def _baseline(history: np.ndarray, settings: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Valor esperado, escala y observaciones a partir de la historia (último eje,
+    del bucket más antiguo al más reciente, NaN = sin dato):
+    - rolling_mad: mediana y 1.4826 x MAD de los últimos `window` buckets.
+    - seasonal_zscore: media y desviación de los buckets de la misma posición
+      estacional (t - season, t - 2 season, ...) dentro de la ventana.
+    """
+    if settings["method"] == "seasonal_zscore":
+        season = settings["season"]
+        history = history[..., ::-1][..., season - 1::season]
+    count = np.count_nonzero(~np.isnan(history), axis=-1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # ventanas sin datos
+        if settings["method"] == "rolling_mad":
+            expected = np.nanmedian(history, axis=-1)
+            scale = MAD_SCALE * np.nanmedian(np.abs(history - expected[..., None]), axis=-1)
+        else:
+            expected = np.nanmean(history, axis=-1)
+            scale = np.nanstd(history, axis=-1, ddof=1)
+    return expected, scale, count
+
+
+def _scores(values: np.ndarray, history: np.ndarray, settings: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(valor esperado, z) por bucket; z es NaN sin historia suficiente o sin dispersión."""
+    expected, scale, count = _baseline(history, settings)
+    valid = (count >= _min_history(settings)) & (scale > 0) & ~np.isnan(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(valid, (values - expected) / scale, np.nan)
+    return expected, score
+
+
+def _anomaly(series: Any, ordinal: int, value: float, expected: float, score: float, settings: Dict[str, Any]) -> Dict[str, Any]:
+    period = pd.Period(ordinal=int(ordinal), freq=BUCKET_FREQS[settings["bucket"]])
+    return {
+        "series": series,
+        "bucket": period.start_time.isoformat(),
+        "value": round(float(value), 2),
+        "expected": round(float(expected), 2),
+        "score": round(float(score), 2),
+        "direction": "alto" if score > 0 else "bajo",
+    }
+
+
+def _bucket_value(total: float, count: int, agg: str) -> float:
+    if agg == "count":
+        return float(count)
+    if agg == "mean":
+        return total / count if count else np.nan
+    return total
+
+
+def _limit(anomalies: List[Dict[str, Any]], max_anomalies: int) -> Tuple[List[Dict[str, Any]], bool]:
+    # Lo más reciente y más anómalo primero
+    anomalies.sort(key=lambda a: (a["bucket"], abs(a["score"])), reverse=True)
+    limit = max(0, min(max_anomalies, MAX_ANOMALIES))
+    return anomalies[:limit], len(anomalies) > limit
+
+
+# ==========================================
+# 2. PREPARACIÓN (buckets por serie)
+# ==========================================
+def _bucket_points(data: List[Dict[str, Any]], date_col: str, value_col: Optional[str],
+                   series_col: Optional[str], settings: Dict[str, Any]) -> pd.DataFrame:
+    """Suma y conteo por (serie, bucket): columnas series, ordinal, total, count."""
+    df = build_frame(data)
+    if df.empty: raise ValueError("Dataset vacío.")
+    for column in (date_col, value_col, series_col):
+        if column is not None and column not in df.columns:
+            raise ValueError(f"Columna '{column}' no existe.")
+    if value_col is None and settings["agg"] != "count":
+        raise ValueError("value_col es obligatorio salvo con agg='count'.")
+
+    dates = date_column(df, date_col)
+    values = numeric_column(df, value_col) if value_col else pd.Series(1.0, index=df.index)
+    keys = df[series_col] if series_col else pd.Series("total", index=df.index)
+    keep = (dates.notna() & values.notna() & keys.notna()).to_numpy()
+    if not keep.any(): raise ValueError("Sin puntos con fecha y valor válidos.")
+
+    points = pd.DataFrame({
+        "series": keys[keep].to_numpy(),
+        "ordinal": dates[keep].dt.to_period(BUCKET_FREQS[settings["bucket"]]).array.asi8,
+        "total": values[keep].to_numpy(dtype="float64"),
+    })
+    grouped = points.groupby(["series", "ordinal"], sort=True, observed=True)["total"].agg(["sum", "count"])
+    return grouped.rename(columns={"sum": "total"}).reset_index()
+
+
+# ==========================================
+# 3. BATCH (muchas series en una llamada)
+# ==========================================
+def detect_anomalies(
+    data: List[Dict[str, Any]],
+    date_col: str,
+    value_col: Optional[str] = None,
+    series_col: Optional[str] = None,
+    bucket: str = "day",
+    agg: str = "sum",
+    method: str = "rolling_mad",
+    window: int = 28,
+    season: int = 7,
+    threshold: Optional[float] = None,
+    max_anomalies: int = 100,
+    return_state: bool = False
+) -> Dict[str, Any]:
+    """
+    Agrega los puntos en buckets de tiempo por serie (ej: total diario por
+    cliente) y marca los buckets cuyo valor se aleja del baseline de su
+    historia reciente (mediana/MAD móvil o z-score estacional). Todas las
+    series se evalúan juntas sobre una matriz buckets x series. Los buckets
+    sin puntos valen 0 con sum/count (un día sin facturas también puede ser
+    anómalo) y quedan vacíos con mean.
+    Con `return_state`, devuelve el estado para seguir con `update_anomaly_state`.
+    """
+    settings = _settings(method, bucket, agg, window, season, threshold)
+    grouped = _bucket_points(data, date_col, value_col, series_col, settings)
+
+    codes, labels = pd.factorize(grouped["series"], sort=True)
+    if len(labels) > MAX_SERIES:
+        raise ValueError(f"Máximo {MAX_SERIES} series por llamada (recibidas {len(labels)}).")
+    ordinals = grouped["ordinal"].to_numpy()
+    start = int(ordinals.min())
+    rows = int(ordinals.max()) - start + 1
+    if agg == "mean":
+        values = (grouped["total"] / grouped["count"]).to_numpy(dtype="float64")
+    else:
+        values = grouped["count" if agg == "count" else "total"].to_numpy(dtype="float64")
+
+    # Matriz buckets x series; antes del primer bucket de cada serie no hay historia
+    wide = np.full((rows, len(labels)), 0.0 if agg != "mean" else np.nan)
+    wide[ordinals - start, codes] = values
+    first = grouped.groupby(codes)["ordinal"].min().to_numpy() - start
+    wide[np.arange(rows)[:, None] < first[None, :]] = np.nan
+
+    w = settings["window"]
+    padded = np.vstack([np.full((w, len(labels)), np.nan), wide])
+    expected = np.empty_like(wide)
+    score = np.empty_like(wide)
+    # Bloques de series para acotar la memoria de las ventanas (buckets x series x window)
+    block = max(1, BLOCK_CELLS // max(1, rows * w))
+    for lo in range(0, len(labels), block):
+        history = sliding_window_view(padded[:, lo:lo + block], w, axis=0)[:rows]
+        expected[:, lo:lo + block], score[:, lo:lo + block] = _scores(wide[:, lo:lo + block], history, settings)
+
+    with np.errstate(invalid="ignore"):
+        flagged_rows, flagged_cols = np.nonzero(np.abs(score) > settings["threshold"])
+    names = labels.tolist()
+    anomalies = [
+        _anomaly(names[c], start + r, wide[r, c], expected[r, c], score[r, c], settings)
+        for r, c in zip(flagged_rows, flagged_cols)
+    ]
+    total_anomalies = len(anomalies)
+    anomalies, truncated = _limit(anomalies, max_anomalies)
+
+    result = {
+        "method": method,
+        "bucket": bucket,
+        "series_count": int(len(labels)),
+        "buckets": rows,
+        "anomaly_count": total_anomalies,
+        "anomalies": anomalies,
+        "truncated": truncated,
+    }
+    if return_state:
+        result["state"] = _state_from_batch(grouped, codes, labels, wide, start, settings)
+    return result
+
+
+def _state_from_batch(grouped: pd.DataFrame, codes: np.ndarray, labels: pd.Index, wide: np.ndarray,
+                      start: int, settings: Dict[str, Any]) -> Dict[str, Any]:
+    # El último bucket del lote queda abierto: puede seguir recibiendo puntos
+    last = len(wide) - 1
+    totals = grouped[grouped["ordinal"] == start + last]
+    partial = {code: (t, c) for code, t, c in zip(codes[totals.index], totals["total"], totals["count"])}
+    history = wide[max(0, last - settings["window"]):last]
+    series = {}
+    for code, label in enumerate(labels):
+        total, count = partial.get(code, (0.0, 0))
+        series[str(label)] = {
+            "bucket": start + last,
+            "total": float(total),
+            "count": int(count),
+            "history": [None if np.isnan(v) else float(v) for v in history[:, code]],
+        }
+    return {"version": STATE_VERSION, **settings, "series": series}
+
+
+# ==========================================
+# 4. STREAMING (estado incremental)
+# ==========================================
+def _close_bucket(label: str, entry: Dict[str, Any], value: float, settings: Dict[str, Any],
+                  anomalies: List[Dict[str, Any]]) -> None:
+    """Evalúa el bucket abierto con su historia y lo agrega a la ventana."""
+    history = np.array([np.nan if v is None else v for v in entry["history"]], dtype="float64")
+    padded = np.concatenate([np.full(settings["window"] - len(history), np.nan), history])
+    expected, score = _scores(np.array(value), padded, settings)
+    if abs(score) > settings["threshold"]:
+        anomalies.append(_anomaly(label, entry["bucket"], value, expected, score, settings))
+    entry["history"] = (entry["history"] + [None if np.isnan(value) else float(value)])[-settings["window"]:]
+
+
+def update_anomaly_state(
+    data: List[Dict[str, Any]],
+    date_col: str,
+    value_col: Optional[str] = None,
+    series_col: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None,
+    bucket: str = "day",
+    agg: str = "sum",
+    method: str = "rolling_mad",
+    window: int = 28,
+    season: int = 7,
+    threshold: Optional[float] = None,
+    flush: bool = False,
+    max_anomalies: int = 100
+) -> Dict[str, Any]:
+    """
+    Actualiza el detector con puntos nuevos sin recalcular la historia. El
+    estado (JSON, lo guarda el cliente) tiene por serie el bucket abierto y los
+    últimos `window` valores cerrados: cada bucket nuevo cuesta lo mismo sin
+    importar cuánta historia haya. Un bucket se evalúa al cerrarse (llega un
+    punto de un bucket posterior, o `flush`). Los puntos de buckets ya cerrados
+    se cuentan como tardíos y se ignoran.
+    Sin `state` se inicia con los parámetros dados; con `state`, se usan los suyos.
+    """
+    if state:
+        if state.get("version") != STATE_VERSION: raise ValueError("Estado de detector inválido o de otra versión.")
+        settings = _settings(state["method"], state["bucket"], state["agg"], state["window"], state["season"], state["threshold"])
+        series_state = {key: dict(entry) for key, entry in state["series"].items()}
+    else:
+        settings = _settings(method, bucket, agg, window, season, threshold)
+        series_state = {}
+
+    anomalies: List[Dict[str, Any]] = []
+    late = 0
+    fill = np.nan if settings["agg"] == "mean" else 0.0
+    if data is not None and len(data) > 0:
+        grouped = _bucket_points(data, date_col, value_col, series_col, settings)
+        for label, ordinal, total, count in zip(grouped["series"].astype(str), grouped["ordinal"], grouped["total"], grouped["count"]):
+            ordinal = int(ordinal)
+            entry = series_state.get(label)
+            if entry is None:
+                series_state[label] = {"bucket": ordinal, "total": float(total), "count": int(count), "history": []}
+                continue
+            if ordinal < entry["bucket"]:
+                late += int(count)
+                continue
+            if ordinal > entry["bucket"]:
+                _close_bucket(label, entry, _bucket_value(entry["total"], entry["count"], settings["agg"]), settings, anomalies)
+                # Buckets sin puntos: después de `window` buckets vacíos la historia ya no cambia
+                gap = ordinal - entry["bucket"] - 1
+                for offset in range(min(gap, settings["window"])):
+                    entry["bucket"] += 1
+                    _close_bucket(label, entry, fill, settings, anomalies)
+                entry.update(bucket=ordinal, total=0.0, count=0)
+            entry["total"] += float(total)
+            entry["count"] += int(count)
+
+    if flush:
+        for label, entry in series_state.items():
+            _close_bucket(label, entry, _bucket_value(entry["total"], entry["count"], settings["agg"]), settings, anomalies)
+            entry.update(bucket=entry["bucket"] + 1, total=0.0, count=0)
+
+    total_anomalies = len(anomalies)
+    anomalies, truncated = _limit(anomalies, max_anomalies)
+    return {
+        "series_count": len(series_state),
+        "anomaly_count": total_anomalies,
+        "anomalies": anomalies,
+        "truncated": truncated,
+        "late_points": late,
+        "state": {"version": STATE_VERSION, **settings, "series": series_state},
+    }
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
+from utils.processor import build_frame, numeric_column
 
 def analytics_linear_forecast(
     data: List[Dict[str, Any]], 
@@ -8,11 +9,11 @@ def analytics_linear_forecast(
     y_col: str, 
     periods: int = 3
 ) -> Dict[str, Any]:
-    df = pd.DataFrame(data)
+    df = build_frame(data)
     if df.empty: raise ValueError("Dataset vacío.")
 
     # Limpieza
-    df[y_col] = pd.to_numeric(df[y_col], errors='coerce')
+    df[y_col] = numeric_column(df, y_col)
     df = df.dropna(subset=[y_col])
 
     # Preparamos X e Y numéricos para el cálculo
@@ -1,5 +1,6 @@
 """Reconciliation engines for cross-referencing datasets."""
 
 from .reconcile_engine import reconcile_datasets
+from .tolerance import match_unkeyed
 
-__all__ = ['reconcile_datasets']
+__all__ = ['reconcile_datasets', 'match_unkeyed']
@@ -6,15 +6,24 @@ to find discrepancies, missing records, or intersections.
 Designed for fiscal reconciliation between SAP and DIAN data.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 
+import pandas as pd
 
-def find_column(dataset: List[Dict[str, Any]], target_name: str) -> str:
+from utils.serialization import shape_frame, shape_records, OUTPUT_SHAPES
+from engines.reconcile.tolerance import match_unkeyed
+
+Dataset = Union[List[Dict[str, Any]], pd.DataFrame]
+
+VALID_MODES = ("missing_in_a", "missing_in_b", "intersection")
+
+
+def find_column(dataset: Dataset, target_name: str) -> str:
     """
     Find a column name in the dataset using case-insensitive search.
     
     Args:
-        dataset: List of dictionaries representing the dataset
+        dataset: List of dictionaries or DataFrame representing the dataset
         target_name: Name of the column to find (case-insensitive)
         
     Returns:
@@ -23,19 +32,22 @@ def find_column(dataset: List[Dict[str, Any]], target_name: str) -> str:
     Raises:
         ValueError: If the column is not found in the dataset
     """
-    if not dataset or len(dataset) == 0:
+    if dataset is None or len(dataset) == 0:
         raise ValueError("Dataset is empty, cannot find columns")
     
-    # Get column names from the first record
-    sample_record = dataset[0]
+    # Get column names from the frame, or from the first record
+    if isinstance(dataset, pd.DataFrame):
+        column_names = [str(c) for c in dataset.columns]
+    else:
+        column_names = list(dataset[0].keys())
     
     # Case-insensitive search
-    for column_name in sample_record.keys():
+    for column_name in column_names:
         if column_name.lower() == target_name.lower():
             return column_name
     
     # Column not found
-    available_columns = ", ".join(sample_record.keys())
+    available_columns = ", ".join(column_names)
     raise ValueError(
         f"Column '{target_name}' not found in dataset. "
         f"Available columns: {available_columns}"
@@ -83,31 +95,185 @@ def build_key_index(
         # Normalize the key and add to index
         normalized_key = normalize_key_value(key_value)
         
-        # Add source information to the record for tracking
-        record_with_source = record.copy()
-        index[normalized_key] = record_with_source
+        # Keep a reference to the original record (no copy): results are
+        # read-only, and copying doubled memory on large reconciliations
+        index[normalized_key] = record
     
     return index
 
 
-def reconcile_datasets(
+def build_key_series(df: pd.DataFrame, key_column: str) -> pd.Series:
+    """
+    Vectorized counterpart of build_key_index for DataFrames.
+    
+    Args:
+        df: DataFrame to index
+        key_column: The actual column name to use as the key
+        
+    Returns:
+        Series of normalized keys aligned with df (NaN where the key is missing or empty)
+    """
+    raw = df[key_column]
+    keys = raw.astype(str).str.strip().str.lower()
+    valid = raw.notna() & (raw.astype(str) != "")
+    return keys.where(valid)
+
+
+def reconcile_frames(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    column_a: str,
+    column_b: str,
+    mode: str
+) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Set operations over DataFrames with the same semantics as the dict path:
+    rows without key are skipped and, for duplicated keys, the last row wins.
+    
+    Returns:
+        (result rows, number of valid keys in A, number of valid keys in B)
+    """
+    keys_a = build_key_series(df_a, column_a)
+    keys_b = build_key_series(df_b, column_b)
+    
+    # Last occurrence of every valid key (same as overwriting a dict index)
+    last_a = keys_a.notna() & ~keys_a.duplicated(keep="last")
+    last_b = keys_b.notna() & ~keys_b.duplicated(keep="last")
+    unique_a = keys_a[last_a]
+    unique_b = keys_b[last_b]
+    
+    if mode == "missing_in_a":
+        rows = df_b[last_b & ~keys_b.isin(unique_a)]
+    elif mode == "missing_in_b":
+        rows = df_a[last_a & ~keys_a.isin(unique_b)]
+    else:  # intersection
+        rows = df_a[last_a & keys_a.isin(unique_b)]
+    
+    return rows, len(unique_a), len(unique_b)
+
+
+def _reconcile_records(
     data_a: List[Dict[str, Any]],
     data_b: List[Dict[str, Any]],
+    resolved_column_a: str,
+    resolved_column_b: str,
+    mode: str,
+    output_shape: str
+) -> Tuple[Any, int, int, int]:
+    """
+    Hash map path for list-of-dict inputs.
+    
+    Returns:
+        (shaped result data, result count, valid keys in A, valid keys in B)
+    """
+    # ========================================
+    # 3. BUILD HASH MAP INDEXES (O(1) Lookup)
+    # ========================================
+    index_a = build_key_index(data_a, resolved_column_a)
+    index_b = build_key_index(data_b, resolved_column_b)
+    
+    keys_a = set(index_a.keys())
+    keys_b = set(index_b.keys())
+    
+    # ========================================
+    # 4. SET OPERATIONS
+    # ========================================
+    if mode == "missing_in_a":
+        # Records in B that are NOT in A
+        diff_keys = keys_b - keys_a
+        source_index = index_b
+        source_name = "B"
+    elif mode == "missing_in_b":
+        # Records in A that are NOT in B
+        diff_keys = keys_a - keys_b
+        source_index = index_a
+        source_name = "A"
+    else:  # intersection
+        # Records that exist in BOTH datasets
+        diff_keys = keys_a & keys_b
+        source_index = index_a
+        source_name = "Both"
+    
+    # ========================================
+    # 5. BUILD RESULT SET
+    # ========================================
+    result_records = []
+    for key in diff_keys:
+        record = source_index[key]
+        result_records.append(record)
+    
+    return shape_records(result_records, output_shape), len(result_records), len(keys_a), len(keys_b)
+
+
+def build_summary(mode: str, count: int) -> str:
+    """
+    Human-readable summary of a reconciliation result.
+    
+    Args:
+        mode: Operation mode used
+        count: Number of records in the result
+        
+    Returns:
+        Summary sentence (in Spanish, shown to end users)
+    """
+    if mode == "missing_in_a":
+        return (
+            f"Reconciliación completada. Se encontraron {count} documentos "
+            f"en el conjunto B (DIAN/Externo) que NO están en el conjunto A (SAP/Base)."
+        )
+    if mode == "missing_in_b":
+        return (
+            f"Reconciliación completada. Se encontraron {count} documentos "
+            f"en el conjunto A (SAP/Base) que NO están en el conjunto B (DIAN/Externo)."
+        )
+    # intersection
+    return (
+        f"Reconciliación completada. Se encontraron {count} documentos "
+        f"que coinciden en AMBOS conjuntos."
+    )
+
+
+def reconcile_datasets(
+    data_a: Dataset,
+    data_b: Dataset,
     key_column_a: Optional[str] = None,
     key_column_b: Optional[str] = None,
     key_column: str = "CUFE",
-    mode: str = "missing_in_a"
+    mode: str = "missing_in_a",
+    output_shape: str = "records",
+    counterparty_column_a: Optional[str] = None,
+    counterparty_column_b: Optional[str] = None,
+    amount_column_a: Optional[str] = None,
+    amount_column_b: Optional[str] = None,
+    date_column_a: Optional[str] = None,
+    date_column_b: Optional[str] = None,
+    amount_tolerance: float = 1.0,
+    amount_tolerance_pct: float = 0.0,
+    date_tolerance_days: int = 3
 ) -> Dict[str, Any]:
     """
     Reconcile two datasets to find differences or intersections.
     
+    When the counterparty, amount and date columns are given, records that
+    the key pass cannot match (empty key on at least one side) go through a
+    tolerance pass (see engines.reconcile.tolerance) and are reported under
+    "probable_matches"; the key-based result does not change.
+    
     Args:
-        data_a: First dataset (e.g., SAP invoices)
-        data_b: Second dataset (e.g., DIAN documents)
+        data_a: First dataset (e.g., SAP invoices), list of dicts or DataFrame
+        data_b: Second dataset (e.g., DIAN documents), list of dicts or DataFrame
         key_column_a: Column name in dataset A (optional, fallback to key_column)
         key_column_b: Column name in dataset B (optional, fallback to key_column)
         key_column: Fallback column name if specific columns not provided
         mode: Operation mode - "missing_in_a", "missing_in_b", or "intersection"
+        output_shape: "records" (list of dicts) or "columnar" ({columns, data})
+        counterparty_column_a: Counterparty (NIT) column in A; enables the tolerance pass
+        counterparty_column_b: Counterparty column in B (defaults to the A name)
+        amount_column_a / amount_column_b: Amount columns (B defaults to the A name)
+        date_column_a / date_column_b: Date columns (B defaults to the A name)
+        amount_tolerance: Absolute amount tolerance for probable matches
+        amount_tolerance_pct: Relative amount tolerance (0.01 = 1%)
+        date_tolerance_days: Maximum distance in days for probable matches
         
     Returns:
         Dictionary with reconciliation results including summary and matched records
@@ -118,10 +284,10 @@ def reconcile_datasets(
     # ========================================
     # 1. INPUT VALIDATION
     # ========================================
-    if not data_a or not isinstance(data_a, list):
+    if not isinstance(data_a, (list, pd.DataFrame)) or len(data_a) == 0:
         raise ValueError("data_a must be a non-empty list of dictionaries")
     
-    if not data_b or not isinstance(data_b, list):
+    if not isinstance(data_b, (list, pd.DataFrame)) or len(data_b) == 0:
         raise ValueError("data_b must be a non-empty list of dictionaries")
     
     if len(data_a) == 0:
@@ -131,10 +297,14 @@ def reconcile_datasets(
         raise ValueError("data_b is empty")
     
     # Validate mode
-    valid_modes = ["missing_in_a", "missing_in_b", "intersection"]
-    if mode not in valid_modes:
+    if mode not in VALID_MODES:
         raise ValueError(
-            f"Invalid mode '{mode}'. Must be one of: {', '.join(valid_modes)}"
+            f"Invalid mode '{mode}'. Must be one of: {', '.join(VALID_MODES)}"
+        )
+    
+    if output_shape not in OUTPUT_SHAPES:
+        raise ValueError(
+            f"Invalid output_shape '{output_shape}'. Must be one of: {', '.join(OUTPUT_SHAPES)}"
         )
     
     # ========================================
@@ -156,76 +326,120 @@ def reconcile_datasets(
         raise ValueError(f"Error in dataset B: {str(e)}")
     
     # ========================================
-    # 3. BUILD HASH MAP INDEXES (O(1) Lookup)
-    # ========================================
-    index_a = build_key_index(data_a, resolved_column_a)
-    index_b = build_key_index(data_b, resolved_column_b)
-    
-    keys_a = set(index_a.keys())
-    keys_b = set(index_b.keys())
-    
-    # ========================================
-    # 4. SET OPERATIONS
+    # 3-5. VECTORIZED PATH (DataFrame inputs)
     # ========================================
-    if mode == "missing_in_a":
-        # Records in B that are NOT in A
-        diff_keys = keys_b - keys_a
-        source_index = index_b
-        source_name = "B"
-    elif mode == "missing_in_b":
-        # Records in A that are NOT in B
-        diff_keys = keys_a - keys_b
-        source_index = index_a
-        source_name = "A"
-    else:  # intersection
-        # Records that exist in BOTH datasets
-        diff_keys = keys_a & keys_b
-        source_index = index_a
-        source_name = "Both"
+    if isinstance(data_a, pd.DataFrame) or isinstance(data_b, pd.DataFrame):
+        df_a = data_a if isinstance(data_a, pd.DataFrame) else pd.DataFrame(data_a)
+        df_b = data_b if isinstance(data_b, pd.DataFrame) else pd.DataFrame(data_b)
+        result_rows, valid_keys_a, valid_keys_b = reconcile_frames(
+            df_a, df_b, resolved_column_a, resolved_column_b, mode
+        )
+        result_data = shape_frame(result_rows, output_shape)
+        count = len(result_rows)
+    else:
+        result_data, count, valid_keys_a, valid_keys_b = _reconcile_records(
+            data_a, data_b, resolved_column_a, resolved_column_b, mode, output_shape
+        )
     
     # ========================================
-    # 5. BUILD RESULT SET
+    # 6. TOLERANCE PASS (records without key)
     # ========================================
-    result_records = []
-    for key in diff_keys:
-        record = source_index[key]
-        result_records.append(record)
+    probable = None
+    if counterparty_column_a:
+        probable = _probable_matches(
+            data_a, data_b, resolved_column_a, resolved_column_b,
+            (counterparty_column_a, counterparty_column_b or counterparty_column_a),
+            (amount_column_a, amount_column_b or amount_column_a),
+            (date_column_a, date_column_b or date_column_a),
+            amount_tolerance, amount_tolerance_pct, date_tolerance_days, output_shape
+        )
     
     # ========================================
-    # 6. GENERATE SUMMARY
+    # 7. GENERATE SUMMARY
     # ========================================
-    count = len(result_records)
-    
-    if mode == "missing_in_a":
-        summary = (
-            f"Reconciliación completada. Se encontraron {count} documentos "
-            f"en el conjunto B (DIAN/Externo) que NO están en el conjunto A (SAP/Base)."
-        )
-    elif mode == "missing_in_b":
-        summary = (
-            f"Reconciliación completada. Se encontraron {count} documentos "
-            f"en el conjunto A (SAP/Base) que NO están en el conjunto B (DIAN/Externo)."
-        )
-    else:  # intersection
-        summary = (
-            f"Reconciliación completada. Se encontraron {count} documentos "
-            f"que coinciden en AMBOS conjuntos."
+    summary = build_summary(mode, count)
+    if probable is not None:
+        summary += (
+            f" Además, {probable['count']} registros sin clave coinciden probablemente "
+            f"por contraparte, monto y fecha (ver probable_matches)."
         )
     
     # ========================================
-    # 7. RETURN STRUCTURED RESULT
+    # 8. RETURN STRUCTURED RESULT
     # ========================================
-    return {
+    result = {
         "summary": summary,
         "match_count": count,
         "mode_used": mode,
         "key_column_a": resolved_column_a,
         "key_column_b": resolved_column_b,
-        "data": result_records,
+        "data": result_data,
         "metadata": {
             "total_records_a": len(data_a),
             "total_records_b": len(data_b),
-            "valid_keys_a": len(keys_a),
-            "valid_keys_b": len(keys_b)
+            "valid_keys_a": valid_keys_a,
+            "valid_keys_b": valid_keys_b
         }
     }
+    if probable is not None:
+        result["probable_matches"] = probable
+    return result
+
+
+def _probable_matches(
+    data_a: Dataset,
+    data_b: Dataset,
+    key_column_a: str,
+    key_column_b: str,
+    counterparty_columns: Tuple[str, str],
+    amount_columns: Tuple[Optional[str], Optional[str]],
+    date_columns: Tuple[Optional[str], Optional[str]],
+    amount_tolerance: float,
+    amount_tolerance_pct: float,
+    date_tolerance_days: int,
+    output_shape: str
+) -> Dict[str, Any]:
+    """
+    Run the tolerance pass over both datasets.
+    
+    Returns:
+        Dictionary with the probable matches, the tolerances used and the
+        number of candidate rows per side
+    
+    Raises:
+        ValueError: If the amount/date columns are missing or not found
+    """
+    if not amount_columns[0] or not date_columns[0]:
+        raise ValueError(
+            "The tolerance pass needs amount_column_a and date_column_a "
+            "in addition to counterparty_column_a"
+        )
+    df_a = data_a if isinstance(data_a, pd.DataFrame) else pd.DataFrame(data_a)
+    df_b = data_b if isinstance(data_b, pd.DataFrame) else pd.DataFrame(data_b)
+    
+    columns = {}
+    for side, df, names in (("A", df_a, 0), ("B", df_b, 1)):
+        try:
+            columns[side] = [
+                find_column(df, pair[names])
+                for pair in (counterparty_columns, amount_columns, date_columns)
+            ]
+        except ValueError as e:
+            raise ValueError(f"Error in dataset {side}: {str(e)}")
+    
+    found = match_unkeyed(
+        df_a, df_b,
+        build_key_series(df_a, key_column_a), build_key_series(df_b, key_column_b),
+        columns["A"][0], columns["B"][0], columns["A"][1], columns["B"][1],
+        columns["A"][2], columns["B"][2],
+        amount_tolerance, amount_tolerance_pct, date_tolerance_days
+    )
+    return {
+        "count": len(found["matches"]),
+        "amount_tolerance": amount_tolerance,
+        "amount_tolerance_pct": amount_tolerance_pct,
+        "date_tolerance_days": date_tolerance_days,
+        "candidates_a": found["candidates_a"],
+        "candidates_b": found["candidates_b"],
+        "data": shape_frame(found["matches"], output_shape),
+    }
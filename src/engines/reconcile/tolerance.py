@@ -0,0 +1,195 @@
+"""
+Tolerance-based matching for records without a usable key.
+
+Many SAP invoices arrive with an empty U_CUFE, so the key pass can never
+match them. This secondary pass pairs the leftover rows of A and B on the
+same counterparty (NIT), an amount within a tolerance and a date within N
+days, using sorted as-of merges per counterparty instead of pairwise
+comparison. Pairs are reported as probable matches with their deltas; the
+key-based result is left untouched.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from utils.processor import date_column, numeric_column
+
+# Each round runs one as-of merge on amount and one on date; rows that lose a
+# conflict (two A rows claiming the same B row) retry in the next round
+MAX_ROUNDS = 3
+
+
+def normalize_counterparty(values: pd.Series) -> pd.Series:
+    """
+    Normalize counterparty identifiers (NIT) for comparison.
+    Keeps letters and digits only, so "900.123.456-7" equals "9001234567".
+
+    Args:
+        values: Raw counterparty column
+
+    Returns:
+        Normalized strings (NaN where the value is missing or empty)
+    """
+    normalized = values.astype(str).str.lower().str.replace(r"[^0-9a-z]", "", regex=True)
+    return normalized.where(values.notna() & (normalized != ""))
+
+
+def _candidates(df: pd.DataFrame, rows: np.ndarray, party: str, amount: str, date: str) -> pd.DataFrame:
+    """Candidate rows with normalized counterparty, amount and date (complete rows only)."""
+    frame = pd.DataFrame({
+        "row": rows,
+        "party": normalize_counterparty(df[party]).to_numpy()[rows],
+        "amount": numeric_column(df, amount).to_numpy(dtype="float64", na_value=np.nan)[rows],
+        # Same resolution on both sides: merge_asof needs identical key dtypes
+        "date": date_column(df, date).to_numpy(dtype="datetime64[ns]")[rows],
+    })
+    return frame.dropna(subset=["party", "amount", "date"])
+
+
+def _asof_round(left: pd.DataFrame, right: pd.DataFrame, on: str, amount_tolerance: float,
+                amount_tolerance_pct: float, date_tolerance: pd.Timedelta) -> pd.DataFrame:
+    """
+    One as-of merge (nearest `on` value within the same counterparty), filtered
+    by both tolerances and resolved one-to-one by the smallest normalized delta.
+    """
+    if left.empty or right.empty:
+        return pd.DataFrame(columns=["row_a", "row_b", "amount_delta", "days_delta"])
+    right = right.rename(columns={"row": "row_b", "amount": "amount_b", "date": "date_b"})
+    right_on = "amount_b" if on == "amount" else "date_b"
+    if on == "amount":
+        # The per-row percentage can only widen the merge window; the exact check comes after
+        widest = max(amount_tolerance, amount_tolerance_pct * float(left["amount"].abs().max()))
+        tolerance = widest if widest > 0 else None
+    else:
+        tolerance = date_tolerance
+    merged = pd.merge_asof(
+        left.rename(columns={"row": "row_a"}).sort_values(on),
+        right.sort_values(right_on),
+        left_on=on, right_on=right_on, by="party",
+        direction="nearest", tolerance=tolerance,
+    ).dropna(subset=["row_b"])
+
+    amount_delta = merged["amount_b"] - merged["amount"]
+    days_delta = (merged["date_b"] - merged["date"]).dt.days
+    allowed = np.maximum(amount_tolerance, amount_tolerance_pct * merged["amount"].abs())
+    within = (amount_delta.abs() <= allowed) & (days_delta.abs() <= date_tolerance.days)
+    merged = merged.assign(amount_delta=amount_delta, days_delta=days_delta)[within]
+
+    # One-to-one: the closest A row keeps each B row
+    score = merged["amount_delta"].abs() / np.maximum(allowed[within], 0.01) \
+        + merged["days_delta"].abs() / max(date_tolerance.days, 1)
+    merged = merged.assign(score=score).sort_values(["score", "row_a"], kind="stable")
+    merged = merged.drop_duplicates("row_b").drop_duplicates("row_a")
+    merged["row_b"] = merged["row_b"].astype(np.int64)
+    return merged[["row_a", "row_b", "amount_delta", "days_delta"]]
+
+
+def _match(left: pd.DataFrame, right: pd.DataFrame, amount_tolerance: float,
+           amount_tolerance_pct: float, date_tolerance: pd.Timedelta) -> List[pd.DataFrame]:
+    matches = []
+    for _ in range(MAX_ROUNDS):
+        found = 0
+        # Nearest amount catches same-amount invoices; nearest date catches amounts off by fees/rounding
+        for on in ("amount", "date"):
+            pairs = _asof_round(left, right, on, amount_tolerance, amount_tolerance_pct, date_tolerance)
+            if pairs.empty:
+                continue
+            matches.append(pairs)
+            found += len(pairs)
+            left = left[~left["row"].isin(pairs["row_a"])]
+            right = right[~right["row"].isin(pairs["row_b"])]
+        if not found:
+            break
+    return matches
+
+
+def match_unkeyed(
+    df_a: pd.DataFrame,
+    df_b: pd.DataFrame,
+    keys_a: pd.Series,
+    keys_b: pd.Series,
+    counterparty_a: str,
+    counterparty_b: str,
+    amount_a: str,
+    amount_b: str,
+    date_a: str,
+    date_b: str,
+    amount_tolerance: float = 1.0,
+    amount_tolerance_pct: float = 0.0,
+    date_tolerance_days: int = 3
+) -> Dict[str, Any]:
+    """
+    Pair rows that the key pass left unmatched, when at least one side has no key.
+
+    Runs two passes: unkeyed A rows against every B row without a key match,
+    then the remaining A rows without a key match against unkeyed B rows. Rows
+    with two different keys are never paired.
+
+    Args:
+        df_a: Dataset A (e.g., SAP invoices)
+        df_b: Dataset B (e.g., DIAN documents)
+        keys_a: Normalized keys of A aligned with df_a (NaN where missing)
+        keys_b: Normalized keys of B aligned with df_b (NaN where missing)
+        counterparty_a / counterparty_b: Counterparty (NIT) columns
+        amount_a / amount_b: Amount columns (text amounts are parsed)
+        date_a / date_b: Date columns
+        amount_tolerance: Absolute amount tolerance
+        amount_tolerance_pct: Relative amount tolerance (0.01 = 1% of the A amount)
+        date_tolerance_days: Maximum distance in days between both dates
+
+    Returns:
+        Dictionary with the probable matches (row positions, counterparty,
+        amounts, dates and deltas) and the number of candidates per side
+    """
+    if amount_tolerance < 0 or amount_tolerance_pct < 0 or date_tolerance_days < 0:
+        raise ValueError("Tolerances must be zero or positive")
+
+    unkeyed_a = keys_a.isna().to_numpy()
+    unkeyed_b = keys_b.isna().to_numpy()
+    unmatched_a = unkeyed_a | ~keys_a.isin(keys_b.dropna()).to_numpy()
+    unmatched_b = unkeyed_b | ~keys_b.isin(keys_a.dropna()).to_numpy()
+
+    candidates_a = _candidates(df_a, np.flatnonzero(unmatched_a), counterparty_a, amount_a, date_a)
+    candidates_b = _candidates(df_b, np.flatnonzero(unmatched_b), counterparty_b, amount_b, date_b)
+    date_tolerance = pd.Timedelta(days=date_tolerance_days)
+
+    # Pass 1: A without key vs any unmatched B
+    first = _match(candidates_a[unkeyed_a[candidates_a["row"]]], candidates_b,
+                   amount_tolerance, amount_tolerance_pct, date_tolerance)
+    used_a = set().union(*(set(p["row_a"]) for p in first)) if first else set()
+    used_b = set().union(*(set(p["row_b"]) for p in first)) if first else set()
+    # Pass 2: keyed-but-unmatched A vs B without key
+    second = _match(
+        candidates_a[~unkeyed_a[candidates_a["row"]] & ~candidates_a["row"].isin(used_a)],
+        candidates_b[unkeyed_b[candidates_b["row"]] & ~candidates_b["row"].isin(used_b)],
+        amount_tolerance, amount_tolerance_pct, date_tolerance,
+    )
+
+    pairs = pd.concat(first + second) if first or second else \
+        pd.DataFrame({"row_a": [], "row_b": [], "amount_delta": [], "days_delta": []})
+    pairs = pairs.sort_values("row_a", kind="stable")
+    row_a = pairs["row_a"].to_numpy(dtype=np.int64)
+    row_b = pairs["row_b"].to_numpy(dtype=np.int64)
+    by_row_a = candidates_a.set_index("row")
+    by_row_b = candidates_b.set_index("row")
+
+    matches = pd.DataFrame({
+        "row_a": row_a,
+        "row_b": row_b,
+        "key_a": keys_a.to_numpy()[row_a],
+        "key_b": keys_b.to_numpy()[row_b],
+        "counterparty": by_row_a.loc[row_a, "party"].to_numpy(),
+        "amount_a": by_row_a.loc[row_a, "amount"].to_numpy(),
+        "amount_b": by_row_b.loc[row_b, "amount"].to_numpy(),
+        "amount_delta": pairs["amount_delta"].round(2).to_numpy(),
+        "date_a": pd.DatetimeIndex(by_row_a.loc[row_a, "date"]).strftime("%Y-%m-%d"),
+        "date_b": pd.DatetimeIndex(by_row_b.loc[row_b, "date"]).strftime("%Y-%m-%d"),
+        "days_delta": pairs["days_delta"].to_numpy(dtype=np.int64),
+    })
+    return {
+        "matches": matches,
+        "candidates_a": int(len(candidates_a)),
+        "candidates_b": int(len(candidates_b)),
+    }
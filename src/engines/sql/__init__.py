@@ -0,0 +1,5 @@
+"""Consultas SQL embebidas sobre datasets."""
+
+from .sql_engine import run_sql_query
+
+__all__ = ['run_sql_query']
@@ -0,0 +1,147 @@
+"""
+Consultas SQL embebidas (DuckDB) sobre los datasets del request o registrados.
+
+Una sola consulta reemplaza la cadena filtro -> agrupación -> top N (y además
+permite joins y group by de varias llaves). DuckDB ejecuta vectorizado, en
+paralelo y lee los DataFrames / tablas Arrow sin copiarlos.
+
+Sandbox:
+- Conexión en memoria nueva por consulta, sin acceso a archivos ni red
+  (`enable_external_access=false`), sin instalar/cargar extensiones y con la
+  configuración bloqueada.
+- Solo una sentencia SELECT (incluye WITH); cualquier otra se rechaza.
+- Límite de tiempo (`ANALYTICS_SQL_TIMEOUT_SECONDS`): la consulta se
+  interrumpe. Límite de filas (`ANALYTICS_SQL_MAX_ROWS`): el resultado se lee
+  en streaming y se corta (`truncated: true`).
+- Memoria de DuckDB limitada al presupuesto por request (utils.memory_budget).
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from utils.datasets import DATASETS, DatasetNotFound
+from utils.instrumentation import stage
+from utils.memory_budget import REQUEST_MEMORY_BYTES
+from utils.processor import build_frame
+from utils.serialization import OUTPUT_SHAPES, shape_frame
+
+try:
+    import duckdb
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - duckdb es opcional
+    duckdb = pa = None
+
+SQL_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_SQL_TIMEOUT_SECONDS", "30"))
+SQL_MAX_ROWS = int(os.getenv("ANALYTICS_SQL_MAX_ROWS", "10000"))
+SQL_THREADS = int(os.getenv("ANALYTICS_SQL_THREADS", str(min(4, os.cpu_count() or 1))))
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FETCH_BATCH = 8192
+
+TableData = Union[List[Dict[str, Any]], pd.DataFrame]
+
+
+def _connect() -> "duckdb.DuckDBPyConnection":
+    if duckdb is None:
+        raise ValueError("Las consultas SQL requieren duckdb instalado.")
+    con = duckdb.connect(":memory:", config={
+        "enable_external_access": False,
+        "autoinstall_known_extensions": False,
+        "autoload_known_extensions": False,
+        "threads": SQL_THREADS,
+        "memory_limit": f"{REQUEST_MEMORY_BYTES}B",
+    })
+    con.execute("SET lock_configuration = true")
+    return con
+
+
+def _validate_select(con: "duckdb.DuckDBPyConnection", query: str) -> None:
+    try:
+        statements = con.extract_statements(query)
+    except duckdb.Error as e:
+        raise ValueError(f"SQL inválido: {e}")
+    if len(statements) != 1:
+        raise ValueError("Envía exactamente una consulta SQL.")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise ValueError("Solo se permiten consultas de lectura (SELECT / WITH).")
+
+
+def _register_tables(con: "duckdb.DuckDBPyConnection", tables: Dict[str, TableData], datasets: Dict[str, str]) -> List[str]:
+    registered = []
+    for name, data in tables.items():
+        if data is None or len(data) == 0:
+            continue
+        con.register(name, build_frame(data))
+        registered.append(name)
+    for name, dataset_id in datasets.items():
+        if not _TABLE_NAME.match(name):
+            raise ValueError(f"Nombre de tabla inválido: '{name}'.")
+        # La tabla Arrow del memory map se consulta sin convertir a pandas
+        try:
+            con.register(name, DATASETS.table(dataset_id))
+        except DatasetNotFound:
+            raise ValueError(f"Dataset '{dataset_id}' (tabla '{name}') no encontrado o expirado.")
+        registered.append(name)
+    return registered
+
+
+def run_sql_query(
+    query: str,
+    tables: Dict[str, TableData],
+    datasets: Optional[Dict[str, str]] = None,
+    max_rows: int = SQL_MAX_ROWS,
+    timeout_seconds: float = SQL_TIMEOUT_SECONDS,
+    output_shape: str = "records"
+) -> Dict[str, Any]:
+    """
+    Ejecuta una consulta SELECT sobre `tables` ({nombre: registros o DataFrame})
+    y `datasets` ({nombre de tabla: dataset_id registrado}).
+    """
+    if output_shape not in OUTPUT_SHAPES:
+        raise ValueError(f"output_shape '{output_shape}' no soportado. Usa: {', '.join(OUTPUT_SHAPES)}.")
+    max_rows = max(1, min(max_rows, SQL_MAX_ROWS))
+    timeout_seconds = max(0.1, min(timeout_seconds, SQL_TIMEOUT_SECONDS))
+
+    con = _connect()
+    timer = threading.Timer(timeout_seconds, con.interrupt)
+    try:
+        _validate_select(con, query)
+        registered = _register_tables(con, tables, datasets or {})
+        if not registered:
+            raise ValueError("No hay tablas para consultar: envía data/data_b o datasets registrados.")
+
+        timer.start()
+        batches = []
+        fetched = 0
+        try:
+            reader = con.execute(query).to_arrow_reader(_FETCH_BATCH)
+            # Streaming: solo se materializan max_rows + 1 filas
+            for batch in reader:
+                batches.append(batch)
+                fetched += batch.num_rows
+                if fetched > max_rows:
+                    break
+        except duckdb.InterruptException:
+            raise ValueError(f"La consulta superó el límite de {timeout_seconds:g} s.")
+        except duckdb.Error as e:
+            raise ValueError(f"Error en la consulta: {e}")
+        schema = reader.schema
+    finally:
+        timer.cancel()
+        con.close()
+
+    with stage("frame"):
+        table = pa.Table.from_batches(batches, schema=schema)
+        truncated = table.num_rows > max_rows
+        frame = table.slice(0, max_rows).to_pandas()
+    return {
+        "columns": [str(c) for c in frame.columns],
+        "row_count": len(frame),
+        "truncated": truncated,
+        "tables": registered,
+        "data": shape_frame(frame, output_shape),
+    }
@@ -1,33 +1,63 @@
 import pandas as pd
 from typing import List, Dict, Any, Union
+from utils.indexes import INDEXES
+from utils.processor import build_frame, numeric_column
+from utils.serialization import shape_frame
 
-def apply_filter(
-    data: List[Dict[str, Any]], 
+def filter_frame(
+    df: pd.DataFrame, 
     column: str, 
     operator: str, 
     value: Union[float, int, str]
-) -> List[Dict[str, Any]]:
-    df = pd.DataFrame(data)
-    if df.empty or column not in df.columns: return []
+) -> pd.DataFrame:
+    """Filtra un DataFrame sin modificarlo (base de apply_filter y del modo streaming)."""
+    if df.empty or column not in df.columns: return df.iloc[0:0]
+
+    # Datasets registrados: el índice de la columna da las filas sin recorrerla
+    positions = INDEXES.filter_positions(df, column, operator, value)
+    if positions is not None:
+        result = df.iloc[positions]
+        if isinstance(value, (int, float)) and not pd.api.types.is_bool_dtype(df[column].dtype):
+            result = result.assign(**{column: numeric_column(df, column).iloc[positions]})
+        return result
 
     # Conversión inteligente: si el valor filtro es número, la columna debe ser número
-    if isinstance(value, (int, float)):
-        df[column] = pd.to_numeric(df[column], errors='coerce')
+    series = df[column]
+    numeric = isinstance(value, (int, float))
+    if numeric:
+        series = numeric_column(df, column)
+    elif isinstance(series.dtype, pd.CategoricalDtype) and operator not in ("==", "!="):
+        # Las categorías no ordenadas solo admiten igualdad: se compara por su valor
+        series = series.astype(series.cat.categories.dtype)
 
     # Aplicación del filtro
     if operator == ">":
-        df = df[df[column] > value]
+        mask = series > value
     elif operator == "<":
-        df = df[df[column] < value]
+        mask = series < value
     elif operator == "==":
-        df = df[df[column] == value]
+        mask = series == value
     elif operator == "!=":
-        df = df[df[column] != value]
+        mask = series != value
     elif operator == ">=":
-        df = df[df[column] >= value]
+        mask = series >= value
     elif operator == "<=":
-        df = df[df[column] <= value]
+        mask = series <= value
     else:
         raise ValueError(f"Operador '{operator}' no soportado.")
-    
-    return df.to_dict(orient="records")
\ No newline at end of file
+
+    result = df[mask]
+    if numeric and not pd.api.types.is_bool_dtype(df[column].dtype):
+        # La columna filtrada se devuelve ya convertida a número (los bools quedan como bools)
+        result = result.assign(**{column: series[mask]})
+    return result
+
+def apply_filter(
+    data: List[Dict[str, Any]], 
+    column: str, 
+    operator: str, 
+    value: Union[float, int, str],
+    output_shape: str = "records"
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    df = build_frame(data)
+    return shape_frame(filter_frame(df, column, operator, value), output_shape)
\ No newline at end of file
@@ -1,39 +1,54 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+from utils.cubes import CUBES
+from utils.processor import build_frame, numeric_column
+from utils.serialization import shape_frame
+from engines.parallel import partitioned_group, should_partition
 
 def group_and_aggregate(
     data: List[Dict[str, Any]], 
     group_by_col: str, 
     agg_col: str, 
-    operation: str = "sum"
-) -> List[Dict[str, Any]]:
+    operation: str = "sum",
+    output_shape: str = "records"
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Agrupa datos repetidos y aplica una operación matemática.
     Ej: Agrupar por 'Cliente' y sumar 'Ventas'.
     """
-    df = pd.DataFrame(data)
+    df = build_frame(data)
 
     # Validaciones
     if df.empty: raise ValueError("Dataset vacío.")
     if group_by_col not in df.columns: raise ValueError(f"Columna '{group_by_col}' no existe.")
     if agg_col not in df.columns: raise ValueError(f"Columna '{agg_col}' no existe.")
 
+    # Datasets registrados: si un cubo cubre la agrupación se enrolla el cubo, sin recorrer las filas
+    rolled = CUBES.rollup(df, group_by_col, agg_col, operation)
+    if rolled is not None:
+        return shape_frame(rolled, output_shape)
+
+    # Asegurar que la columna a operar sea numérica (antes de filtrar, para reusar la caché)
+    df[agg_col] = numeric_column(df, agg_col)
+
     # Limpieza de nulos
     df = df.dropna(subset=[group_by_col, agg_col])
-    
-    # Asegurar que la columna a operar sea numérica
-    df[agg_col] = pd.to_numeric(df[agg_col], errors='coerce')
+
+    # Datasets grandes: agregados parciales por partición en varios núcleos
+    if should_partition(len(df)):
+        grouped = partitioned_group(df[group_by_col], df[agg_col], operation)
+        return shape_frame(grouped, output_shape)
 
     # La Magia de Pandas
     if operation == "sum":
-        grouped = df.groupby(group_by_col)[agg_col].sum()
+        grouped = df.groupby(group_by_col, observed=True)[agg_col].sum()
     elif operation == "count":
-        grouped = df.groupby(group_by_col)[agg_col].count()
+        grouped = df.groupby(group_by_col, observed=True)[agg_col].count()
     elif operation == "mean":
-        grouped = df.groupby(group_by_col)[agg_col].mean()
+        grouped = df.groupby(group_by_col, observed=True)[agg_col].mean()
     else:
         raise ValueError("Operación no soportada. Usa: sum, count, mean.")
 
-    # Convertir de vuelta a lista de diccionarios para el JSON
+    # Convertir de vuelta a lista de diccionarios (o forma columnar) para el JSON
     # reset_index convierte el índice (ej: Cliente) de nuevo en columna
-    return grouped.reset_index().to_dict(orient="records")
\ No newline at end of file
+    return shape_frame(grouped.reset_index(), output_shape)
\ No newline at end of file
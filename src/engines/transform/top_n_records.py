@@ -1,20 +1,38 @@
 import pandas as pd
 from typing import List, Dict, Any, Union
+from utils.indexes import INDEXES
+from utils.processor import build_frame, numeric_column
+from utils.serialization import shape_frame
 
-def get_top_n_records(
-    data: List[Dict[str, Any]], 
+def top_n_frame(
+    df: pd.DataFrame, 
     column: str, 
     n: int = 5, 
     ascending: bool = False
-) -> List[Dict[str, Any]]:
-    df = pd.DataFrame(data)
-    if df.empty or column not in df.columns: return []
+) -> pd.DataFrame:
+    """Ordena y recorta un DataFrame sin modificarlo (base de get_top_n_records y del modo streaming)."""
+    if df.empty or column not in df.columns: return df.iloc[0:0]
     
     # Asegurar ordenamiento numérico correcto
-    try:
-        df[column] = pd.to_numeric(df[column])
-    except:
-        pass # Si falla, ordena alfabéticamente
+    numbers = numeric_column(df, column)
+    if numbers.isna().sum() == df[column].isna().sum():
+        # Datasets registrados: solo se ordenan las candidatas que da el índice
+        candidates = INDEXES.top_n_positions(df, column, n, ascending)
+        if candidates is not None:
+            df, numbers = df.iloc[candidates], numbers.iloc[candidates]
+        df = df.assign(**{column: numbers})
+    # Si algún valor no es numérico, ordena alfabéticamente
 
-    df_sorted = df.sort_values(by=column, ascending=ascending)
-    return df_sorted.head(n).to_dict(orient="records")
\ No newline at end of file
+    # Orden estable: los empates conservan el orden original (igual con o sin categorías)
+    df_sorted = df.sort_values(by=column, ascending=ascending, kind="stable")
+    return df_sorted.head(n)
+
+def get_top_n_records(
+    data: List[Dict[str, Any]], 
+    column: str, 
+    n: int = 5, 
+    ascending: bool = False,
+    output_shape: str = "records"
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    df = build_frame(data)
+    return shape_frame(top_n_frame(df, column, n, ascending), output_shape)
\ No newline at end of file
@@ -3,6 +3,7 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from typing import List, Dict, Any
 from ..core import setup_style, save_and_close_plot
+from utils.processor import build_frame, date_column, numeric_column
 
 def generate_bar_chart(
     data: List[Dict[str, Any]],
@@ -12,20 +13,19 @@ def generate_bar_chart(
     color: str = "skyblue"
 ) -> str:
     # 1. Convertir a DataFrame
-    df = pd.DataFrame(data)
+    df = build_frame(data)
     if df.empty: 
         raise ValueError("El dataset proporcionado está vacío.")
     
     # 2. LIMPIEZA DINÁMICA DE DATOS
     # Aseguramos que la columna Y sea numérica (quita basura como '$' o ',')
-    df[y_col] = pd.to_numeric(df[y_col], errors='coerce').fillna(0)
+    df[y_col] = numeric_column(df, y_col).fillna(0)
     
-    # Si la columna X parece una fecha (ISO de SAP), la acortamos a YYYY-MM-DD
+    # Si la columna X parece una fecha (ISO o formatos SAP), la acortamos a YYYY-MM-DD
     if any(k in x_col.lower() for k in ['date', 'fecha', 'time']):
-        try:
-            df[x_col] = pd.to_datetime(df[x_col]).dt.strftime('%Y-%m-%d')
-        except:
-            pass # Si no es fecha válida, se queda como texto
+        dates = date_column(df, x_col)
+        if dates.notna().any():
+            df[x_col] = dates.dt.strftime('%Y-%m-%d')  # Si no es fecha válida, se queda como texto
 
     # 3. Configuración Visual
     setup_style()
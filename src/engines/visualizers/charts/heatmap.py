@@ -0,0 +1,39 @@
+import numpy as np
+import seaborn as sns
+import matplotlib.pyplot as plt
+from typing import List, Optional
+from ..core import setup_style, save_and_close_plot
+
+def generate_heatmap(
+    matrix: List[List[Optional[float]]],
+    labels: List[str],
+    title: str = "Mapa de Calor",
+    center: Optional[float] = 0.0,
+    bounds: Optional[tuple] = (-1.0, 1.0)
+) -> str:
+    """
+    Mapa de calor de una matriz cuadrada ya calculada (ej: correlaciones).
+    Las celdas nulas quedan en blanco.
+    """
+    values = np.array([[np.nan if v is None else v for v in row] for row in matrix], dtype="float64")
+    if values.size == 0: raise ValueError("Matriz vacía.")
+
+    setup_style()
+    # El tamaño crece con el número de columnas (30-50 columnas siguen legibles)
+    side = min(4 + 0.45 * len(labels), 24)
+    plt.figure(figsize=(side, side * 0.85))
+
+    vmin, vmax = bounds if bounds else (None, None)
+    sns.heatmap(
+        values, xticklabels=labels, yticklabels=labels, cmap="vlag", center=center,
+        vmin=vmin, vmax=vmax, square=True, linewidths=0.5,
+        # Con muchas columnas los números no caben: solo colores
+        annot=len(labels) <= 12, fmt=".2f", cbar_kws={"shrink": 0.7}
+    )
+
+    plt.title(title, fontsize=15, pad=20)
+    plt.xticks(rotation=45, ha='right')
+    plt.yticks(rotation=0)
+    plt.tight_layout()
+
+    return save_and_close_plot()
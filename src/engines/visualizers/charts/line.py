@@ -3,6 +3,8 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from typing import List, Dict, Any
 from ..core import setup_style, save_and_close_plot
+from utils.processor import build_frame, date_column
+from utils.parsing import column_type
 
 def generate_line_chart(
     data: List[Dict[str, Any]],
@@ -11,14 +13,12 @@ def generate_line_chart(
     title: str = "Tendencia",
     color: str = "green"
 ) -> str:
-    df = pd.DataFrame(data)
+    df = build_frame(data)
     if df.empty: raise ValueError("Dataset vacío.")
 
-    # Intentar parsear fechas para que el eje X se vea bonito
-    try:
-        df[x_col] = pd.to_datetime(df[x_col])
-    except Exception:
-        pass # Si no es fecha, lo dejamos como está
+    # Parsear fechas (tipo inferido una vez por dataset) para que el eje X se vea bonito
+    if x_col in df.columns and column_type(df, x_col)[0] == "date":
+        df[x_col] = date_column(df, x_col)  # Si no es fecha, lo dejamos como está
 
     setup_style()
     plt.figure(figsize=(10, 6))
@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import List, Dict, Any
 from ..core import setup_style, save_and_close_plot
+from utils.processor import build_frame, numeric_column
 
 def generate_pie_chart(
     data: List[Dict[str, Any]],
@@ -10,11 +11,12 @@ def generate_pie_chart(
     y_col: str, # Valor
     title: str = "Distribución"
 ) -> str:
-    df = pd.DataFrame(data)
+    df = build_frame(data)
     if df.empty: raise ValueError("Dataset vacío.")
 
-    # Agrupar automáticamente por si vienen datos repetidos
-    df_grouped = df.groupby(x_col)[y_col].sum()
+    # Agrupar automáticamente por si vienen datos repetidos (montos como texto se parsean)
+    df[y_col] = numeric_column(df, y_col).fillna(0)
+    df_grouped = df.groupby(x_col, observed=True)[y_col].sum()
 
     setup_style()
     plt.figure(figsize=(8, 8))
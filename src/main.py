@@ -1,8 +1,9 @@
 import sys
 import os
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # --- FIX DE RUTAS (Vital para evitar ModuleNotFoundError) ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,12 +12,18 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from services.routes import router
+from utils.instrumentation import instrumentation_middleware
+from utils.memory_budget import MEMORY, memory_budget_middleware
+from utils.metrics import REGISTRY
+from utils.scheduler import COMPUTE, ComputeOverloaded
+from utils.serialization import FastJSONResponse, respond
 
 # Definimos la App
 app = FastAPI(
     title="Analytics Microservice",
     description="Motor de análisis estadístico descriptivo para datos.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS (Permitir que cualquiera lo llame, útil para desarrollo)
@@ -26,15 +33,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
+# Presupuesto de memoria según Content-Length (antes de leer el body)
+app.middleware("http")(memory_budget_middleware)
+
+# Tiempos por etapa + métricas Prometheus + header Server-Timing
+app.middleware("http")(instrumentation_middleware)
+
 # Conectamos las rutas
 app.include_router(router)
 
+# Cola de cómputo llena: rechazo rápido con 429 + Retry-After
+@app.exception_handler(ComputeOverloaded)
+async def compute_overloaded_handler(request: Request, exc: ComputeOverloaded):
+    response = respond(error=str(exc), status_code=429)
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
 @app.get("/health")
 def health_check():
     return {"status": "online", "service": "analytics-engine"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Métricas en formato texto de Prometheus."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/compute/status")
+def compute_status():
+    """Estado del scheduler de cómputo (slots, cola) y del presupuesto de memoria."""
+    return {**COMPUTE.snapshot(), "memory": MEMORY.snapshot()}
+
 if __name__ == "__main__":
-    print("🚀 Arrancando Analytics Engine en http://0.0.0.0:8004")
-    uvicorn.run(app, host="0.0.0.0", port=8004)
\ No newline at end of file
+    # ANALYTICS_WORKERS > 1: varios procesos (un GIL por worker). Los datasets
+    # registrados se comparten vía memoria compartida (utils/datasets.py).
+    workers = int(os.getenv("ANALYTICS_WORKERS", "1"))
+    print(f"🚀 Arrancando Analytics Engine en http://0.0.0.0:8004 ({workers} worker(s))")
+    if workers > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8004, workers=workers, app_dir=current_dir)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8004)
\ No newline at end of file
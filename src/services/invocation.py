@@ -0,0 +1,136 @@
+"""
+Invocación de tools con datasets ya construidos como DataFrame.
+
+El camino normal (`tool.invoke(payload)`) valida cada registro de `data`
+contra `List[Dict[str, Any]]`, lo que en cuerpos de millones de filas cuesta
+más que el engine. Aquí se validan solo los argumentos escalares (columnas,
+operadores, modos) con el mismo `args_schema` y los campos de datos se
+entregan al engine directamente como DataFrame.
+
+Los campos de datos también pueden referenciar un dataset registrado
+(`{"dataset_id": "..."}`, ver `utils.datasets`), que se adjunta desde memoria
+compartida sin viajar en el body.
+
+`/execute` con registros en el body tampoco pasa por `tool.invoke`: cada tool
+tiene un `ToolDispatcher` precompilado al cargar el registro, que valida con
+un schema derivado (los campos de datos solo se revisan como lista) y llama a
+la función directamente, sin callbacks ni run managers de LangChain. Los
+objetos de LangChain se siguen usando para el descubrimiento.
+"""
+
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, SkipValidation, create_model
+
+from utils.datasets import DATASETS, dataset_ref
+
+
+def bulk_fields(tool: BaseTool) -> List[str]:
+    """Campos de datos (listas de registros) del schema de la tool, en orden de declaración."""
+    if tool.args_schema is None:
+        return []
+    return [
+        name for name, field in tool.args_schema.model_fields.items()
+        if typing.get_origin(field.annotation) in (list, List)
+    ]
+
+
+def split_dataset_refs(tool: BaseTool, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, pd.DataFrame]]:
+    """
+    Separa los campos de datos que referencian datasets registrados.
+    Devuelve (payload sin esas referencias, {campo: DataFrame}).
+    Lanza `DatasetNotFound` si alguna referencia no existe.
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    for name in bulk_fields(tool):
+        dataset_id = dataset_ref(payload.get(name))
+        if dataset_id is not None:
+            frames[name] = DATASETS.frame(dataset_id)
+    if not frames:
+        return payload, frames
+    return {k: v for k, v in payload.items() if k not in frames}, frames
+
+
+def validate_scalar_args(tool: BaseTool, payload: Dict[str, Any], frames: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """
+    Valida los escalares del payload con el schema de la tool y devuelve los
+    kwargs finales, con cada campo de datos reemplazado por su DataFrame.
+    """
+    fields = tool.args_schema.model_fields
+    missing = [name for name in bulk_fields(tool) if name not in frames and name not in payload and fields[name].is_required()]
+    if missing:
+        raise ValueError(f"Faltan los datasets: {', '.join(missing)}.")
+
+    # Los campos de datos se validan vacíos: la forma del registro no se revisa fila a fila
+    placeholder = {name: [] for name in frames}
+    args = tool.args_schema.model_validate({**payload, **placeholder})
+    kwargs = {name: getattr(args, name) for name in tool.args_schema.model_fields}
+    kwargs.update(frames)
+    return kwargs
+
+
+def invoke_with_frames(tool: BaseTool, payload: Dict[str, Any], frames: Dict[str, pd.DataFrame]) -> Any:
+    """Ejecuta la función de la tool (síncrona) con los datasets como DataFrame."""
+    return tool.func(**validate_scalar_args(tool, payload, frames))
+
+
+# ==========================================
+# DESPACHO DIRECTO (sin LangChain por llamada)
+# ==========================================
+class ToolDispatcher:
+    """
+    Llamada directa a la función de una tool con la misma validación de
+    escalares y los mismos defaults del schema que `tool.invoke`.
+    """
+
+    __slots__ = ("tool", "func", "bulk", "validator", "fields")
+
+    def __init__(self, tool: BaseTool):
+        self.tool = tool
+        # Tools asíncronas o sin schema Pydantic: se invocan por LangChain
+        schema = tool.args_schema if isinstance(tool.args_schema, type) and issubclass(tool.args_schema, BaseModel) else None
+        self.func: Optional[Callable[..., Any]] = getattr(tool, "func", None) if schema is not None else None
+        self.bulk = bulk_fields(tool) if schema is not None else []
+        self.fields = list(schema.model_fields) if schema is not None else []
+        self.validator = None
+        if self.func is not None:
+            # Mismo schema con los campos de datos sin validación registro a registro
+            overrides = {
+                name: (SkipValidation[schema.model_fields[name].annotation], schema.model_fields[name])
+                for name in self.bulk
+            }
+            self.validator = create_model(schema.__name__, __base__=schema, **overrides)
+
+    def arguments(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Kwargs validados de la función (los campos de datos se entregan tal cual)."""
+        for name in self.bulk:
+            value = payload.get(name)
+            if value is not None and not isinstance(value, (list, pd.DataFrame)):
+                raise ValueError(f"El campo '{name}' debe ser una lista de registros.")
+        args = self.validator.model_validate(payload)
+        return {name: getattr(args, name) for name in self.fields}
+
+    def __call__(self, payload: Dict[str, Any]) -> Any:
+        if self.func is None:
+            return self.tool.invoke(payload)
+        return self.func(**self.arguments(payload))
+
+
+# Despachadores por nombre de tool (se precompilan al cargar el registro)
+DISPATCHERS: Dict[str, ToolDispatcher] = {}
+
+
+def compile_dispatchers(registry: Dict[str, BaseTool]) -> Dict[str, ToolDispatcher]:
+    for name, tool in registry.items():
+        DISPATCHERS[name] = ToolDispatcher(tool)
+    return DISPATCHERS
+
+
+def dispatcher_for(tool: BaseTool) -> ToolDispatcher:
+    dispatcher = DISPATCHERS.get(tool.name)
+    if dispatcher is None or dispatcher.tool is not tool:
+        dispatcher = DISPATCHERS[tool.name] = ToolDispatcher(tool)
+    return dispatcher
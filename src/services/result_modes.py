@@ -0,0 +1,120 @@
+"""
+Modos de respuesta de /execute para resultados grandes.
+
+- json:   respuesta completa en un solo body (comportamiento por defecto)
+- ndjson: streaming de registros línea a línea
+- arrow:  streaming de record batches Arrow
+- paged:  el resultado queda en el RESULT_STORE y se devuelve la primera página
+          junto con un cursor para pedir las siguientes (GET /results/{id})
+
+Para las tools cuyo engine puede entregar un DataFrame (filtro, top N) se
+evita por completo la lista de registros: el stream convierte el frame por
+bloques. El resto de tools se ejecutan normalmente y se recorre su `data`.
+"""
+
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from langchain_core.tools import BaseTool
+
+from engines.transform.filtering import filter_frame
+from engines.transform.top_n_records import top_n_frame
+from engines.reconcile import reconcile_datasets
+from services.invocation import dispatcher_for, invoke_with_frames, validate_scalar_args
+from utils.processor import build_frame
+from utils.result_store import RESULT_STORE, Rows
+from utils.serialization import FastJSONResponse
+from utils.streaming import stream_response
+
+RESPONSE_MODES = ("json", "ndjson", "arrow", "paged")
+
+RowsAndMeta = Tuple[Rows, Dict[str, Any]]
+
+
+# ==========================================
+# 1. PRODUCTORES DE FILAS POR TOOL
+# ==========================================
+def _filter_rows(args: Any) -> RowsAndMeta:
+    rows = filter_frame(build_frame(args.data), args.column, args.operator, args.value)
+    return rows, {"status": "success", "row_count": len(rows)}
+
+
+def _top_n_rows(args: Any) -> RowsAndMeta:
+    rows = top_n_frame(build_frame(args.data), args.column, args.n, args.ascending)
+    return rows, {"status": "success", "row_count": len(rows)}
+
+
+def _reconcile_rows(args: Any) -> RowsAndMeta:
+    result = reconcile_datasets(
+        data_a=args.data_a,
+        data_b=args.data_b,
+        key_column_a=args.key_column_a,
+        key_column_b=args.key_column_b,
+        key_column=args.key_column,
+        mode=args.mode,
+        counterparty_column_a=args.counterparty_column_a,
+        counterparty_column_b=args.counterparty_column_b,
+        amount_column_a=args.amount_column_a,
+        amount_column_b=args.amount_column_b,
+        date_column_a=args.date_column_a,
+        date_column_b=args.date_column_b,
+        amount_tolerance=args.amount_tolerance,
+        amount_tolerance_pct=args.amount_tolerance_pct,
+        date_tolerance_days=args.date_tolerance_days,
+    )
+    rows = result.pop("data")
+    return rows, {"status": "success", **result}
+
+
+ROW_PRODUCERS: Dict[str, Callable[[Any], RowsAndMeta]] = {
+    "analytics_transform_filter": _filter_rows,
+    "analytics_transform_top_n": _top_n_rows,
+    "analytics_reconcile_datasets": _reconcile_rows,
+}
+
+
+def _rows_from_result(tool_name: str, result: Any) -> RowsAndMeta:
+    """Separa los registros (`data`) del resto del resultado de una tool genérica."""
+    if isinstance(result, list):
+        return result, {"status": "success", "row_count": len(result)}
+    if isinstance(result, dict):
+        if result.get("status") == "error" or result.get("error"):
+            raise ValueError(result.get("error") or f"La tool '{tool_name}' falló.")
+        if isinstance(result.get("data"), list):
+            meta = {k: v for k, v in result.items() if k != "data"}
+            return result["data"], meta
+    raise ValueError(f"La tool '{tool_name}' no produce un conjunto de registros; usa response_mode='json'.")
+
+
+def produce_rows(tool: BaseTool, payload: Dict[str, Any], frames: Optional[Dict[str, pd.DataFrame]] = None) -> RowsAndMeta:
+    """
+    Ejecuta la tool (síncrono) y devuelve sus registros y metadatos.
+    Con `frames` (ingesta por streaming) los datasets llegan ya como DataFrame
+    y solo se validan los argumentos escalares.
+    """
+    producer = ROW_PRODUCERS.get(tool.name)
+    if frames is not None:
+        if producer is not None:
+            return producer(SimpleNamespace(**validate_scalar_args(tool, payload, frames)))
+        return _rows_from_result(tool.name, invoke_with_frames(tool, payload, frames))
+    dispatcher = dispatcher_for(tool)
+    if producer is not None:
+        return producer(SimpleNamespace(**dispatcher.arguments(payload)))
+    return _rows_from_result(tool.name, dispatcher(payload))
+
+
+# ==========================================
+# 2. RESPUESTAS
+# ==========================================
+def validate_response_mode(mode: str) -> None:
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"response_mode '{mode}' no soportado. Usa: {', '.join(RESPONSE_MODES)}.")
+
+
+def mode_response(mode: str, rows: Rows, meta: Dict[str, Any], page_size: int):
+    if mode == "paged":
+        entry = RESULT_STORE.put(rows, meta)
+        page = RESULT_STORE.page(entry.result_id, 0, page_size)
+        return FastJSONResponse({"status": "success", "meta": meta, **page})
+    return stream_response(rows, meta, fmt=mode)
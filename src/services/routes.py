@@ -1,29 +1,62 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
-import traceback
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Dict, Any, Optional
+import logging
+import os
 # Schemas
 from services.schemas import (
-    StatsInput, GroupingInput, ChartInput, StandardResponse, ExecutionRequest, 
-    FilterInput, TopNInput, ForecastInput, ForecastResult
+    StatsInput, EstimateInput, ModeInput, CorrelationInput, HistogramInput, OutlierInput, GroupingInput, ChartInput, StandardResponse, ExecutionRequest, JobRequest, 
+    FilterInput, TopNInput, ForecastInput, ForecastResult, DatasetInput, DatasetAppendInput, CubeInput, IndexInput,
+    AnomalyInput, AnomalyUpdateInput
 )
 
 # Utils
 from utils.tool_loader import load_tool_registry
+from utils.instrumentation import instrumented, track_tool, count_rows, stage
+from utils.ingest import read_ndjson
+from utils.processor import build_frame
+from utils.compaction import memory_report
+from utils.scheduler import COMPUTE, ComputeOverloaded, scheduled
+from utils.memory_budget import MemoryBudgetRoute, ensure_for_tool, reserve
+from utils.jobs import JOBS, current_job
+from utils.datasets import DATASETS, DatasetNotFound
+from utils.indexes import INDEXES
+from utils.cubes import CUBES
+from utils import profiling
+from utils.serialization import FastJSONResponse, respond, shape_frame
+from utils.result_store import RESULT_STORE, decode_cursor
+from utils.streaming import stream_response
+from services.result_modes import produce_rows, mode_response, validate_response_mode
+from services.invocation import bulk_fields, compile_dispatchers, invoke_with_frames, split_dataset_refs
 
 # Motores (Engines) para uso directo
 from engines.descriptive.central import get_smart_mean, get_smart_median, get_smart_mode
+from engines.descriptive.approximate import approximate_group, sample_frame
+from engines.descriptive.correlation import get_correlation_matrix
+from engines.descriptive.distribution import get_histogram, detect_outliers
 from engines.transform.grouping import group_and_aggregate
 from engines.visualizers.charts.bar import generate_bar_chart
 from engines.visualizers.charts.line import generate_line_chart
 from engines.visualizers.charts.pie import generate_pie_chart
 from engines.predictive.regression import analytics_linear_forecast
+from engines.predictive.anomaly import detect_anomalies, update_anomaly_state
 from engines.transform.filtering import apply_filter
 from engines.transform.top_n_records import get_top_n_records
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Los rechazos por memoria (413 / 429) atraviesan los `except Exception` de las rutas
+router = APIRouter(route_class=MemoryBudgetRoute)
+
+# Token de los endpoints /admin y del profiling por header (si no se define, quedan deshabilitados)
+ADMIN_TOKEN = os.getenv("ANALYTICS_ADMIN_TOKEN")
 
 # Cargar registro de tools (Para /execute)
 TOOL_REGISTRY = load_tool_registry()
+# Despacho directo por tool (sin revalidar `data` ni pasar por LangChain en cada llamada)
+DISPATCHERS = compile_dispatchers(TOOL_REGISTRY)
 
 # ============================================================
 # 0. ENDPOINT DE DESCUBRIMIENTO / INTROSPECCIÓN
@@ -52,97 +85,242 @@ def discovery_endpoint():
 # ============================================================
 # 1. ENDPOINT GENÉRICO (MCP / Gateway)
 # ============================================================
-@router.post("/execute")
-async def execute_tool_endpoint(req: ExecutionRequest):
-    """Ejecuta cualquier tool por su nombre, manejando la inyección de datos del Orquestador."""
-    payload = req.payload
-    # Mapeo de sinónimos para el LLM
-    synonyms = {
-        "x_axis": "x_col", "x_label": "x_col", "y_axis": "y_col", "y_label": "y_col",
-        "group_by_column": "group_by", "column_to_operate": "target_column"
-    }
-    for old, new in synonyms.items():
+# Mapeo de sinónimos para el LLM
+SYNONYMS = {
+    "x_axis": "x_col", "x_label": "x_col", "y_axis": "y_col", "y_label": "y_col",
+    "group_by_column": "group_by", "column_to_operate": "target_column"
+}
+
+
+def apply_synonyms(payload: Dict[str, Any]) -> Dict[str, Any]:
+    for old, new in SYNONYMS.items():
         if old in payload and new not in payload:
             payload[new] = payload.pop(old)
+    return payload
+
+
+@router.post("/execute")
+@instrumented()
+async def execute_tool_endpoint(req: ExecutionRequest, request: Request):
+    """Ejecuta cualquier tool por su nombre, manejando la inyección de datos del Orquestador."""
+    apply_synonyms(req.payload)
 
     if req.tool_name not in TOOL_REGISTRY:
         raise HTTPException(status_code=404, detail=f"Tool '{req.tool_name}' no encontrada.")
 
     try:
-        target_tool = TOOL_REGISTRY[req.tool_name]
-        
-        # LOG DE SEGURIDAD: Verificar si la inyección de datos fue exitosa
-        data_sample = req.payload.get("data", [])
-        if isinstance(data_sample, list):
-            print(f"   ✅ Inyección exitosa: Recibidos {len(data_sample)} registros.")
+        validate_response_mode(req.response_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    streaming = req.response_mode != "json"
+
+    target_tool = TOOL_REGISTRY[req.tool_name]
+    # Campos de datos que referencian datasets registrados ({"dataset_id": ...})
+    try:
+        payload, frames = split_dataset_refs(target_tool, req.payload)
+    except DatasetNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Dataset {e} no encontrado o expirado.")
+
+    try:
+        # Profiling opt-in (header X-Profile con el token de administración, o muestreo aleatorio)
+        profile_mode = profiling.profiling_mode(request.headers, allow_header=_is_admin(request))
+
+        # Modos ndjson/arrow/paged: el engine entrega las filas (idealmente un DataFrame)
+        if streaming:
+            invoke = lambda: produce_rows(target_tool, payload, frames or None)
+        elif frames:
+            invoke = lambda: invoke_with_frames(target_tool, payload, frames)
         else:
-            print(f"   ⚠️ Alerta: El campo 'data' no es una lista. Tipo: {type(data_sample)}")
+            invoke = lambda: DISPATCHERS[req.tool_name](payload)
 
-        # Ejecución a través de LangChain (invoca create_bar_chart, etc)
-        result = await target_tool.ainvoke(req.payload)
+        rows_in = count_rows(payload) + sum(len(frame) for frame in frames.values())
+        # Presupuesto de memoria: filas x columnas x peso de la tool (falla antes de construir frames)
+        ensure_for_tool(req.tool_name, payload, frames)
+        with track_tool(req.tool_name, rows_in):
+            # Todo el cómputo pasa por el scheduler (cola acotada, 429 si está lleno)
+            if profile_mode is not None:
+                # El profiler corre en el mismo hilo de cómputo que la tool
+                profile_id = profiling.request_id_from(request.headers)
+                result = await COMPUTE.run(profiling.run_profiled, invoke, profile_mode, profile_id, tool=req.tool_name, rows=rows_in)
+            else:
+                # Ejecución directa de la función de la tool (create_bar_chart, etc)
+                result = await COMPUTE.run(invoke, tool=req.tool_name, rows=rows_in)
 
-        print(result)
-        
-        return {"status": "success", "data": result}
+        if streaming:
+            rows, meta = result
+            streamed = mode_response(req.response_mode, rows, meta, req.page_size)
+            if profile_mode is not None:
+                streamed.headers["X-Profile-Id"] = profile_id
+            return streamed
+
+        # Serialización directa con orjson (sin jsonable_encoder)
+        fast = FastJSONResponse({"status": "success", "data": result})
+        if profile_mode is not None:
+            fast.headers["X-Profile-Id"] = profile_id
+        return fast
+
+    except ComputeOverloaded:
+        raise
+    except Exception as e:
+        logger.exception("Error ejecutando la tool '%s' en /execute", req.tool_name)
+        # En los modos con filas los errores de validación/engine llegan como excepción
+        status_code = 400 if streaming and isinstance(e, ValueError) else 500
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+
+def _default_dataset_field(header: Dict[str, Any]) -> str:
+    """Campo que recibe las filas antes de cualquier marcador `__dataset__`."""
+    target_tool = TOOL_REGISTRY.get(header.get("tool_name"))
+    if target_tool is None:
+        raise LookupError(f"Tool '{header.get('tool_name')}' no encontrada.")
+    fields = bulk_fields(target_tool)
+    if not fields:
+        raise ValueError(f"La tool '{target_tool.name}' no recibe datasets.")
+    return fields[0]
+
+
+@router.post("/execute/stream")
+@instrumented()
+async def execute_stream_endpoint(request: Request):
+    """
+    Variante de /execute para cuerpos enormes en NDJSON: encabezado en la primera
+    línea y luego una fila por línea. Las filas se convierten a DataFrame por
+    lotes mientras llegan y solo se validan los argumentos escalares.
+    """
+    try:
+        with stage("ingest"):
+            header, frames, rows_read = await read_ndjson(request.stream(), _default_dataset_field)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    tool_name = header["tool_name"]
+    target_tool = TOOL_REGISTRY[tool_name]
+    payload = apply_synonyms(dict(header.get("payload") or {}))
+    try:
+        payload, ref_frames = split_dataset_refs(target_tool, payload)
+    except DatasetNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Dataset {e} no encontrado o expirado.")
+    frames.update(ref_frames)
+    response_mode = header.get("response_mode", "json")
+    page_size = int(header.get("page_size", 1000))
 
+    try:
+        validate_response_mode(response_mode)
+        ensure_for_tool(tool_name, payload, frames)
+        with track_tool(tool_name, rows_read):
+            if response_mode == "json":
+                result = await COMPUTE.run(invoke_with_frames, target_tool, payload, frames, tool=tool_name, rows=rows_read)
+                return FastJSONResponse({"status": "success", "data": result})
+            rows, meta = await COMPUTE.run(produce_rows, target_tool, payload, frames, tool=tool_name, rows=rows_read)
+        return mode_response(response_mode, rows, meta, page_size)
+    except ComputeOverloaded:
+        raise
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"   💀 EXCEPCIÓN EN EXECUTE: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error ejecutando la tool '%s' en /execute/stream", tool_name)
         raise HTTPException(status_code=500, detail=str(e))
 # ============================================================
 # 2. ENDPOINTS ESTADÍSTICOS (Descriptive)
 # ============================================================
 @router.post("/stats/mean", response_model=StandardResponse)
-def endpoint_mean(payload: StatsInput):
+@instrumented("analytics_stat_mean")
+@scheduled()
+def endpoint_mean(payload: EstimateInput):
     try:
-        result = get_smart_mean(payload.data, payload.column)
-        return {"status": "success", "data": result}
+        result = get_smart_mean(payload.data, payload.column, payload.approximate, payload.confidence)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 @router.post("/stats/median", response_model=StandardResponse)
-def endpoint_median(payload: StatsInput):
+@instrumented("analytics_stat_median")
+@scheduled()
+def endpoint_median(payload: EstimateInput):
     try:
-        result = get_smart_median(payload.data, payload.column)
-        return {"status": "success", "data": result}
+        result = get_smart_median(payload.data, payload.column, payload.approximate, payload.confidence)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 @router.post("/stats/mode", response_model=StandardResponse)
-def endpoint_mode(payload: StatsInput):
+@instrumented("analytics_stat_mode")
+@scheduled()
+def endpoint_mode(payload: ModeInput):
     try:
-        result = get_smart_mode(payload.data, payload.column)
-        return {"status": "success", "data": result}
+        result = get_smart_mode(payload.data, payload.column, payload.method, payload.top_k)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
+
+@router.post("/stats/correlation", response_model=StandardResponse)
+@instrumented("analytics_stat_correlation")
+@scheduled()
+def endpoint_correlation(payload: CorrelationInput):
+    try:
+        result = get_correlation_matrix(payload.data, payload.columns, payload.method, payload.min_periods, payload.include_chart)
+        return respond(result)
+    except Exception as e:
+        return respond(error=str(e))
+
+@router.post("/stats/histogram", response_model=StandardResponse)
+@instrumented("analytics_stat_histogram")
+@scheduled()
+def endpoint_histogram(payload: HistogramInput):
+    try:
+        result = get_histogram(payload.data, payload.column, payload.bins, payload.method, payload.group_by)
+        return respond(result)
+    except Exception as e:
+        return respond(error=str(e))
+
+@router.post("/stats/outliers", response_model=StandardResponse)
+@instrumented("analytics_stat_outliers")
+@scheduled()
+def endpoint_outliers(payload: OutlierInput):
+    try:
+        result = detect_outliers(payload.data, payload.column, payload.method, payload.threshold, payload.group_by, payload.max_indices)
+        return respond(result)
+    except Exception as e:
+        return respond(error=str(e))
 
 # ============================================================
 # 3. ENDPOINTS DE TRANSFORMACIÓN (Grouping)
 # ============================================================
 @router.post("/transform/aggregate", response_model=StandardResponse)
+@instrumented("analytics_transform_aggregate")
+@scheduled()
 def endpoint_aggregate(payload: GroupingInput):
     try:
-        result = group_and_aggregate(payload.data, payload.group_by, payload.target_column, payload.operation)
-        return {"status": "success", "data": result}
+        if payload.approximate:
+            frame, _ = approximate_group(payload.data, payload.group_by, payload.target_column, payload.operation, payload.confidence)
+            return respond(shape_frame(frame, payload.output_shape))
+        result = group_and_aggregate(payload.data, payload.group_by, payload.target_column, payload.operation, payload.output_shape)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 # --- FILTRADO Y TOP N ---
 @router.post("/transform/filter", response_model=StandardResponse)
+@instrumented("analytics_transform_filter")
+@scheduled()
 def endpoint_filter(payload: FilterInput):
     try:
-        result = apply_filter(payload.data, payload.column, payload.operator, payload.value)
-        return {"status": "success", "data": result}
+        result = apply_filter(payload.data, payload.column, payload.operator, payload.value, payload.output_shape)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 @router.post("/transform/top_n", response_model=StandardResponse)
+@instrumented("analytics_transform_top_n")
+@scheduled()
 def endpoint_top_n(payload: TopNInput):
     try:
-        result = get_top_n_records(payload.data, payload.column, payload.n, payload.ascending)
-        return {"status": "success", "data": result}
+        result = get_top_n_records(payload.data, payload.column, payload.n, payload.ascending, payload.output_shape)
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
     
 
 # ============================================================
@@ -150,36 +328,369 @@ def endpoint_top_n(payload: TopNInput):
 # ============================================================
 
 @router.post("/predict/linear", response_model=StandardResponse)
+@instrumented("analytics_linear_forecast")
+@scheduled()
 def endpoint_forecast(payload: ForecastInput):
     try:
         result = analytics_linear_forecast(payload.data, payload.x_col, payload.y_col, payload.periods)
-        return {"status": "success", "data": result}
+        return respond(result)
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
     
+@router.post("/predict/anomalies", response_model=StandardResponse)
+@instrumented("analytics_anomaly_detect")
+@scheduled()
+def endpoint_anomalies(payload: AnomalyInput):
+    try:
+        result = detect_anomalies(
+            payload.data, payload.date_col, payload.value_col, payload.series_col, payload.bucket,
+            payload.agg, payload.method, payload.window, payload.season, payload.threshold,
+            payload.max_anomalies, payload.return_state
+        )
+        return respond(result)
+    except Exception as e:
+        return respond(error=str(e))
+
+@router.post("/predict/anomalies/update", response_model=StandardResponse)
+@instrumented("analytics_anomaly_update")
+@scheduled()
+def endpoint_anomalies_update(payload: AnomalyUpdateInput):
+    try:
+        result = update_anomaly_state(
+            payload.data, payload.date_col, payload.value_col, payload.series_col, payload.state,
+            payload.bucket, payload.agg, payload.method, payload.window, payload.season,
+            payload.threshold, payload.flush, payload.max_anomalies
+        )
+        return respond(result)
+    except Exception as e:
+        return respond(error=str(e))
+
 # ============================================================
 # 5. ENDPOINTS VISUALES (Charts)
 # ============================================================
+def _chart_rows(payload: ChartInput, stratify: Optional[str]):
+    """Filas a graficar: el dataset completo o, en modo aproximado, su muestra."""
+    if not payload.approximate:
+        return payload.data, {}
+    rows, sample = sample_frame(payload.data, stratify)
+    return rows, {"approximate": True, "sample": sample.describe()}
+
 @router.post("/visuals/bar", response_model=StandardResponse)
+@instrumented("analytics_chart_bar")
+@scheduled()
 def endpoint_bar_chart(payload: ChartInput):
     try:
-        b64 = generate_bar_chart(payload.data, payload.x_col, payload.y_col, payload.title, payload.color or "skyblue")
-        return {"status": "success", "data": {"image_base64": b64}}
+        data, extra = _chart_rows(payload, payload.x_col)
+        b64 = generate_bar_chart(data, payload.x_col, payload.y_col, payload.title, payload.color or "skyblue")
+        return respond({"image_base64": b64, **extra})
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 @router.post("/visuals/line", response_model=StandardResponse)
+@instrumented("analytics_chart_line")
+@scheduled()
 def endpoint_line_chart(payload: ChartInput):
     try:
-        b64 = generate_line_chart(payload.data, payload.x_col, payload.y_col, payload.title, payload.color or "green")
-        return {"status": "success", "data": {"image_base64": b64}}
+        data, extra = _chart_rows(payload, payload.x_col)
+        b64 = generate_line_chart(data, payload.x_col, payload.y_col, payload.title, payload.color or "green")
+        return respond({"image_base64": b64, **extra})
     except Exception as e:
-        return {"status": "error", "error": str(e)}
+        return respond(error=str(e))
 
 @router.post("/visuals/pie", response_model=StandardResponse)
+@instrumented("analytics_chart_pie")
+@scheduled()
 def endpoint_pie_chart(payload: ChartInput):
     try:
-        b64 = generate_pie_chart(payload.data, payload.x_col, payload.y_col, payload.title)
-        return {"status": "success", "data": {"image_base64": b64}}
+        data, extra = _chart_rows(payload, None)
+        b64 = generate_pie_chart(data, payload.x_col, payload.y_col, payload.title)
+        return respond({"image_base64": b64, **extra})
     except Exception as e:
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return respond(error=str(e))
+
+# ============================================================
+# 6. ENDPOINTS ADMIN (Profiling)
+# ============================================================
+def _is_admin(request: Request) -> bool:
+    return bool(ADMIN_TOKEN) and request.headers.get("x-admin-token") == ADMIN_TOKEN
+
+def _require_admin(request: Request):
+    # Sin token configurado los endpoints de administración quedan deshabilitados
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoints de administración deshabilitados: define ANALYTICS_ADMIN_TOKEN.")
+    if not _is_admin(request):
+        raise HTTPException(status_code=403, detail="Token de administración inválido.")
+
+@router.get("/admin/profiles")
+def list_profiles_endpoint(request: Request):
+    """Lista los perfiles guardados (más recientes primero)."""
+    _require_admin(request)
+    return {"status": "success", "profiles": profiling.list_profiles()}
+
+@router.get("/admin/profiles/{request_id}")
+def get_profile_endpoint(request_id: str, request: Request, format: Optional[str] = None):
+    """Descarga un perfil por request ID. format: 'txt', 'collapsed' o 'pstats'."""
+    _require_admin(request)
+    path = profiling.profile_path(request_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Perfil '{request_id}' no encontrado.")
+    media_type = "application/octet-stream" if path.endswith(".pstats") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+# ============================================================
+# 7. RESULTADOS PAGINADOS / STREAMING
+# ============================================================
+@router.get("/results")
+def list_results_endpoint():
+    """Resultados retenidos en el servidor (response_mode='paged')."""
+    return {"status": "success", "results": RESULT_STORE.list()}
+
+@router.get("/results/{result_id}")
+def result_page_endpoint(result_id: str, cursor: Optional[str] = None, limit: int = 1000):
+    """Devuelve una página del resultado; `cursor` es el `next_cursor` de la página anterior."""
+    offset = 0
+    if cursor:
+        try:
+            cursor_id, offset = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if cursor_id != result_id:
+            raise HTTPException(status_code=400, detail="El cursor no corresponde a este resultado.")
+    try:
+        page = RESULT_STORE.page(result_id, offset, max(1, min(limit, 100000)))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Resultado '{result_id}' no encontrado o expirado.")
+    return FastJSONResponse({"status": "success", **page})
+
+@router.get("/results/{result_id}/stream")
+def result_stream_endpoint(result_id: str, format: str = "ndjson"):
+    """Descarga completa de un resultado retenido en NDJSON o Arrow."""
+    entry = RESULT_STORE.get(result_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Resultado '{result_id}' no encontrado o expirado.")
+    try:
+        return stream_response(entry.rows, entry.meta, fmt=format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/results/{result_id}")
+def delete_result_endpoint(result_id: str):
+    if not RESULT_STORE.delete(result_id):
+        raise HTTPException(status_code=404, detail=f"Resultado '{result_id}' no encontrado.")
+    return {"status": "success", "result_id": result_id}
+
+# ============================================================
+# 8. DATASETS REGISTRADOS (compartidos entre workers)
+# ============================================================
+@router.post("/datasets")
+@instrumented()
+def register_dataset_endpoint(payload: DatasetInput):
+    """Registra un dataset una sola vez; luego se usa en /execute con {"dataset_id": ...}."""
+    try:
+        frame = build_frame(payload.data)
+        return {"status": "success", "dataset": DATASETS.put(frame, payload.name, payload.ttl_seconds)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/datasets/stream")
+@instrumented()
+async def register_dataset_stream_endpoint(request: Request):
+    """Registro de datasets enormes en NDJSON: encabezado {"name": ...} y una fila por línea."""
+    try:
+        with stage("ingest"):
+            header, frames, _ = await read_ndjson(request.stream(), lambda header: "data", header_key="name")
+        frame = frames.get("data")
+        if frame is None:
+            raise ValueError("El dataset no tiene filas.")
+        ttl = header.get("ttl_seconds")
+        dataset = await run_in_threadpool(DATASETS.put, frame, header.get("name"), float(ttl) if ttl else None)
+        return {"status": "success", "dataset": dataset}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/datasets")
+def list_datasets_endpoint():
+    return {"status": "success", "datasets": DATASETS.list()}
+
+@router.get("/datasets/{dataset_id}")
+def describe_dataset_endpoint(dataset_id: str, memory: bool = False):
+    """Schema del dataset; con `memory=true` también la memoria por columna en este worker."""
+    try:
+        dataset = DATASETS.describe(dataset_id)
+        if memory:
+            dataset["memory"] = memory_report(DATASETS.frame(dataset_id))
+        dataset["indexes"] = INDEXES.describe(dataset_id)
+        return {"status": "success", "dataset": dataset}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+
+@router.delete("/datasets/{dataset_id}")
+def delete_dataset_endpoint(dataset_id: str):
+    if not DATASETS.delete(dataset_id):
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+    return {"status": "success", "dataset_id": dataset_id}
+
+@router.post("/datasets/{dataset_id}/append")
+@instrumented()
+@scheduled()
+def append_dataset_endpoint(dataset_id: str, payload: DatasetAppendInput):
+    """Agrega filas al dataset; sus cubos se actualizan solo con las filas nuevas."""
+    try:
+        return {"status": "success", "dataset": CUBES.append(dataset_id, build_frame(payload.data))}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/datasets/{dataset_id}/cubes")
+@instrumented()
+@scheduled()
+def define_cube_endpoint(dataset_id: str, payload: CubeInput):
+    """Declara un cubo de agregados materializado (las agrupaciones que cubre se responden desde él)."""
+    try:
+        return {"status": "success", "cube": CUBES.define(dataset_id, payload.name, payload.dimensions, payload.measures)}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/datasets/{dataset_id}/cubes")
+def list_cubes_endpoint(dataset_id: str):
+    try:
+        return {"status": "success", "dataset_id": dataset_id, "cubes": CUBES.list(dataset_id)}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+
+@router.delete("/datasets/{dataset_id}/cubes/{name}")
+def delete_cube_endpoint(dataset_id: str, name: str):
+    try:
+        if not CUBES.delete(dataset_id, name):
+            raise HTTPException(status_code=404, detail=f"Cubo '{name}' no encontrado.")
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+    return {"status": "success", "dataset_id": dataset_id, "name": name}
+
+@router.post("/datasets/{dataset_id}/indexes")
+@instrumented()
+@scheduled()
+def build_indexes_endpoint(dataset_id: str, payload: IndexInput):
+    """Construye índices por columna en este worker (los filtros y top N también los crean en el primer uso)."""
+    try:
+        # Adjunta el dataset en este proceso (los índices son del DataFrame adjuntado)
+        DATASETS.frame(dataset_id)
+        indexes = [INDEXES.build(dataset_id, column, payload.kind) for column in payload.columns]
+        return {"status": "success", "dataset_id": dataset_id, "indexes": indexes}
+    except DatasetNotFound:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' no encontrado.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/datasets/{dataset_id}/indexes")
+def list_indexes_endpoint(dataset_id: str):
+    """Índices construidos en este worker y su memoria."""
+    return {"status": "success", "dataset_id": dataset_id, "indexes": INDEXES.describe(dataset_id)}
+
+@router.delete("/datasets/{dataset_id}/indexes")
+def drop_indexes_endpoint(dataset_id: str, column: Optional[str] = None):
+    """Elimina los índices de una columna (o todos) en este worker."""
+    return {"status": "success", "dataset_id": dataset_id, "dropped": INDEXES.drop(dataset_id, column)}
+
+# ============================================================
+# 9. TRABAJOS ASÍNCRONOS (análisis largos)
+# ============================================================
+def _run_job(target_tool, payload: Dict[str, Any], frames: Dict[str, Any], response_mode: str) -> Any:
+    """Cuerpo de un trabajo; reserva su propia memoria porque el request ya respondió."""
+    with reserve(label=target_tool.name):
+        ensure_for_tool(target_tool.name, payload, frames)
+        if response_mode == "json":
+            result = invoke_with_frames(target_tool, payload, frames) if frames else DISPATCHERS[target_tool.name](payload)
+            # Las tools reportan sus errores como {"error": ...}: el trabajo queda 'failed'
+            if isinstance(result, dict) and (result.get("status") == "error" or result.get("error")):
+                raise ValueError(result.get("error") or f"La tool '{target_tool.name}' falló.")
+            return result
+        rows, meta = produce_rows(target_tool, payload, frames or None)
+        job = current_job()
+        job.result_id = RESULT_STORE.put(rows, meta, ttl=JOBS.ttl, result_id=job.job_id).result_id
+        return {"response_mode": response_mode, "row_count": len(rows), "meta": meta}
+
+@router.post("/jobs", status_code=202)
+@instrumented()
+async def submit_job_endpoint(req: JobRequest):
+    """Encola una tool como trabajo asíncrono y devuelve su job_id sin esperar el resultado."""
+    apply_synonyms(req.payload)
+    if req.tool_name not in TOOL_REGISTRY:
+        raise HTTPException(status_code=404, detail=f"Tool '{req.tool_name}' no encontrada.")
+    try:
+        validate_response_mode(req.response_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    target_tool = TOOL_REGISTRY[req.tool_name]
+    try:
+        payload, frames = split_dataset_refs(target_tool, req.payload)
+    except DatasetNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Dataset {e} no encontrado o expirado.")
+
+    rows_in = count_rows(payload) + sum(len(frame) for frame in frames.values())
+    # Admisión en la misma cola de cómputo que /execute (429 si está llena)
+    with track_tool(req.tool_name, rows_in):
+        job = JOBS.submit(_run_job, target_tool, payload, frames, req.response_mode, tool=req.tool_name, rows=rows_in)
+    return {"status": "success", "job": job.describe()}
+
+@router.get("/jobs")
+def list_jobs_endpoint():
+    return {"status": "success", "jobs": JOBS.list()}
+
+@router.get("/jobs/{job_id}")
+def job_status_endpoint(job_id: str):
+    """Estado y progreso (filas procesadas por los engines que trabajan por bloques)."""
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo '{job_id}' no encontrado o expirado.")
+    return {"status": "success", "job": job.describe()}
+
+@router.get("/jobs/{job_id}/result")
+def job_result_endpoint(job_id: str, format: Optional[str] = None, cursor: Optional[str] = None, limit: int = 1000):
+    """
+    Resultado de un trabajo terminado. Los trabajos con registros responden en su
+    `response_mode` (o en `format`: 'paged', 'ndjson', 'arrow'); 'paged' acepta
+    `cursor` y `limit` como GET /results/{id}.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo '{job_id}' no encontrado o expirado.")
+    if job.status != "succeeded":
+        detail = job.error if job.status == "failed" else f"El trabajo está '{job.status}'."
+        raise HTTPException(status_code=409, detail=detail)
+    if job.result_id is None:
+        return FastJSONResponse({"status": "success", "data": job.result})
+
+    fmt = format or job.result["response_mode"]
+    if fmt in ("ndjson", "arrow"):
+        entry = RESULT_STORE.get(job.result_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Resultado '{job.result_id}' no encontrado o expirado.")
+        return stream_response(entry.rows, entry.meta, fmt=fmt)
+    if fmt != "paged":
+        raise HTTPException(status_code=400, detail="format no soportado. Usa: paged, ndjson, arrow.")
+    return result_page_endpoint(job.result_id, cursor, limit)
+
+@router.post("/jobs/{job_id}/cancel", status_code=202)
+def cancel_job_endpoint(job_id: str):
+    """Cancela un trabajo: si está en cola no se ejecuta; si corre, se detiene en el siguiente bloque."""
+    job = JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo '{job_id}' no encontrado o expirado.")
+    return {"status": "success", "job": job.describe()}
+
+@router.delete("/jobs/{job_id}")
+def delete_job_endpoint(job_id: str):
+    """Elimina un trabajo terminado y sus registros retenidos."""
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo '{job_id}' no encontrado.")
+    if not JOBS.delete(job_id):
+        raise HTTPException(status_code=409, detail="El trabajo sigue activo; cancélalo primero.")
+    if job.result_id:
+        RESULT_STORE.delete(job.result_id)
+    return {"status": "success", "job_id": job_id}
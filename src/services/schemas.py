@@ -10,12 +10,47 @@ class StatsInput(BaseModel):
     data: List[Dict[str, Any]] = Field(..., description="Lista de registros JSON.")
     column: str = Field(..., description="Nombre de la columna numérica a analizar.")
 
+class EstimateInput(StatsInput):
+    approximate: bool = Field(False, description="Estimar sobre una muestra del dataset (mucho más rápido en datasets enormes) y devolver el intervalo de confianza.")
+    confidence: float = Field(0.95, gt=0, lt=1, description="Nivel de confianza del intervalo con approximate=true.")
+
+class ModeInput(StatsInput):
+    method: str = Field("exact", description="'exact' (conteo completo) o 'sketch' (memoria fija, aproximado; agrega distintos estimados y más frecuentes). Útil en columnas de alta cardinalidad.")
+    top_k: int = Field(5, ge=1, le=100, description="Valores más frecuentes a reportar con method='sketch'.")
+
+# --- CORRELACIÓN / COVARIANZA ---
+class CorrelationInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="Lista de registros JSON.")
+    columns: Optional[List[str]] = Field(None, description="Columnas numéricas a relacionar (por defecto todas las numéricas).")
+    method: str = Field("pearson", description="Método: 'pearson', 'spearman' (por rangos) o 'covariance'.")
+    min_periods: int = Field(2, ge=2, description="Mínimo de filas con ambos valores para reportar un par.")
+    include_chart: bool = Field(False, description="Si es True, agrega un mapa de calor (PNG base64) en 'image_base64'.")
+
+# --- DISTRIBUCIÓN (Histograma / Outliers) ---
+class HistogramInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="Lista de registros JSON.")
+    column: str = Field(..., description="Columna numérica a analizar.")
+    bins: int = Field(10, ge=1, description="Número de bins (métodos 'fixed' y 'quantile').")
+    method: str = Field("fixed", description="Bins: 'fixed' (mismo ancho), 'quantile' (misma frecuencia) o 'fd' (Freedman-Diaconis, automático).")
+    group_by: Optional[str] = Field(None, description="Columna para un histograma por grupo (mismos bordes en todos los grupos).")
+
+class OutlierInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="Lista de registros JSON.")
+    column: str = Field(..., description="Columna numérica a analizar.")
+    method: str = Field("iqr", description="Método: 'iqr' (cercas de Tukey), 'zscore' o 'mad' (z modificado, robusto).")
+    threshold: Optional[float] = Field(None, gt=0, description="Umbral: k x IQR (1.5), |z| (3) o |z modificado| (3.5) por defecto.")
+    group_by: Optional[str] = Field(None, description="Columna para calcular los límites por grupo (ej: por cliente).")
+    max_indices: int = Field(1000, ge=0, description="Máximo de posiciones de fila a devolver (las más extremas primero).")
+
 # --- AGRUPACIÓN (Grouping) ---
 class GroupingInput(BaseModel):
     data: List[Dict[str, Any]] = Field(..., description="Datos crudos.")
     group_by: str = Field(..., description="Columna para agrupar (ej: 'vendedor').")
     target_column: str = Field(..., description="Columna a operar (ej: 'venta').")
     operation: str = Field("sum", description="Operación: 'sum', 'mean', 'count'.")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+    approximate: bool = Field(False, description="Estimar cada grupo sobre una muestra estratificada y agregar su intervalo de confianza (<columna>_ci_low / _ci_high).")
+    confidence: float = Field(0.95, gt=0, lt=1, description="Nivel de confianza del intervalo con approximate=true.")
 
 # --- GRÁFICOS (Charts)
 class ChartInput(BaseModel):
@@ -28,6 +63,7 @@ class ChartInput(BaseModel):
         "image", 
         description="Formato de salida: 'image' (base64 PNG) o 'json' (datos para frontend React/Recharts)."
     )
+    approximate: bool = Field(False, description="Graficar una muestra del dataset (estratificada por el eje X; uniforme en pie) en lugar de todas las filas.")
 
 # --- FILTRADO ---
 class FilterInput(BaseModel):
@@ -35,6 +71,7 @@ class FilterInput(BaseModel):
     column: str = Field(..., description="Columna a evaluar.")
     operator: str = Field(..., description="Operador: '>', '<', '==', '!=', '>=', '<='.")
     value: Union[float, int, str] = Field(..., description="Valor contra el cual comparar.")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
 
 # --- RANKING ---
 class TopNInput(BaseModel):
@@ -42,6 +79,7 @@ class TopNInput(BaseModel):
     column: str = Field(..., description="Columna criterio para el ranking.")
     n: int = Field(5, description="Cuántos registros devolver.")
     ascending: bool = Field(False, description="False = De mayor a menor (Top). True = De menor a mayor (Bottom).")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
 
 # --- PREDICCIÓN ---
 class ForecastInput(BaseModel):
@@ -50,6 +88,36 @@ class ForecastInput(BaseModel):
     y_col: str = Field(..., description="Columna a predecir (Eje Y).")
     periods: int = Field(3, description="Cuántos periodos futuros proyectar.")
 
+# --- ANOMALÍAS EN SERIES DE TIEMPO ---
+class AnomalyInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="Puntos (ej: facturas) con fecha y valor.")
+    date_col: str = Field(..., description="Columna de fecha.")
+    value_col: Optional[str] = Field(None, description="Columna numérica a agregar por bucket (opcional con agg='count').")
+    series_col: Optional[str] = Field(None, description="Columna que separa las series (ej: 'CardName'); sin ella hay una sola serie.")
+    bucket: str = Field("day", description="Tamaño del bucket de tiempo: 'hour', 'day', 'week', 'month'.")
+    agg: str = Field("sum", description="Agregación por bucket: 'sum', 'count', 'mean'.")
+    method: str = Field("rolling_mad", description="Detector: 'rolling_mad' (mediana/MAD móvil) o 'seasonal_zscore' (z-score contra la misma posición estacional).")
+    window: int = Field(28, ge=3, description="Buckets de historia que forman el baseline.")
+    season: int = Field(7, ge=1, description="Periodo estacional en buckets (7 = semanal con buckets diarios).")
+    threshold: Optional[float] = Field(None, gt=0, description="Umbral del score (por defecto 3.5 con rolling_mad, 3 con seasonal_zscore).")
+    max_anomalies: int = Field(100, ge=0, description="Máximo de anomalías a devolver (las más recientes primero).")
+    return_state: bool = Field(False, description="Si es True, devuelve el estado del detector para seguir en modo streaming.")
+
+class AnomalyUpdateInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(default_factory=list, description="Puntos nuevos con fecha y valor.")
+    date_col: str = Field(..., description="Columna de fecha.")
+    value_col: Optional[str] = Field(None, description="Columna numérica a agregar por bucket (opcional con agg='count').")
+    series_col: Optional[str] = Field(None, description="Columna que separa las series.")
+    state: Optional[Dict[str, Any]] = Field(None, description="Estado devuelto por la llamada anterior (o por el batch con return_state). Sin estado, se inicia uno nuevo.")
+    bucket: str = Field("day", description="Tamaño del bucket (solo al iniciar sin estado).")
+    agg: str = Field("sum", description="Agregación por bucket (solo al iniciar sin estado).")
+    method: str = Field("rolling_mad", description="Detector (solo al iniciar sin estado).")
+    window: int = Field(28, ge=3, description="Buckets de historia (solo al iniciar sin estado).")
+    season: int = Field(7, ge=1, description="Periodo estacional en buckets (solo al iniciar sin estado).")
+    threshold: Optional[float] = Field(None, gt=0, description="Umbral del score (solo al iniciar sin estado).")
+    flush: bool = Field(False, description="Si es True, cierra y evalúa los buckets abiertos (ej: al terminar el día).")
+    max_anomalies: int = Field(100, ge=0, description="Máximo de anomalías a devolver.")
+
 # --- RECONCILIACIÓN (Cross-reference) ---
 class ReconcileInput(BaseModel):
     data_a: List[Dict[str, Any]] = Field(..., description="Primer conjunto de datos (ej: Facturas SAP).")
@@ -58,12 +126,92 @@ class ReconcileInput(BaseModel):
     key_column_b: Optional[str] = Field(None, description="Nombre del campo clave en el conjunto B (ej: 'cufe'). Si no se especifica, usa 'key_column'.")
     key_column: str = Field("CUFE", description="Nombre del campo clave común si ambos conjuntos usan el mismo nombre.")
     mode: str = Field("missing_in_a", description="Modo de operación: 'missing_in_a' (en B pero no en A), 'missing_in_b' (en A pero no en B), 'intersection' (en ambos).")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+    # Cruce por tolerancia para registros sin clave (ej: facturas SAP sin CUFE)
+    counterparty_column_a: Optional[str] = Field(None, description="Columna de contraparte/NIT en A (ej: 'FederalTaxID'). Junto con monto y fecha activa el cruce por tolerancia.")
+    counterparty_column_b: Optional[str] = Field(None, description="Columna de contraparte/NIT en B (ej: 'nit_emisor'). Por defecto, la de A.")
+    amount_column_a: Optional[str] = Field(None, description="Columna de monto en A (ej: 'DocTotal').")
+    amount_column_b: Optional[str] = Field(None, description="Columna de monto en B (ej: 'valor_total'). Por defecto, la de A.")
+    date_column_a: Optional[str] = Field(None, description="Columna de fecha en A (ej: 'DocDate').")
+    date_column_b: Optional[str] = Field(None, description="Columna de fecha en B (ej: 'fecha_emision'). Por defecto, la de A.")
+    amount_tolerance: float = Field(1.0, ge=0, description="Diferencia absoluta de monto aceptada.")
+    amount_tolerance_pct: float = Field(0.0, ge=0, description="Diferencia relativa de monto aceptada (0.01 = 1%); se usa la mayor de las dos.")
+    date_tolerance_days: int = Field(3, ge=0, description="Diferencia máxima en días entre las fechas.")
 
 
 # --- EJECUCIÓN GENÉRICA (Para /execute) ---
 class ExecutionRequest(BaseModel):
     tool_name: str = Field(..., description="Nombre exacto de la tool a ejecutar.")
     payload: Dict[str, Any] = Field(..., description="Argumentos para la tool.")
+    response_mode: str = Field("json", description="Modo de respuesta: 'json' (un solo body), 'ndjson' o 'arrow' (streaming por bloques), 'paged' (primera página + cursor).")
+    page_size: int = Field(1000, ge=1, le=100000, description="Registros por página cuando response_mode='paged'.")
+
+# --- TRABAJOS ASÍNCRONOS (análisis largos) ---
+class JobRequest(BaseModel):
+    tool_name: str = Field(..., description="Nombre exacto de la tool a ejecutar.")
+    payload: Dict[str, Any] = Field(..., description="Argumentos para la tool (los datasets pueden ser {'dataset_id': ...}).")
+    response_mode: str = Field("json", description="'json' guarda el resultado completo; 'ndjson', 'arrow' o 'paged' guardan los registros en el servidor y GET /jobs/{id}/result los entrega en ese modo.")
+
+# --- DATASETS REGISTRADOS (memoria compartida entre workers) ---
+class DatasetInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="Registros del dataset a registrar.")
+    name: Optional[str] = Field(None, description="Nombre descriptivo del dataset.")
+    ttl_seconds: Optional[float] = Field(None, gt=0, description="Tiempo de vida en segundos (por defecto ANALYTICS_DATASET_TTL_SECONDS).")
+
+class DatasetAppendInput(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., min_length=1, description="Filas a agregar al final del dataset (mismas columnas).")
+
+class CubeInput(BaseModel):
+    name: str = Field(..., description="Nombre del cubo (letras, números, '_' y '-').")
+    dimensions: List[str] = Field(..., min_length=1, description="Columnas por las que se podrá agrupar (ej: ['CardName', 'Branch']).")
+    measures: List[str] = Field(..., min_length=1, description="Columnas numéricas a sumar/contar (ej: ['DocTotal']).")
+
+class IndexInput(BaseModel):
+    columns: List[str] = Field(..., min_length=1, description="Columnas a indexar.")
+    kind: str = Field("sorted", description="'sorted' (rangos >, <, >=, <=, igualdad numérica y top N) o 'hash' (igualdad con texto/categorías).")
+
+# --- SQL EMBEBIDO (DuckDB) ---
+class SQLQueryInput(BaseModel):
+    query: str = Field(..., description="Una consulta SELECT (o WITH ... SELECT). Tablas: 'data', 'data_b' y las de 'datasets'.")
+    data: List[Dict[str, Any]] = Field(default_factory=list, description="Registros expuestos como la tabla 'data'.")
+    data_b: List[Dict[str, Any]] = Field(default_factory=list, description="Registros expuestos como la tabla 'data_b' (para joins).")
+    datasets: Dict[str, str] = Field(default_factory=dict, description="Datasets registrados como tablas: {nombre_tabla: dataset_id}.")
+    max_rows: int = Field(1000, ge=1, description="Máximo de filas a devolver (tope ANALYTICS_SQL_MAX_ROWS).")
+    timeout_seconds: float = Field(10, gt=0, description="Tiempo máximo de la consulta (tope ANALYTICS_SQL_TIMEOUT_SECONDS).")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+
+# --- ARCHIVOS LOCALES (ejecución por bloques, out-of-core) ---
+class FileStatsInput(BaseModel):
+    path: str = Field(..., description="Ruta del archivo Parquet/CSV relativa a ANALYTICS_DATA_ROOT.")
+    column: str = Field(..., description="Columna a analizar.")
+    statistic: str = Field("mean", description="Estadística: 'mean' (media y volatilidad), 'median' (mediana e IQR), 'mode' (moda y dominancia).")
+    method: str = Field("exact", description="Para 'mode': 'exact' o 'sketch' (memoria fija, aproximado).")
+    top_k: int = Field(5, ge=1, le=100, description="Valores más frecuentes a reportar con method='sketch'.")
+
+class FileGroupingInput(BaseModel):
+    path: str = Field(..., description="Ruta del archivo Parquet/CSV relativa a ANALYTICS_DATA_ROOT.")
+    group_by: str = Field(..., description="Columna para agrupar (ej: 'vendedor').")
+    target_column: str = Field(..., description="Columna a operar (ej: 'venta').")
+    operation: str = Field("sum", description="Operación: 'sum', 'mean', 'count'.")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+
+class FileFilterInput(BaseModel):
+    path: str = Field(..., description="Ruta del archivo Parquet/CSV relativa a ANALYTICS_DATA_ROOT.")
+    column: str = Field(..., description="Columna a evaluar.")
+    operator: str = Field(..., description="Operador: '>', '<', '==', '!=', '>=', '<='.")
+    value: Union[float, int, str] = Field(..., description="Valor contra el cual comparar.")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+    output_path: Optional[str] = Field(None, description="Archivo .parquet (relativo a ANALYTICS_DATA_ROOT) donde escribir el resultado si es grande.")
+
+class FileReconcileInput(BaseModel):
+    path_a: str = Field(..., description="Archivo del primer conjunto (ej: Facturas SAP), relativo a ANALYTICS_DATA_ROOT.")
+    path_b: str = Field(..., description="Archivo del segundo conjunto (ej: Documentos DIAN), relativo a ANALYTICS_DATA_ROOT.")
+    key_column_a: Optional[str] = Field(None, description="Nombre del campo clave en el conjunto A (ej: 'U_CUFE'). Si no se especifica, usa 'key_column'.")
+    key_column_b: Optional[str] = Field(None, description="Nombre del campo clave en el conjunto B (ej: 'cufe'). Si no se especifica, usa 'key_column'.")
+    key_column: str = Field("CUFE", description="Nombre del campo clave común si ambos conjuntos usan el mismo nombre.")
+    mode: str = Field("missing_in_a", description="Modo de operación: 'missing_in_a' (en B pero no en A), 'missing_in_b' (en A pero no en B), 'intersection' (en ambos).")
+    output_shape: str = Field("records", description="Forma del resultado: 'records' (lista de registros) o 'columnar' ({columns, data: {col: [...]}}, más compacta).")
+    output_path: Optional[str] = Field(None, description="Archivo .parquet (relativo a ANALYTICS_DATA_ROOT) donde escribir el resultado si es grande.")
 
 # ==========================================
 # 2. OUTPUTS (Salidas enriquecidas)
@@ -78,9 +226,12 @@ class SmartMedianResult(BaseModel):
     iqr: float
 
 class SmartModeResult(BaseModel):
-    top_value: Union[str, float, int]
+    top_value: Optional[Union[str, float, int]]
     dominance_pct: float
     tie: bool
+    approximate: bool = False
+    distinct_estimate: Optional[int] = None
+    top_values: Optional[List[Dict[str, Any]]] = None
 
 # --- OUTPUT PARA PREDICCIÓN ---
 class ForecastResult(BaseModel):
@@ -1,16 +1,33 @@
 from langchain_core.tools import tool
 from services.schemas import ChartInput
 from typing import List, Dict, Any
+from utils.processor import build_frame, numeric_column
 
 from engines.visualizers.charts.bar import generate_bar_chart
 from engines.visualizers.charts.line import generate_line_chart
 from engines.visualizers.charts.pie import generate_pie_chart
+from engines.descriptive.approximate import sample_frame
 
 
 # ==========================================
 # HELPER: Formato JSON para Frontend (Recharts)
 # ==========================================
 
+def _recharts_columns(data: List[Dict[str, Any]], x_col: str, y_col: str):
+    """Columnas 'name' (texto) y 'value' (número) ya limpias, vectorizado."""
+    df = build_frame(data)
+    if x_col in df.columns:
+        names = df[x_col].astype(str).where(df[x_col].notna(), "").tolist()
+    else:
+        names = [""] * len(df)
+    if y_col in df.columns:
+        # "$1.234,56" / "$1,234.56" -> número; lo no numérico queda en 0
+        values = numeric_column(df, y_col).fillna(0).astype(float).tolist()
+    else:
+        values = [0.0] * len(df)
+    return names, values
+
+
 def _format_for_recharts(
     data: List[Dict[str, Any]], 
     x_col: str, 
@@ -24,22 +41,9 @@ def _format_for_recharts(
     Este formato permite que el frontend renderice graficos interactivos.
     """
     # Transformar datos al formato que espera Recharts
-    chart_data = []
-    for row in data:
-        x_val = row.get(x_col, "")
-        y_val = row.get(y_col, 0)
-        
-        # Asegurar que y_val sea numerico
-        if isinstance(y_val, str):
-            try:
-                y_val = float(y_val.replace(",", "").replace("$", ""))
-            except:
-                y_val = 0
-        
-        chart_data.append({
-            "name": str(x_val),  # Recharts usa 'name' para el eje X
-            "value": float(y_val) if y_val else 0  # 'value' para el eje Y
-        })
+    # ('name' para el eje X, 'value' para el eje Y)
+    names, values = _recharts_columns(data, x_col, y_col)
+    chart_data = [{"name": name, "value": value} for name, value in zip(names, values)]
     
     return {
         "status": "success",
@@ -60,6 +64,12 @@ def _format_for_recharts(
     }
 
 
+def _chart_rows(data: List[Dict[str, Any]], stratify: str = None):
+    """Muestra del dataset para graficar en modo aproximado, y su descripción."""
+    rows, sample = sample_frame(data, stratify)
+    return rows, {"approximate": True, "sample": sample.describe()}
+
+
 # Paleta de colores para Pie Charts
 PIE_COLORS = ["#4F46E5", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899", "#06B6D4", "#84CC16"]
 
@@ -71,22 +81,11 @@ def _format_pie_for_recharts(
     title: str
 ) -> dict:
     """Formato especial para Pie Charts con colores individuales."""
-    chart_data = []
-    for i, row in enumerate(data):
-        x_val = row.get(x_col, "")
-        y_val = row.get(y_col, 0)
-        
-        if isinstance(y_val, str):
-            try:
-                y_val = float(y_val.replace(",", "").replace("$", ""))
-            except:
-                y_val = 0
-        
-        chart_data.append({
-            "name": str(x_val),
-            "value": float(y_val) if y_val else 0,
-            "fill": PIE_COLORS[i % len(PIE_COLORS)]  # Color ciclico
-        })
+    names, values = _recharts_columns(data, x_col, y_col)
+    chart_data = [
+        {"name": name, "value": value, "fill": PIE_COLORS[i % len(PIE_COLORS)]}  # Color ciclico
+        for i, (name, value) in enumerate(zip(names, values))
+    ]
     
     return {
         "status": "success",
@@ -119,7 +118,8 @@ def analytics_chart_bar(
     y_col: str, 
     title: str = "Barras", 
     color: str = "skyblue",
-    output_format: str = "image"
+    output_format: str = "image",
+    approximate: bool = False
 ) -> dict:
     """
     [ANALYTICS] Genera grafico de BARRAS vertical.
@@ -127,13 +127,17 @@ def analytics_chart_bar(
     - x_col: Nombre de columna para eje X
     - y_col: Nombre de columna para eje Y
     - output_format: 'image' (PNG base64) o 'json' (para React/Recharts)
+    - approximate: true para graficar una muestra estratificada por x_col (datasets enormes)
     """
     try:
+        extra = {}
+        if approximate:
+            data, extra = _chart_rows(data, x_col)
         if output_format == "json":
-            return _format_for_recharts(data, x_col, y_col, title, "bar", color)
+            return {**_format_for_recharts(data, x_col, y_col, title, "bar", color), **extra}
         else:
             b64 = generate_bar_chart(data, x_col, y_col, title, color)
-            return {"status": "success", "output_format": "image", "image_base64": b64}
+            return {"status": "success", "output_format": "image", "image_base64": b64, **extra}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
@@ -145,7 +149,8 @@ def analytics_chart_line(
     y_col: str, 
     title: str = "Linea", 
     color: str = "green",
-    output_format: str = "image"
+    output_format: str = "image",
+    approximate: bool = False
 ) -> dict:
     """
     [ANALYTICS] Genera grafico de LINEA temporal.
@@ -153,13 +158,17 @@ def analytics_chart_line(
     - x_col: Nombre de columna para eje X (usualmente fecha)
     - y_col: Nombre de columna para eje Y (valores)
     - output_format: 'image' (PNG base64) o 'json' (para React/Recharts)
+    - approximate: true para graficar una muestra estratificada por x_col (datasets enormes)
     """
     try:
+        extra = {}
+        if approximate:
+            data, extra = _chart_rows(data, x_col)
         if output_format == "json":
-            return _format_for_recharts(data, x_col, y_col, title, "line", color)
+            return {**_format_for_recharts(data, x_col, y_col, title, "line", color), **extra}
         else:
             b64 = generate_line_chart(data, x_col, y_col, title, color)
-            return {"status": "success", "output_format": "image", "image_base64": b64}
+            return {"status": "success", "output_format": "image", "image_base64": b64, **extra}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
@@ -171,7 +180,8 @@ def analytics_chart_pie(
     y_col: str, 
     title: str = "Pastel", 
     color: str = None,
-    output_format: str = "image"
+    output_format: str = "image",
+    approximate: bool = False
 ) -> dict:
     """
     [ANALYTICS] Genera grafico de PASTEL/PIE para distribuciones.
@@ -179,12 +189,16 @@ def analytics_chart_pie(
     - x_col: Nombre de columna para categorias
     - y_col: Nombre de columna para valores
     - output_format: 'image' (PNG base64) o 'json' (para React/Recharts)
+    - approximate: true para graficar una muestra uniforme (datasets enormes)
     """
     try:
+        extra = {}
+        if approximate:
+            data, extra = _chart_rows(data, None)
         if output_format == "json":
-            return _format_pie_for_recharts(data, x_col, y_col, title)
+            return {**_format_pie_for_recharts(data, x_col, y_col, title), **extra}
         else:
             b64 = generate_pie_chart(data, x_col, y_col, title)
-            return {"status": "success", "output_format": "image", "image_base64": b64}
+            return {"status": "success", "output_format": "image", "image_base64": b64, **extra}
     except Exception as e:
         return {"status": "error", "error": str(e)}
\ No newline at end of file
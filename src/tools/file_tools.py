@@ -0,0 +1,107 @@
+from langchain_core.tools import tool
+from services.schemas import FileStatsInput, FileGroupingInput, FileFilterInput, FileReconcileInput
+# Ejecución por bloques: los datos se leen del disco, no viajan en el payload
+from engines.chunked import file_filter, file_group_and_aggregate, file_reconcile, file_statistic
+
+
+@tool(args_schema=FileStatsInput)
+def analytics_file_stats(path: str, column: str, statistic: str = "mean", method: str = "exact", top_k: int = 5) -> dict:
+    """
+    [ANALYTICS] Estadística de una columna de un ARCHIVO grande (Parquet/CSV) leído por bloques.
+    Usar cuando los datos están en disco y no caben en memoria (ej: un año de documentos DIAN).
+    - path: Ruta del archivo relativa al directorio de datos
+    - column: Columna a analizar
+    - statistic: 'mean' (media y volatilidad), 'median' (mediana e IQR), 'mode' (moda)
+    - method: para 'mode', 'exact' (default) o 'sketch' (aproximado, memoria fija)
+    Retorna lo mismo que analytics_stat_mean / median / mode.
+    """
+    try:
+        return file_statistic(path, column, statistic, method, top_k)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@tool(args_schema=FileGroupingInput)
+def analytics_file_aggregate(path: str, group_by: str, target_column: str, operation: str = "sum", output_shape: str = "records") -> dict:
+    """
+    [ANALYTICS] AGRUPA un ARCHIVO grande (Parquet/CSV) por bloques y aplica operacion matematica.
+    - path: Ruta del archivo relativa al directorio de datos
+    - group_by: Columna para agrupar (ej: CardName, DocDate)
+    - target_column: Columna numerica a operar (ej: DocTotal)
+    - operation: sum, mean, count
+    - output_shape: 'records' (default) o 'columnar'
+    """
+    try:
+        result = file_group_and_aggregate(path, group_by, target_column, operation, output_shape)
+        return {
+            "status": "success",
+            "data": result,
+            "summary": f"Archivo agrupado por '{group_by}' usando '{operation}'."
+        }
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@tool(args_schema=FileFilterInput)
+def analytics_file_filter(path: str, column: str, operator: str, value: float, output_shape: str = "records", output_path: str = None) -> dict:
+    """
+    [ANALYTICS] FILTRA un ARCHIVO grande (Parquet/CSV) por bloques.
+    - path: Ruta del archivo relativa al directorio de datos
+    - column: Columna a filtrar
+    - operator: >, <, >=, <=, ==, !=
+    - value: Valor de comparacion
+    - output_path: Archivo .parquet donde escribir el resultado si es muy grande (opcional)
+    """
+    try:
+        result = file_filter(path, column, operator, value, output_shape, output_path)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@tool(args_schema=FileReconcileInput)
+def analytics_file_reconcile(
+    path_a: str,
+    path_b: str,
+    key_column_a: str = None,
+    key_column_b: str = None,
+    key_column: str = "CUFE",
+    mode: str = "missing_in_a",
+    output_shape: str = "records",
+    output_path: str = None
+) -> dict:
+    """
+    [ANALYTICS] RECONCILIA dos ARCHIVOS grandes (Parquet/CSV) por bloques, sin cargarlos en memoria.
+    Misma semantica que analytics_reconcile_datasets (ej: Facturas SAP vs Documentos DIAN de un año).
+    - path_a / path_b: Rutas de los archivos relativas al directorio de datos
+    - key_column_a / key_column_b / key_column: Campo clave (igual que en la reconciliacion)
+    - mode: 'missing_in_a', 'missing_in_b' o 'intersection'
+    - output_path: Archivo .parquet donde escribir el resultado si es muy grande (opcional)
+    Las claves se comparan por hash de 64 bits; en 'intersection' cada coincidencia se confirma
+    con la clave real. En 'missing_in_*' una colisión (probabilidad ~ filas_a x filas_b / 2^64,
+    unas 5 en un millón para 10M x 10M claves) podría omitir una clave faltante.
+    """
+    try:
+        result = file_reconcile(
+            path_a=path_a,
+            path_b=path_b,
+            key_column_a=key_column_a,
+            key_column_b=key_column_b,
+            key_column=key_column,
+            mode=mode,
+            output_shape=output_shape,
+            output_path=output_path
+        )
+        return {"status": "success", **result}
+    except ValueError as ve:
+        return {
+            "status": "error",
+            "error": str(ve),
+            "summary": f"Error en la reconciliación: {str(ve)}"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error inesperado: {str(e)}",
+            "summary": "Error al procesar la reconciliación de datos"
+        }
@@ -1,6 +1,7 @@
 from langchain_core.tools import tool
-from services.schemas import ForecastInput
+from services.schemas import ForecastInput, AnomalyInput, AnomalyUpdateInput
 from src.engines.predictive.regression import analytics_linear_forecast
+from engines.predictive.anomaly import detect_anomalies, update_anomaly_state
 
 @tool(args_schema=ForecastInput)
 def analytics_linear_forecast(data: list[dict], x_col: str, y_col: str, periods: int = 3) -> dict:
@@ -9,4 +10,74 @@ def analytics_linear_forecast(data: list[dict], x_col: str, y_col: str, periods:
         result = analytics_linear_forecast(data, x_col, y_col, periods)
         return {"status": "success", "data": result}
     except Exception as e:
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "error", "error": str(e)}
+
+
+@tool(args_schema=AnomalyInput)
+def analytics_anomaly_detect(
+    data: list[dict],
+    date_col: str,
+    value_col: str = None,
+    series_col: str = None,
+    bucket: str = "day",
+    agg: str = "sum",
+    method: str = "rolling_mad",
+    window: int = 28,
+    season: int = 7,
+    threshold: float = None,
+    max_anomalies: int = 100,
+    return_state: bool = False
+) -> dict:
+    """
+    [ANALYTICS] Detecta ANOMALIAS en series de tiempo (ej: totales diarios de facturas anormales).
+    Agrupa los puntos por bucket de tiempo y por serie, y compara cada bucket con su historia reciente.
+    - data: Puntos con fecha y valor (puede ser REF_ID)
+    - date_col / value_col: Columnas de fecha y valor
+    - series_col: Columna para evaluar muchas series a la vez (ej: CardName), opcional
+    - bucket: 'hour', 'day', 'week', 'month'; agg: 'sum', 'count', 'mean'
+    - method: 'rolling_mad' (robusto) o 'seasonal_zscore' (respeta el dia de la semana con season=7)
+    - return_state: True para continuar luego con analytics_anomaly_update
+    Retorna: anomalies [{series, bucket, value, expected, score, direction}]
+    """
+    try:
+        result = detect_anomalies(
+            data, date_col, value_col, series_col, bucket, agg, method,
+            window, season, threshold, max_anomalies, return_state
+        )
+        return {"status": "success", "data": result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@tool(args_schema=AnomalyUpdateInput)
+def analytics_anomaly_update(
+    date_col: str,
+    data: list[dict] = None,
+    value_col: str = None,
+    series_col: str = None,
+    state: dict = None,
+    bucket: str = "day",
+    agg: str = "sum",
+    method: str = "rolling_mad",
+    window: int = 28,
+    season: int = 7,
+    threshold: float = None,
+    flush: bool = False,
+    max_anomalies: int = 100
+) -> dict:
+    """
+    [ANALYTICS] Modo STREAMING de deteccion de anomalias: actualiza el detector con puntos nuevos
+    sin recalcular la historia. Enviar el 'state' devuelto por la llamada anterior.
+    - data: Puntos nuevos con fecha y valor
+    - state: Estado anterior (de analytics_anomaly_detect con return_state o de esta tool)
+    - flush: True para cerrar y evaluar el bucket en curso (ej: al cierre del dia)
+    Retorna: anomalies de los buckets cerrados y el nuevo state
+    """
+    try:
+        result = update_anomaly_state(
+            data, date_col, value_col, series_col, state, bucket, agg, method,
+            window, season, threshold, flush, max_anomalies
+        )
+        return {"status": "success", "data": result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
@@ -10,7 +10,17 @@ def analytics_reconcile_datasets(
     key_column_a: str = None,
     key_column_b: str = None,
     key_column: str = "CUFE", 
-    mode: str = "missing_in_a"
+    mode: str = "missing_in_a",
+    output_shape: str = "records",
+    counterparty_column_a: str = None,
+    counterparty_column_b: str = None,
+    amount_column_a: str = None,
+    amount_column_b: str = None,
+    date_column_a: str = None,
+    date_column_b: str = None,
+    amount_tolerance: float = 1.0,
+    amount_tolerance_pct: float = 0.0,
+    date_tolerance_days: int = 3
 ) -> dict:
     """
     [ANALYTICS] RECONCILIA dos conjuntos de datos para encontrar discrepancias fiscales.
@@ -27,11 +37,19 @@ def analytics_reconcile_datasets(
         * 'missing_in_a': Muestra registros que existen en B pero NO en A (Default)
         * 'missing_in_b': Muestra registros que existen en A pero NO en B
         * 'intersection': Muestra registros que coinciden en AMBOS lados
+    - output_shape: 'records' (lista de registros, default) o 'columnar' ({columns, data})
+    - counterparty_column_a/b, amount_column_a/b, date_column_a/b: Opcionales. Si se
+      indican (NIT, monto y fecha), los registros sin clave (ej: facturas SAP sin CUFE)
+      se cruzan por misma contraparte, monto dentro de amount_tolerance (o
+      amount_tolerance_pct) y fecha dentro de date_tolerance_days. Van aparte en
+      'probable_matches'; el resultado por clave no cambia.
     
     Casos de uso:
     - "¿Qué facturas están en DIAN pero no en SAP?" -> mode='missing_in_a'
     - "¿Qué facturas emitimos que no reportamos a DIAN?" -> mode='missing_in_b'
     - "¿Cuáles documentos coinciden perfectamente?" -> mode='intersection'
+    - "Hay facturas SAP sin CUFE, ¿a qué documento DIAN corresponden?" -> columnas de
+      contraparte, monto y fecha
     
     Retorna:
     - summary: Descripción del resultado
@@ -39,6 +57,8 @@ def analytics_reconcile_datasets(
     - mode_used: El modo que se utilizó
     - data: Lista de registros que cumplen el criterio
     - metadata: Información adicional sobre los datasets
+    - probable_matches: Solo con el cruce por tolerancia. Pares (row_a, row_b) con
+      contraparte, montos, fechas y sus diferencias
     
     Ejemplo de uso:
     Usuario: "Cruza las facturas de SAP del último mes con los documentos DIAN y 
@@ -62,10 +82,20 @@ def analytics_reconcile_datasets(
             key_column_a=key_column_a,
             key_column_b=key_column_b,
             key_column=key_column,
-            mode=mode
+            mode=mode,
+            output_shape=output_shape,
+            counterparty_column_a=counterparty_column_a,
+            counterparty_column_b=counterparty_column_b,
+            amount_column_a=amount_column_a,
+            amount_column_b=amount_column_b,
+            date_column_a=date_column_a,
+            date_column_b=date_column_b,
+            amount_tolerance=amount_tolerance,
+            amount_tolerance_pct=amount_tolerance_pct,
+            date_tolerance_days=date_tolerance_days
         )
         
-        return {
+        response = {
             "status": "success",
             "summary": result["summary"],
             "match_count": result["match_count"],
@@ -75,6 +105,9 @@ def analytics_reconcile_datasets(
             "data": result["data"],
             "metadata": result["metadata"]
         }
+        if "probable_matches" in result:
+            response["probable_matches"] = result["probable_matches"]
+        return response
         
     except ValueError as ve:
         # User-friendly error handling
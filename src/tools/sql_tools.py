@@ -0,0 +1,41 @@
+from langchain_core.tools import tool
+from services.schemas import SQLQueryInput
+from engines.sql import run_sql_query
+
+
+@tool(args_schema=SQLQueryInput)
+def analytics_sql_query(
+    query: str,
+    data: list[dict] = None,
+    data_b: list[dict] = None,
+    datasets: dict = None,
+    max_rows: int = 1000,
+    timeout_seconds: float = 10,
+    output_shape: str = "records"
+) -> dict:
+    """
+    [ANALYTICS] Ejecuta UNA consulta SQL de solo lectura (SELECT) sobre los datos.
+    Reemplaza cadenas de filtro + agrupacion + top N, y permite JOINs y GROUP BY de varias columnas.
+    - query: SQL (dialecto DuckDB). Tablas disponibles: data, data_b y las de 'datasets'
+    - data: Registros de la tabla 'data' (puede ser REF_ID)
+    - data_b: Registros de la tabla 'data_b' (opcional, para joins)
+    - datasets: Datasets registrados como tablas {nombre: dataset_id} (opcional)
+    - max_rows: Maximo de filas a devolver (default 1000)
+    - output_shape: 'records' (default) o 'columnar'
+    Ejemplo: "Top 5 clientes por ventas en Bogota" ->
+      SELECT CardName, SUM(DocTotal) AS total FROM data WHERE Sucursal = 'Bogota'
+      GROUP BY CardName ORDER BY total DESC LIMIT 5
+    Nota: montos como texto ("$1.234,56") deben convertirse en SQL o con las tools de transformacion.
+    """
+    try:
+        result = run_sql_query(
+            query,
+            {"data": data, "data_b": data_b},
+            datasets=datasets,
+            max_rows=max_rows,
+            timeout_seconds=timeout_seconds,
+            output_shape=output_shape
+        )
+        return {"status": "success", **result}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
@@ -1,47 +1,116 @@
 from langchain_core.tools import tool
-from services.schemas import StatsInput
+from services.schemas import StatsInput, EstimateInput, ModeInput, CorrelationInput, HistogramInput, OutlierInput
 # Importamos la lógica pura desde el engine
 from src.engines.descriptive.central import get_smart_mean, get_smart_median, get_smart_mode
+from engines.descriptive.correlation import get_correlation_matrix
+from engines.descriptive.distribution import get_histogram, detect_outliers
 
 # --- TOOL 1: MEDIA ---
-@tool(args_schema=StatsInput)
-def analytics_stat_mean(data: list[dict], column: str) -> dict:
+@tool(args_schema=EstimateInput)
+def analytics_stat_mean(data: list[dict], column: str, approximate: bool = False, confidence: float = 0.95) -> dict:
     """
     [ANALYTICS] Calcula PROMEDIO aritmetico y volatilidad (desviacion estandar).
     - data: Lista de diccionarios con los datos (puede ser REF_ID)
     - column: Nombre de la columna numerica a analizar
+    - approximate: true para estimar sobre una muestra (datasets enormes, respuesta rapida) con mean_ci
     Retorna: mean, std_dev, count
     """
     try:
         # Llamamos al motor puro
-        return get_smart_mean(data, column)
+        return get_smart_mean(data, column, approximate, confidence)
     except Exception as e:
         return {"error": str(e)}
 
 # --- TOOL 2: MEDIANA ---
-@tool(args_schema=StatsInput)
-def analytics_stat_median(data: list[dict], column: str) -> dict:
+@tool(args_schema=EstimateInput)
+def analytics_stat_median(data: list[dict], column: str, approximate: bool = False, confidence: float = 0.95) -> dict:
     """
     [ANALYTICS] Calcula MEDIANA y rango intercuartil (IQR).
     - data: Lista de diccionarios con los datos (puede ser REF_ID)
     - column: Nombre de la columna numerica a analizar
+    - approximate: true para estimar sobre una muestra (datasets enormes, respuesta rapida) con median_ci
     Retorna: median, q1, q3, iqr (ignora outliers)
     """
     try:
-        return get_smart_median(data, column)
+        return get_smart_median(data, column, approximate, confidence)
     except Exception as e:
         return {"error": str(e)}
 
 # --- TOOL 3: MODA ---
-@tool(args_schema=StatsInput)
-def analytics_stat_mode(data: list[dict], column: str) -> dict:
+@tool(args_schema=ModeInput)
+def analytics_stat_mode(data: list[dict], column: str, method: str = "exact", top_k: int = 5) -> dict:
     """
     [ANALYTICS] Identifica MODA (valor mas frecuente) y dominancia.
     - data: Lista de diccionarios con los datos (puede ser REF_ID)
     - column: Nombre de la columna a analizar
+    - method: 'exact' (default) o 'sketch' (aproximado, memoria fija; para columnas de alta cardinalidad)
+    - top_k: Valores mas frecuentes a reportar con 'sketch'
     Retorna: mode, frequency, percentage (para productos mas vendidos, categorias comunes)
     """
     try:
-        return get_smart_mode(data, column)
+        return get_smart_mode(data, column, method, top_k)
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+# --- TOOL 4: CORRELACIÓN ---
+@tool(args_schema=CorrelationInput)
+def analytics_stat_correlation(
+    data: list[dict],
+    columns: list[str] = None,
+    method: str = "pearson",
+    min_periods: int = 2,
+    include_chart: bool = False
+) -> dict:
+    """
+    [ANALYTICS] Matriz de CORRELACION o COVARIANZA entre columnas numericas ("que campos se mueven juntos").
+    - data: Lista de diccionarios con los datos (puede ser REF_ID)
+    - columns: Columnas a relacionar (opcional, por defecto todas las numericas)
+    - method: 'pearson' (lineal), 'spearman' (por rangos, robusto a outliers) o 'covariance'
+    - include_chart: True para agregar un mapa de calor en base64
+    Retorna: columns, matrix (misma orden que columns), top_pairs (pares mas fuertes)
+    """
+    try:
+        return get_correlation_matrix(data, columns, method, min_periods, include_chart)
+    except Exception as e:
+        return {"error": str(e)}
+
+# --- TOOL 5: HISTOGRAMA ---
+@tool(args_schema=HistogramInput)
+def analytics_stat_histogram(data: list[dict], column: str, bins: int = 10, method: str = "fixed", group_by: str = None) -> dict:
+    """
+    [ANALYTICS] HISTOGRAMA (distribucion) de una columna numerica, opcionalmente por grupo.
+    - data: Lista de diccionarios con los datos (puede ser REF_ID)
+    - column: Columna numerica a analizar
+    - bins: Numero de bins (default 10)
+    - method: 'fixed' (mismo ancho), 'quantile' (misma frecuencia) o 'fd' (automatico)
+    - group_by: Columna para separar por grupo (opcional)
+    Retorna: bin_edges, counts, total, skew (asimetria) y groups si aplica
+    """
+    try:
+        return get_histogram(data, column, bins, method, group_by)
+    except Exception as e:
+        return {"error": str(e)}
+
+# --- TOOL 6: OUTLIERS ---
+@tool(args_schema=OutlierInput)
+def analytics_stat_outliers(
+    data: list[dict],
+    column: str,
+    method: str = "iqr",
+    threshold: float = None,
+    group_by: str = None,
+    max_indices: int = 1000
+) -> dict:
+    """
+    [ANALYTICS] Detecta OUTLIERS (valores atipicos) de una columna numerica, opcionalmente por grupo.
+    - data: Lista de diccionarios con los datos (puede ser REF_ID)
+    - column: Columna numerica a analizar
+    - method: 'iqr' (cercas de Tukey), 'zscore' o 'mad' (robusto)
+    - threshold: Umbral del metodo (opcional)
+    - group_by: Columna para calcular limites por grupo (opcional, ej: por cliente)
+    Retorna: outlier_count, indices (posiciones de fila, mas extremos primero), values, bounds/groups
+    """
+    try:
+        return detect_outliers(data, column, method, threshold, group_by, max_indices)
+    except Exception as e:
+        return {"error": str(e)}
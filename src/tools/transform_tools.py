@@ -1,22 +1,35 @@
 from langchain_core.tools import tool
 from services.schemas import GroupingInput
 from engines.transform.grouping import group_and_aggregate
+from engines.descriptive.approximate import approximate_group
+from utils.serialization import shape_frame
 from services.schemas import FilterInput, TopNInput
 from engines.transform.filtering import apply_filter
 from engines.transform.top_n_records import get_top_n_records
 
 @tool(args_schema=GroupingInput)
-def analytics_transform_aggregate(data: list[dict], group_by: str, target_column: str, operation: str = "sum") -> dict:
+def analytics_transform_aggregate(data: list[dict], group_by: str, target_column: str, operation: str = "sum", output_shape: str = "records", approximate: bool = False, confidence: float = 0.95) -> dict:
     """
     [ANALYTICS] AGRUPA datos y aplica operacion matematica.
     - data: Lista de diccionarios (puede ser REF_ID)
     - group_by: Columna para agrupar (ej: CardName, DocDate)
     - target_column: Columna numerica a operar (ej: DocTotal)
     - operation: sum, avg, count, min, max
+    - output_shape: 'records' (default) o 'columnar'
+    - approximate: true para estimar sobre una muestra estratificada (datasets enormes) con intervalos <target>_ci_low/_ci_high
     Ejemplo: "Total ventas por cliente" -> group_by=CardName, target=DocTotal, op=sum
     """
     try:
-        result = group_and_aggregate(data, group_by, target_column, operation)
+        if approximate:
+            frame, sample = approximate_group(data, group_by, target_column, operation, confidence)
+            return {
+                "status": "success",
+                "data": shape_frame(frame, output_shape),
+                "approximate": True,
+                "sample": {**sample.describe(), "confidence": confidence},
+                "summary": f"Datos agrupados por '{group_by}' usando '{operation}' (estimado sobre {len(sample.positions):,} filas de {sample.population:,}).",
+            }
+        result = group_and_aggregate(data, group_by, target_column, operation, output_shape)
         return {
             "status": "success", 
             "data": result,
@@ -26,33 +39,35 @@ def analytics_transform_aggregate(data: list[dict], group_by: str, target_column
         return {"status": "error", "error": str(e)}
     
 @tool(args_schema=FilterInput)
-def analytics_transform_filter(data: list[dict], column: str, operator: str, value: float) -> dict:
+def analytics_transform_filter(data: list[dict], column: str, operator: str, value: float, output_shape: str = "records") -> dict:
     """
     [ANALYTICS] FILTRA datos por condicion numerica.
     - data: Lista de diccionarios (puede ser REF_ID)
     - column: Columna a filtrar
     - operator: gt, lt, gte, lte, eq, ne
     - value: Valor de comparacion
+    - output_shape: 'records' (default) o 'columnar'
     Ejemplo: "Ventas mayores a 1000" -> column=DocTotal, operator=gt, value=1000
     """
     try:
-        result = apply_filter(data, column, operator, value)
+        result = apply_filter(data, column, operator, value, output_shape)
         return {"status": "success", "data": result}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 @tool(args_schema=TopNInput)
-def analytics_transform_top_n(data: list[dict], column: str, n: int = 5, ascending: bool = False) -> dict:
+def analytics_transform_top_n(data: list[dict], column: str, n: int = 5, ascending: bool = False, output_shape: str = "records") -> dict:
     """
     [ANALYTICS] Obtiene TOP N registros (mayores o menores).
     - data: Lista de diccionarios (puede ser REF_ID)
     - column: Columna para ordenar
     - n: Cantidad de registros (default 5)
     - ascending: False=mayores primero, True=menores primero
+    - output_shape: 'records' (default) o 'columnar'
     Ejemplo: "Top 5 clientes por ventas" -> column=DocTotal, n=5, ascending=False
     """
     try:
-        result = get_top_n_records(data, column, n, ascending)
+        result = get_top_n_records(data, column, n, ascending, output_shape)
         return {"status": "success", "data": result}
     except Exception as e:
         return {"status": "error", "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Construcción compacta de DataFrames (menos memoria por dataset).
+
+`pd.DataFrame(registros)` deja cada texto como object/str y cada número en
+64 bits. `compact_frame` revisa columna por columna:
+
+- texto de baja cardinalidad (CardName, sucursal, tipo de documento) ->
+  `category` (diccionario + códigos enteros; además acelera los groupby),
+- texto de alta cardinalidad (CUFE, NIT, números de documento) -> dtype `str`
+  compacto (Arrow si está disponible) en lugar de objetos Python,
+- enteros -> el tipo entero más pequeño que los contiene,
+- flotantes -> float32 solo si todos los valores se representan exactos.
+
+Todas las conversiones son sin pérdida: los valores que ven los engines y
+los que se serializan son los mismos.
+"""
+
+import os
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+# Por debajo de este tamaño compactar cuesta más de lo que ahorra
+COMPACT_MIN_ROWS = int(os.getenv("ANALYTICS_COMPACT_MIN_ROWS", "50000"))
+# Fracción máxima de valores distintos para codificar como categoría
+CATEGORY_MAX_RATIO = float(os.getenv("ANALYTICS_CATEGORY_MAX_RATIO", "0.5"))
+
+
+def _compact_text(series: pd.Series) -> pd.Series:
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) != "string":
+        # Columnas mixtas (números y texto): se dejan como están
+        return series
+    non_null = series.count()
+    if non_null and series.nunique(dropna=True) <= non_null * CATEGORY_MAX_RATIO:
+        return series.astype("category")
+    if series.dtype == object:
+        return series.astype("str")
+    return series
+
+
+def _compact_float(series: pd.Series) -> pd.Series:
+    values = series.to_numpy()
+    with np.errstate(over="ignore"):
+        narrowed = values.astype(np.float32)
+    # Sin pérdida: mismos valores (NaN incluidos) al volver a float64
+    if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+        return pd.Series(narrowed, index=series.index, name=series.name)
+    return series
+
+
+def compact_column(series: pd.Series) -> pd.Series:
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(dtype):
+        if dtype == np.float64:
+            return _compact_float(series)
+        return series
+    if pd.api.types.is_string_dtype(dtype) or dtype == object:
+        return _compact_text(series)
+    return series
+
+
+def compact_frame(df: pd.DataFrame, min_rows: int = 0) -> pd.DataFrame:
+    """Devuelve el frame con cada columna en su representación compacta sin pérdida."""
+    if len(df) < min_rows:
+        return df
+    compacted = {}
+    for position, name in enumerate(df.columns):
+        series = df.iloc[:, position]
+        narrowed = compact_column(series)
+        if narrowed is not series:
+            compacted[position] = narrowed
+    if not compacted:
+        return df
+    result = df.copy(deep=False)
+    for position, series in compacted.items():
+        result.isetitem(position, series)
+    return result
+
+
+def memory_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Memoria por columna (bytes, incluyendo el contenido de los textos) y total."""
+    usage = df.memory_usage(deep=True, index=False)
+    columns = {
+        str(name): {"dtype": str(df[name].dtype), "bytes": int(usage[name])}
+        for name in df.columns
+    }
+    return {"rows": len(df), "total_bytes": int(usage.sum()), "columns": columns}
@@ -0,0 +1,275 @@
+"""
+Cubos de agregados materializados sobre datasets registrados.
+
+Los tableros piden una y otra vez los mismos agregados (suma o conteo por
+cliente, por mes, por sucursal) sobre un dataset que solo crece. Un cubo
+declara dimensiones y medidas sobre un dataset registrado y guarda, por cada
+combinación de dimensiones, la suma y el conteo de cada medida:
+
+- Se construye una vez recorriendo el dataset (POST /datasets/{id}/cubes).
+- Se mantiene incremental: al agregar filas (POST /datasets/{id}/append) solo
+  se resumen las filas nuevas y se combinan con el cubo, dentro del lock del
+  dataset (`SharedDatasetStore.append`).
+- `group_and_aggregate` responde desde el cubo cuando la agrupación pedida se
+  obtiene enrollando sus dimensiones (agrupar por una de ellas, operar una de
+  sus medidas con sum, count o mean), en lugar de recorrer el dataset.
+
+Cada cubo es un archivo Arrow junto al dataset (`<id>.cube.<nombre>.arrow`,
+cuenta dentro de `ANALYTICS_DATASET_MAX_BYTES`) y registra cuántas filas del
+dataset resume: si no coincide con el dataset adjuntado (un append en curso
+en otro worker), se recorre el dataset como siempre.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from utils.datasets import DATASETS, DatasetNotFound, SharedDatasetStore
+from utils.instrumentation import stage
+from utils.metrics import REGISTRY
+from utils.parsing import numeric_column
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+CUBE_KIND = "cube"
+CUBE_OPERATIONS = ("sum", "count", "mean")
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_META_PREFIX = b"analytics_"
+
+CUBE_LOOKUPS = REGISTRY.counter(
+    "analytics_cube_lookups_total",
+    "Agrupaciones sobre datasets registrados según si las respondió un cubo.",
+    ("outcome",),
+)
+
+
+def _sum_column(measure: str) -> str:
+    return f"{measure}__sum"
+
+
+def _count_column(measure: str) -> str:
+    return f"{measure}__count"
+
+
+def summarize(frame: pd.DataFrame, dimensions: Sequence[str], measures: Sequence[str]) -> pd.DataFrame:
+    """Suma y conteo (no nulos) de cada medida por combinación de dimensiones."""
+    columns = {}
+    for measure in measures:
+        values = numeric_column(frame, measure)
+        columns[_sum_column(measure)] = values
+        columns[_count_column(measure)] = values.notna()
+    # Los nulos de las dimensiones también son grupo: al enrollar se descartan igual que en groupby
+    grouped = pd.DataFrame(columns).groupby(
+        [frame[d] for d in dimensions], observed=True, sort=False, dropna=False
+    ).sum()
+    return grouped.reset_index()
+
+
+def _combine(cube: pd.DataFrame, part: pd.DataFrame, dimensions: Sequence[str]) -> pd.DataFrame:
+    combined = pd.concat([cube, part], ignore_index=True)
+    return combined.groupby(list(dimensions), observed=True, sort=False, dropna=False).sum().reset_index()
+
+
+class Cube:
+    __slots__ = ("dataset_id", "name", "dimensions", "measures", "rows", "frame", "created_at", "updated_at")
+
+    def __init__(self, dataset_id: str, name: str, dimensions: List[str], measures: List[str],
+                 rows: int, frame: pd.DataFrame, created_at: float, updated_at: float):
+        self.dataset_id = dataset_id
+        self.name = name
+        self.dimensions = dimensions
+        self.measures = measures
+        # Filas del dataset que resume el cubo
+        self.rows = rows
+        self.frame = frame
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def answers(self, group_by: str, agg_col: str) -> bool:
+        return group_by in self.dimensions and agg_col in self.measures
+
+    def rollup(self, group_by: str, agg_col: str, operation: str) -> pd.DataFrame:
+        """Mismo frame [group_by, agg_col] que `group_and_aggregate` sobre el dataset."""
+        total, count = _sum_column(agg_col), _count_column(agg_col)
+        merged = self.frame.groupby(group_by, observed=True, sort=True)[[total, count]].sum()
+        # Grupos sin ningún valor de la medida: el recorrido los descarta con dropna
+        merged = merged[merged[count] > 0]
+        if operation == "sum":
+            values = merged[total]
+        elif operation == "count":
+            values = merged[count]
+        else:
+            values = merged[total] / merged[count]
+        values.index.name = group_by
+        return values.rename(agg_col).reset_index()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "dataset_id": self.dataset_id,
+            "dimensions": self.dimensions,
+            "measures": self.measures,
+            "rows": self.rows,
+            "groups": int(len(self.frame)),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class CubeStore:
+    def __init__(self, datasets: SharedDatasetStore = DATASETS):
+        self.datasets = datasets
+        # Caché por proceso: ruta -> (mtime del archivo, cubo)
+        self._loaded: Dict[str, Tuple[float, Cube]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------
+    # Escritura
+    # ------------------------------------------
+    def define(self, dataset_id: str, name: str, dimensions: Sequence[str], measures: Sequence[str]) -> Dict[str, Any]:
+        """Declara un cubo y lo construye recorriendo el dataset una vez (reemplaza uno del mismo nombre)."""
+        if pa is None:
+            raise ValueError("Los cubos requieren pyarrow instalado.")
+        if not _NAME_RE.match(name):
+            raise ValueError("El nombre del cubo solo admite letras, números, '_' y '-' (máximo 64).")
+        if not dimensions or not measures:
+            raise ValueError("El cubo necesita al menos una dimensión y una medida.")
+        dimensions, measures = list(dict.fromkeys(dimensions)), list(dict.fromkeys(measures))
+
+        with self.datasets.locked(dataset_id):
+            frame = self.datasets.frame(dataset_id)
+            missing = [c for c in dimensions + measures if c not in frame.columns]
+            if missing:
+                raise ValueError(f"Columnas inexistentes en el dataset: {', '.join(missing)}.")
+            now = time.time()
+            with stage("compute"):
+                summary = summarize(frame, dimensions, measures)
+            cube = Cube(dataset_id, name, dimensions, measures, len(frame), summary, now, now)
+            self._write(cube)
+        return cube.describe()
+
+    def append(self, dataset_id: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Agrega filas al dataset y actualiza sus cubos con solo esas filas."""
+        def maintain(frame: pd.DataFrame, previous: int) -> None:
+            new_rows = frame.iloc[previous:]
+            for cube in self.cubes(dataset_id):
+                if cube.rows == previous:
+                    part = summarize(new_rows, cube.dimensions, cube.measures)
+                    summary = _combine(cube.frame, part, cube.dimensions)
+                else:
+                    # El cubo no corresponde a las filas previas: se reconstruye completo
+                    summary = summarize(frame, cube.dimensions, cube.measures)
+                # Cubo nuevo: el de la caché sigue siendo coherente para los requests en curso
+                self._write(Cube(dataset_id, cube.name, cube.dimensions, cube.measures, len(frame),
+                                 summary, cube.created_at, time.time()))
+
+        dataset = self.datasets.append(dataset_id, df, on_append=maintain)
+        return {**dataset, "cubes": [cube.describe() for cube in self.cubes(dataset_id)]}
+
+    def delete(self, dataset_id: str, name: str) -> bool:
+        if not _NAME_RE.match(name):
+            return False
+        path = self.datasets.derived_path(dataset_id, f"{CUBE_KIND}.{name}")
+        with self._lock:
+            self._loaded.pop(path, None)
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write(self, cube: Cube) -> None:
+        path = self.datasets.derived_path(cube.dataset_id, f"{CUBE_KIND}.{cube.name}")
+        meta = {
+            "name": cube.name,
+            "dimensions": json.dumps(cube.dimensions),
+            "measures": json.dumps(cube.measures),
+            "rows": str(cube.rows),
+            "created_at": repr(cube.created_at),
+            "updated_at": repr(cube.updated_at),
+        }
+        try:
+            table = pa.Table.from_pandas(cube.frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"Las dimensiones del cubo tienen tipos mixtos no soportados: {e}")
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            **{_META_PREFIX + k.encode(): v.encode() for k, v in meta.items()},
+        })
+        replaces = os.path.getsize(path) if os.path.exists(path) else 0
+        self.datasets.ensure_room(table.nbytes, replaces, what=f"el cubo '{cube.name}'")
+        self.datasets.write_table(path, table)
+
+    # ------------------------------------------
+    # Lectura
+    # ------------------------------------------
+    def cubes(self, dataset_id: str) -> List[Cube]:
+        result = []
+        for path in self.datasets.derived_paths(dataset_id, CUBE_KIND + "."):
+            cube = self._load(dataset_id, path)
+            if cube is not None:
+                result.append(cube)
+        return result
+
+    def _load(self, dataset_id: str, path: str) -> Optional[Cube]:
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with pa.memory_map(path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        raw = table.schema.metadata or {}
+        meta = {k[len(_META_PREFIX):].decode(): v.decode() for k, v in raw.items() if k.startswith(_META_PREFIX)}
+        cube = Cube(
+            dataset_id, meta["name"], json.loads(meta["dimensions"]), json.loads(meta["measures"]),
+            int(meta["rows"]), table.to_pandas(), float(meta["created_at"]), float(meta["updated_at"]),
+        )
+        with self._lock:
+            self._loaded[path] = (mtime, cube)
+        return cube
+
+    def list(self, dataset_id: str) -> List[Dict[str, Any]]:
+        self.datasets.describe(dataset_id)
+        return [cube.describe() for cube in self.cubes(dataset_id)]
+
+    def rollup(self, df: pd.DataFrame, group_by: str, agg_col: str, operation: str) -> Optional[pd.DataFrame]:
+        """
+        Resultado de agrupar `df` desde un cubo, o None si `df` no es un
+        dataset registrado intacto o ningún cubo vigente cubre la agrupación.
+        """
+        if pa is None or operation not in CUBE_OPERATIONS:
+            return None
+        dataset_id = self.datasets.registered_id(df, [group_by, agg_col])
+        if dataset_id is None:
+            return None
+        try:
+            candidates = [c for c in self.cubes(dataset_id) if c.answers(group_by, agg_col)]
+        except DatasetNotFound:
+            return None
+        current = [c for c in candidates if c.rows == len(df)]
+        if not current:
+            CUBE_LOOKUPS.inc(outcome="stale" if candidates else "miss")
+            return None
+        CUBE_LOOKUPS.inc(outcome="hit")
+        # El cubo con menos grupos es el más barato de enrollar
+        cube = min(current, key=lambda c: len(c.frame))
+        return cube.rollup(group_by, agg_col, operation)
+
+
+# Registro global (los cubos se comparten entre workers a través del directorio de datasets)
+CUBES = CubeStore()
@@ -0,0 +1,364 @@
+"""
+Registro de datasets compartido entre procesos (modo multi-worker).
+
+Cada dataset registrado se escribe una sola vez como archivo Arrow IPC sin
+compresión en `ANALYTICS_DATASET_DIR` (por defecto en `/dev/shm`, es decir,
+memoria compartida). Cualquier worker lo abre con `pyarrow.memory_map`: las
+páginas las comparte el sistema operativo, así que N workers no multiplican la
+RAM. El archivo es la única fuente de verdad (nombre, filas, expiración van en
+la metadata del schema); cada proceso solo guarda en caché el DataFrame ya
+adjuntado.
+
+Los datasets se usan desde /execute pasando `{"dataset_id": "..."}` en lugar
+de la lista de registros (ej: `"data": {"dataset_id": "ab12..."}`).
+
+Los datasets solo crecen: `append` reescribe el archivo con las filas nuevas
+(bajo un lock de archivo por dataset) y avisa a quien mantiene estructuras
+derivadas, como los cubos de `utils.cubes`, que se guardan junto al dataset
+(`<dataset_id>.<...>.arrow`) y se eliminan con él.
+
+Cada DataFrame adjuntado admite índices por columna (`utils.indexes`) que
+aceleran filtros y top N repetidos; su memoria cuenta dentro de
+`ANALYTICS_DATASET_MAX_BYTES`.
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from utils.compaction import compact_frame, memory_report
+from utils.indexes import INDEXES
+from utils.instrumentation import stage
+from utils.parsing import TYPED_COLUMNS
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+
+def _default_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "analytics-datasets")
+
+
+DATASET_DIR = os.getenv("ANALYTICS_DATASET_DIR", _default_dir())
+DATASET_TTL_SECONDS = float(os.getenv("ANALYTICS_DATASET_TTL_SECONDS", "3600"))
+DATASET_MAX_BYTES = int(os.getenv("ANALYTICS_DATASET_MAX_BYTES", str(4 << 30)))
+
+_EXTENSION = ".arrow"
+_META_PREFIX = b"analytics_"
+
+
+class DatasetNotFound(KeyError):
+    pass
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ValueError("Los datasets registrados requieren pyarrow instalado.")
+
+
+def _valid_id(dataset_id: str) -> bool:
+    return len(dataset_id) == 32 and all(c in "0123456789abcdef" for c in dataset_id)
+
+
+class SharedDatasetStore:
+    def __init__(self, directory: str = DATASET_DIR, ttl: float = DATASET_TTL_SECONDS, max_bytes: int = DATASET_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Caché por proceso: dataset_id -> (mtime del archivo, DataFrame adjuntado)
+        self._attached: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, dataset_id: str) -> str:
+        if not _valid_id(dataset_id):
+            raise DatasetNotFound(dataset_id)
+        return os.path.join(self.directory, dataset_id + _EXTENSION)
+
+    # ------------------------------------------
+    # Escritura
+    # ------------------------------------------
+    def put(self, df: pd.DataFrame, name: Optional[str] = None, ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Escribe el DataFrame como archivo Arrow en memoria compartida y devuelve su descripción."""
+        _require_pyarrow()
+        os.makedirs(self.directory, exist_ok=True)
+        self._evict()
+
+        dataset_id = uuid.uuid4().hex
+        now = time.time()
+        meta = {
+            "name": name or dataset_id,
+            "created_at": repr(now),
+            "expires_at": repr(now + (ttl if ttl is not None else self.ttl)),
+        }
+        df = self._write(dataset_id, df, meta)
+        return {**self.describe(dataset_id), "memory": memory_report(df)}
+
+    def append(self, dataset_id: str, df: pd.DataFrame,
+               on_append: Optional[Callable[[pd.DataFrame, int], None]] = None) -> Dict[str, Any]:
+        """
+        Agrega filas al final del dataset (mismo id, nombre y expiración).
+        `on_append(frame_completo, filas_previas)` corre dentro del lock, antes
+        de que otro append pueda empezar (mantenimiento incremental de cubos).
+        """
+        _require_pyarrow()
+        if df.empty:
+            raise ValueError("No hay filas para agregar.")
+        with self.locked(dataset_id):
+            current = self.frame(dataset_id)
+            missing = [c for c in current.columns if c not in df.columns]
+            extra = [c for c in df.columns if c not in current.columns]
+            if missing or extra:
+                raise ValueError(
+                    f"Las filas nuevas deben tener las columnas del dataset "
+                    f"(faltan: {', '.join(map(str, missing)) or '-'}; sobran: {', '.join(map(str, extra)) or '-'})."
+                )
+            meta = {k: v for k, v in self._meta(self.table(dataset_id)).items() if k != "rows"}
+            previous = len(current)
+            with stage("frame"):
+                # Las categorías y los enteros angostos de cada parte pueden diferir: se vuelve a compactar
+                combined = pd.concat([current, df[list(current.columns)]], ignore_index=True)
+            self._write(dataset_id, combined, meta, replaces=os.path.getsize(self._path(dataset_id)))
+            if on_append is not None:
+                on_append(self.frame(dataset_id), previous)
+        return self.describe(dataset_id)
+
+    def _write(self, dataset_id: str, df: pd.DataFrame, meta: Dict[str, str], replaces: int = 0) -> pd.DataFrame:
+        """Escribe (o reemplaza) el archivo del dataset; `replaces` son los bytes del archivo anterior."""
+        meta = {**meta, "rows": str(len(df))}
+        with stage("frame"):
+            # Textos repetidos como diccionario y enteros angostos: el archivo
+            # (y cada worker que lo adjunta) ocupa menos
+            df = compact_frame(df)
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"El dataset tiene columnas con tipos mixtos no soportados: {e}")
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            **{_META_PREFIX + k.encode(): v.encode() for k, v in meta.items()},
+        })
+
+        self.ensure_room(table.nbytes, replaces, what="el dataset")
+
+        # Escritura atómica: otros workers nunca ven un archivo a medias
+        final_path = self._path(dataset_id)
+        self.write_table(final_path, table)
+        return df
+
+    def ensure_room(self, nbytes: int, replaces: int = 0, what: str = "el dataset") -> None:
+        """ValueError si `nbytes` (menos los `replaces` que se liberan) no caben en ANALYTICS_DATASET_MAX_BYTES."""
+        if nbytes + self._used_bytes() - replaces + INDEXES.total_bytes() > self.max_bytes:
+            raise ValueError(
+                f"No hay espacio para {what} ({nbytes:,} bytes); "
+                f"límite {self.max_bytes:,} bytes (ANALYTICS_DATASET_MAX_BYTES)."
+            )
+
+    @staticmethod
+    def write_table(path: str, table: "pa.Table") -> None:
+        """Escritura atómica de un archivo Arrow IPC (datasets y estructuras derivadas)."""
+        tmp_path = path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def locked(self, dataset_id: str) -> Iterator[None]:
+        """Lock exclusivo del dataset entre procesos (appends y construcción de derivados)."""
+        path = self._path(dataset_id)
+        if not os.path.exists(path):
+            raise DatasetNotFound(dataset_id)
+        with open(os.path.join(self.directory, dataset_id + ".lock"), "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def delete(self, dataset_id: str) -> bool:
+        with self._lock:
+            self._attached.pop(dataset_id, None)
+        INDEXES.detach(dataset_id)
+        try:
+            os.remove(self._path(dataset_id))
+        except (FileNotFoundError, DatasetNotFound):
+            return False
+        # Derivados (cubos) y lock del dataset
+        for path in self.derived_paths(dataset_id) + [os.path.join(self.directory, dataset_id + ".lock")]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        return True
+
+    def exists(self, dataset_id: str) -> bool:
+        try:
+            return os.path.exists(self._path(dataset_id))
+        except DatasetNotFound:
+            return False
+
+    def derived_path(self, dataset_id: str, suffix: str) -> str:
+        """Archivo de una estructura derivada del dataset (se elimina junto con él)."""
+        self._path(dataset_id)
+        return os.path.join(self.directory, f"{dataset_id}.{suffix}{_EXTENSION}")
+
+    def derived_paths(self, dataset_id: str, kind: str = "") -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        prefix = f"{dataset_id}.{kind}"
+        return sorted(os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                      if f.startswith(prefix) and f.endswith(_EXTENSION) and f != dataset_id + _EXTENSION)
+
+    # ------------------------------------------
+    # Lectura (zero-copy vía memory map)
+    # ------------------------------------------
+    def table(self, dataset_id: str) -> "pa.Table":
+        _require_pyarrow()
+        path = self._path(dataset_id)
+        try:
+            source = pa.memory_map(path, "r")
+        except FileNotFoundError:
+            raise DatasetNotFound(dataset_id)
+        table = pa.ipc.open_file(source).read_all()
+        if float(self._meta(table).get("expires_at", "inf")) < time.time():
+            self.delete(dataset_id)
+            raise DatasetNotFound(dataset_id)
+        return table
+
+    def frame(self, dataset_id: str) -> pd.DataFrame:
+        """DataFrame del dataset; se adjunta una vez por proceso y se reutiliza."""
+        path = self._path(dataset_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            with self._lock:
+                self._attached.pop(dataset_id, None)
+            raise DatasetNotFound(dataset_id)
+
+        with self._lock:
+            cached = self._attached.get(dataset_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with stage("frame"):
+            # split_blocks evita consolidar columnas: las numéricas sin nulos
+            # quedan como vistas sobre el memory map
+            df = self.table(dataset_id).to_pandas(split_blocks=True)
+        with self._lock:
+            self._attached[dataset_id] = (mtime, df)
+        INDEXES.attach(df, dataset_id, self._index_room)
+        return df
+
+    # ------------------------------------------
+    # Introspección
+    # ------------------------------------------
+    @staticmethod
+    def _meta(table_or_schema: Any) -> Dict[str, str]:
+        schema = getattr(table_or_schema, "schema", table_or_schema)
+        raw = schema.metadata or {}
+        return {k[len(_META_PREFIX):].decode(): v.decode() for k, v in raw.items() if k.startswith(_META_PREFIX)}
+
+    def describe(self, dataset_id: str) -> Dict[str, Any]:
+        _require_pyarrow()
+        path = self._path(dataset_id)
+        try:
+            with pa.memory_map(path, "r") as source:
+                schema = pa.ipc.open_file(source).schema
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            raise DatasetNotFound(dataset_id)
+        meta = self._meta(schema)
+        return {
+            "dataset_id": dataset_id,
+            "name": meta.get("name", dataset_id),
+            "rows": int(meta.get("rows", 0)),
+            "columns": [{"name": f.name, "type": str(f.type)} for f in schema],
+            "bytes": size,
+            "created_at": float(meta.get("created_at", 0)),
+            "expires_at": float(meta.get("expires_at", 0)),
+        }
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._evict()
+        result = []
+        for dataset_id in self._ids():
+            try:
+                result.append(self.describe(dataset_id))
+            except DatasetNotFound:
+                continue
+        return result
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [f[:-len(_EXTENSION)] for f in os.listdir(self.directory)
+                if f.endswith(_EXTENSION) and _valid_id(f[:-len(_EXTENSION)])]
+
+    def _used_bytes(self) -> int:
+        """Bytes de los datasets y de sus derivados (cubos)."""
+        if not os.path.isdir(self.directory):
+            return 0
+        total = 0
+        for f in os.listdir(self.directory):
+            if not f.endswith(_EXTENSION):
+                continue
+            try:
+                total += os.path.getsize(os.path.join(self.directory, f))
+            except FileNotFoundError:
+                continue
+        return total
+
+    def registered_id(self, df: pd.DataFrame, columns: Sequence[str]) -> Optional[str]:
+        """
+        Id del dataset si `df` es su DataFrame adjuntado o una copia de
+        `build_frame` que conserva sus filas y estas columnas sin modificar.
+        """
+        source = TYPED_COLUMNS.source_of(df)
+        with self._lock:
+            dataset_id = next((k for k, (_, frame) in self._attached.items() if frame is source), None)
+        if dataset_id is None:
+            return None
+        if source is not df and (
+            len(df) != len(source)
+            or not (df.index is source.index or df.index.equals(source.index))
+            or any(c not in source.columns or c not in df.columns or source[c].dtype != df[c].dtype for c in columns)
+        ):
+            return None
+        return dataset_id
+
+    def _index_room(self) -> int:
+        """Bytes disponibles para índices: el espacio de datasets menos archivos e índices ya construidos."""
+        return self.max_bytes - self._used_bytes() - INDEXES.total_bytes()
+
+    def _evict(self) -> None:
+        """Elimina los datasets expirados (de cualquier worker)."""
+        if pa is None:
+            return
+        now = time.time()
+        for dataset_id in self._ids():
+            try:
+                if self.describe(dataset_id)["expires_at"] < now:
+                    self.delete(dataset_id)
+            except (DatasetNotFound, pa.ArrowInvalid):
+                continue
+
+
+# Registro global (compartido entre workers a través del directorio)
+DATASETS = SharedDatasetStore()
+
+
+def dataset_ref(value: Any) -> Optional[str]:
+    """Devuelve el id si `value` es una referencia `{"dataset_id": ...}`."""
+    if isinstance(value, dict) and set(value) == {"dataset_id"}:
+        return str(value["dataset_id"])
+    return None
@@ -0,0 +1,376 @@
+"""
+Índices secundarios por columna para datasets registrados.
+
+Una sesión interactiva filtra el mismo dataset registrado decenas de veces
+(rango de fechas, cliente, monto mínimo) y cada `filter_frame` recorre la
+columna completa. Los datasets registrados (`utils.datasets`) viven entre
+requests, así que cada proceso puede guardar índices sobre su DataFrame
+adjuntado:
+
+- `SortedIndex` (kind "sorted"): la permutación que ordena la columna y sus
+  valores ordenados. Un rango (>, <, >=, <=) o una igualdad numérica son dos
+  `searchsorted`; un top N son los primeros/últimos N de la permutación.
+- `HashIndex` (kind "hash"): las posiciones de cada valor distinto
+  (factorize + listas contiguas por código) para igualdad con texto o
+  categorías.
+
+Los engines (filtro y top N) los usan solos: se construyen en el primer uso
+desde `ANALYTICS_INDEX_MIN_ROWS` filas (`ANALYTICS_INDEX_AUTO=0` lo
+desactiva) o a pedido (POST /datasets/{id}/indexes). Su memoria se descuenta
+del espacio de datasets (`ANALYTICS_DATASET_MAX_BYTES`): si no caben, el
+engine recorre la columna como siempre. Viven lo mismo que el DataFrame
+adjuntado (weakref) y cada worker construye los suyos.
+
+El índice solo elige las filas: se devuelven en su orden original, así que
+el resultado es idéntico al del recorrido completo.
+"""
+
+import math
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import REGISTRY
+from utils.parsing import TYPED_COLUMNS, column_type, numeric_column
+
+INDEX_AUTO = os.getenv("ANALYTICS_INDEX_AUTO", "1") not in ("0", "false", "no")
+INDEX_MIN_ROWS = int(os.getenv("ANALYTICS_INDEX_MIN_ROWS", "100000"))
+
+INDEX_KINDS = ("sorted", "hash")
+RANGE_OPERATORS = (">", "<", ">=", "<=")
+
+# Enteros más allá de 2^53 no se representan exactos en float64
+_MAX_EXACT_INT = 2 ** 53
+
+INDEX_LOOKUPS = REGISTRY.counter(
+    "analytics_index_lookups_total",
+    "Consultas de filtro/top N sobre datasets registrados según uso de índice.",
+    ("kind", "outcome"),
+)
+INDEX_BYTES = REGISTRY.gauge("analytics_index_bytes", "Memoria de los índices de datasets en este proceso.")
+
+
+def _positions_dtype(rows: int) -> type:
+    return np.int32 if rows < 2 ** 31 else np.int64
+
+
+# ==========================================
+# 1. ÍNDICES
+# ==========================================
+class SortedIndex:
+    """Permutación ordenada de los valores no nulos (orden estable: empates en orden original)."""
+
+    kind = "sorted"
+    __slots__ = ("view", "order", "values")
+
+    def __init__(self, view: str, order: np.ndarray, values: Any):
+        self.view = view
+        self.order = order
+        self.values = values
+
+    @classmethod
+    def build(cls, series: pd.Series, view: str) -> Optional["SortedIndex"]:
+        dtype = _positions_dtype(len(series))
+        if view == "number":
+            if pd.api.types.is_integer_dtype(series.dtype) and len(series) and series.abs().max() > _MAX_EXACT_INT:
+                return None
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+            # Los NaN quedan al final del orden y fuera del índice
+            order = np.argsort(values, kind="stable")[:int((~np.isnan(values)).sum())]
+            return cls(view, order.astype(dtype), values[order])
+
+        ordered = series.reset_index(drop=True).sort_values(kind="stable", na_position="last")
+        valid = int(ordered.notna().sum())
+        return cls(view, ordered.index.to_numpy()[:valid].astype(dtype), ordered.array[:valid])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order.nbytes + self.values.nbytes)
+
+    def range_positions(self, operator: str, value: Any) -> np.ndarray:
+        values = self.values
+        if operator == ">":
+            start, stop = values.searchsorted(value, side="right"), len(values)
+        elif operator == ">=":
+            start, stop = values.searchsorted(value, side="left"), len(values)
+        elif operator == "<":
+            start, stop = 0, values.searchsorted(value, side="left")
+        elif operator == "<=":
+            start, stop = 0, values.searchsorted(value, side="right")
+        else:  # "=="
+            start, stop = values.searchsorted(value, side="left"), values.searchsorted(value, side="right")
+        return np.sort(self.order[start:stop])
+
+    def top_candidates(self, n: int, ascending: bool) -> Optional[np.ndarray]:
+        """
+        Filas que pueden quedar en el top N: las N primeras más los empates con
+        la N-ésima (el orden estable entre ellos lo resuelve el engine).
+        """
+        valid = len(self.values)
+        if n <= 0 or n > valid:
+            # Con menos valores que N el top incluye nulos: recorrido completo
+            return None
+        if ascending:
+            stop = self.values.searchsorted(self.values[n - 1], side="right")
+            return np.sort(self.order[:stop])
+        start = self.values.searchsorted(self.values[valid - n], side="left")
+        return np.sort(self.order[start:])
+
+
+class HashIndex:
+    """Posiciones de cada valor distinto, contiguas por código (CSR)."""
+
+    kind = "hash"
+    __slots__ = ("view", "uniques", "order", "offsets")
+
+    def __init__(self, uniques: pd.Index, order: np.ndarray, offsets: np.ndarray):
+        self.view = "raw"
+        self.uniques = uniques
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, series: pd.Series) -> "HashIndex":
+        codes, uniques = pd.factorize(series)
+        order = np.argsort(codes, kind="stable").astype(_positions_dtype(len(codes)))
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        # Los nulos (código -1) quedan al inicio del orden
+        missing = len(codes) - int(counts.sum())
+        offsets = missing + np.concatenate(([0], np.cumsum(counts)))
+        return cls(pd.Index(uniques), order, offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order.nbytes + self.offsets.nbytes + self.uniques.memory_usage(deep=True))
+
+    def equal_positions(self, value: Any) -> np.ndarray:
+        code = int(self.uniques.get_indexer([value])[0])
+        if code < 0:
+            return self.order[:0]
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+
+# ==========================================
+# 2. REGISTRO POR DATASET
+# ==========================================
+def _text_view(series: pd.Series) -> Optional[pd.Series]:
+    """Columna tal como la compara `filter_frame` con un valor de texto (None si no es texto)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(series.cat.categories.dtype)
+    return series if isinstance(series.dtype, pd.StringDtype) else None
+
+
+class _DatasetIndexes:
+    __slots__ = ("dataset_id", "rows", "room", "indexes", "unindexable", "lock")
+
+    def __init__(self, dataset_id: str, rows: int, room: Callable[[], int]):
+        self.dataset_id = dataset_id
+        self.rows = rows
+        self.room = room
+        self.indexes: Dict[Tuple[str, str, str], Any] = {}
+        # Columnas que no admiten un índice (ej: enteros de más de 53 bits)
+        self.unindexable: set = set()
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(index.nbytes for index in self.indexes.values())
+
+
+class IndexRegistry:
+    def __init__(self):
+        self._entries: Dict[int, _DatasetIndexes] = {}
+        self._by_dataset: Dict[str, "weakref.ref"] = {}
+        # Reentrante: los finalizadores de weakref pueden correr con el lock tomado
+        self._lock = threading.RLock()
+
+    def attach(self, df: pd.DataFrame, dataset_id: str, room: Callable[[], int]) -> None:
+        """Habilita índices sobre el DataFrame adjuntado de un dataset registrado."""
+        key = id(df)
+        with self._lock:
+            self._entries[key] = _DatasetIndexes(dataset_id, len(df), room)
+            self._by_dataset[dataset_id] = weakref.ref(df)
+        weakref.finalize(df, self._forget, key)
+
+    def detach(self, dataset_id: str) -> None:
+        with self._lock:
+            ref = self._by_dataset.pop(dataset_id, None)
+            df = ref() if ref is not None else None
+            if df is not None:
+                self._entries.pop(id(df), None)
+        self._refresh_gauge()
+
+    def _forget(self, key: int) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        self._refresh_gauge()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            entries = list(self._entries.values())
+        return sum(entry.nbytes for entry in entries)
+
+    def _refresh_gauge(self) -> None:
+        INDEX_BYTES.set(self.total_bytes())
+
+    # ------------------------------------------
+    # Resolución del frame de un request
+    # ------------------------------------------
+    def _resolve(self, df: pd.DataFrame, column: str) -> Optional[Tuple[_DatasetIndexes, pd.DataFrame]]:
+        """Entrada del dataset de origen si `df` es (una copia de) un dataset registrado intacto."""
+        source = TYPED_COLUMNS.source_of(df)
+        with self._lock:
+            entry = self._entries.get(id(source))
+        if entry is None or column not in source.columns:
+            return None
+        # Las posiciones son del origen: la copia debe tener las mismas filas y la misma columna
+        if source is not df and (
+            len(df) != len(source)
+            or source[column].dtype != df[column].dtype
+            or not (df.index is source.index or df.index.equals(source.index))
+        ):
+            return None
+        return entry, source
+
+    def _index(self, entry: _DatasetIndexes, source: pd.DataFrame, column: str, kind: str,
+               view: str, auto: bool = True) -> Tuple[Optional[Any], str]:
+        """(índice, resultado) construyéndolo si hace falta; resultado: hit, built, skipped."""
+        key = (column, kind, view)
+        index = entry.indexes.get(key)
+        if index is not None:
+            return index, "hit"
+        if auto and (not INDEX_AUTO or entry.rows < INDEX_MIN_ROWS):
+            return None, "skipped"
+        with entry.lock:
+            # Otro request pudo construirlo mientras esperábamos
+            index = entry.indexes.get(key)
+            if index is not None:
+                return index, "hit"
+            if key in entry.unindexable:
+                return None, "skipped"
+            # Estimación previa (posiciones + valores) para no construir lo que no cabe
+            if entry.rows * 16 > entry.room():
+                return None, "skipped"
+            index = self._build(source, column, kind, view)
+            if index is None:
+                entry.unindexable.add(key)
+                return None, "skipped"
+            if index.nbytes > entry.room():
+                return None, "skipped"
+            entry.indexes[key] = index
+        self._refresh_gauge()
+        return index, "built"
+
+    @staticmethod
+    def _build(source: pd.DataFrame, column: str, kind: str, view: str) -> Optional[Any]:
+        if kind == "hash":
+            return HashIndex.build(source[column])
+        if view == "number":
+            return SortedIndex.build(numeric_column(source, column), view)
+        text = _text_view(source[column])
+        return SortedIndex.build(text, view) if text is not None else None
+
+    # ------------------------------------------
+    # Consultas de los engines
+    # ------------------------------------------
+    def filter_positions(self, df: pd.DataFrame, column: str, operator: str, value: Any) -> Optional[np.ndarray]:
+        """
+        Posiciones (ascendentes) de las filas que cumplen el predicado de
+        `filter_frame`, o None si no hay índice aplicable (recorrido completo).
+        """
+        resolved = self._resolve(df, column)
+        if resolved is None:
+            return None
+        entry, source = resolved
+        if isinstance(value, (int, float)):
+            if operator == "!=" or (isinstance(value, float) and math.isnan(value)):
+                return None
+            kind, view = "sorted", "number"
+        elif operator == "==":
+            kind, view = "hash", "raw"
+        elif operator in RANGE_OPERATORS:
+            kind, view = "sorted", "text"
+        else:
+            return None
+
+        index, outcome = self._index(entry, source, column, kind, view)
+        INDEX_LOOKUPS.inc(kind=kind, outcome=outcome if index is not None else "scan")
+        if index is None:
+            return None
+        if kind == "hash":
+            return index.equal_positions(value)
+        return index.range_positions(operator, value)
+
+    def top_n_positions(self, df: pd.DataFrame, column: str, n: int, ascending: bool) -> Optional[np.ndarray]:
+        """Candidatas (ascendentes) al top N numérico de `top_n_frame`, o None."""
+        resolved = self._resolve(df, column)
+        if resolved is None:
+            return None
+        entry, source = resolved
+        index, outcome = self._index(entry, source, column, "sorted", "number")
+        candidates = index.top_candidates(n, ascending) if index is not None else None
+        INDEX_LOOKUPS.inc(kind="sorted", outcome=outcome if candidates is not None else "scan")
+        return candidates
+
+    # ------------------------------------------
+    # Administración (POST/GET/DELETE /datasets/{id}/indexes)
+    # ------------------------------------------
+    def _entry_for(self, dataset_id: str) -> Tuple[_DatasetIndexes, pd.DataFrame]:
+        with self._lock:
+            ref = self._by_dataset.get(dataset_id)
+            df = ref() if ref is not None else None
+            entry = self._entries.get(id(df)) if df is not None else None
+        if entry is None:
+            raise KeyError(dataset_id)
+        return entry, df
+
+    def build(self, dataset_id: str, column: str, kind: str = "sorted") -> Dict[str, Any]:
+        """Construye un índice a pedido (el dataset debe estar adjuntado en este proceso)."""
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Tipo de índice no soportado. Usa: {', '.join(INDEX_KINDS)}.")
+        entry, source = self._entry_for(dataset_id)
+        if column not in source.columns:
+            raise ValueError(f"La columna '{column}' no existe en el dataset.")
+        if kind == "hash":
+            view = "raw"
+        else:
+            view = "number" if column_type(source, column)[0] == "number" else "text"
+        index, outcome = self._index(entry, source, column, kind, view, auto=False)
+        if index is None:
+            if (column, kind, view) in entry.unindexable:
+                raise ValueError(f"La columna '{column}' no admite un índice '{kind}' (solo números o texto).")
+            raise ValueError(
+                f"El índice de '{column}' no cabe en el espacio de datasets (ANALYTICS_DATASET_MAX_BYTES)."
+            )
+        return {**self._describe_index(column, index), "built": outcome == "built"}
+
+    def drop(self, dataset_id: str, column: Optional[str] = None) -> int:
+        try:
+            entry, _ = self._entry_for(dataset_id)
+        except KeyError:
+            return 0
+        with entry.lock:
+            keys = [key for key in entry.indexes if column is None or key[0] == column]
+            for key in keys:
+                del entry.indexes[key]
+        self._refresh_gauge()
+        return len(keys)
+
+    def describe(self, dataset_id: str) -> List[Dict[str, Any]]:
+        try:
+            entry, _ = self._entry_for(dataset_id)
+        except KeyError:
+            return []
+        return [self._describe_index(key[0], index) for key, index in list(entry.indexes.items())]
+
+    @staticmethod
+    def _describe_index(column: str, index: Any) -> Dict[str, Any]:
+        return {"column": column, "kind": index.kind, "view": index.view, "bytes": index.nbytes}
+
+
+# Registro global del proceso
+INDEXES = IndexRegistry()
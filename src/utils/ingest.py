@@ -0,0 +1,145 @@
+"""
+Ingesta incremental de cuerpos NDJSON grandes (POST /execute/stream).
+
+Formato del cuerpo (`application/x-ndjson`):
+    {"tool_name": "analytics_transform_filter", "payload": {"column": "monto", ...}}
+    {"monto": 10, "sucursal": "Bogota"}
+    {"monto": 25, "sucursal": "Cali"}
+    {"__dataset__": "data_b"}          <- opcional: las filas siguientes van a data_b
+    {"cufe": "abc"}
+
+La primera línea es el encabezado (`tool_name`, `payload` con los argumentos
+escalares y, opcionalmente, `response_mode` y `page_size`). Las filas se leen
+del stream a medida que llegan y se convierten a DataFrame por lotes de
+`batch_rows` líneas (un solo `loads` por lote), sin armar nunca la lista
+completa de dicts ni validarla con Pydantic.
+"""
+
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from utils.compaction import COMPACT_MIN_ROWS, compact_frame
+from utils.memory_budget import frame_bytes, track_allocation
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+BATCH_ROWS = int(os.getenv("ANALYTICS_INGEST_BATCH_ROWS", "50000"))
+DATASET_MARKER = "__dataset__"
+
+
+def _loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _parse_batch(lines: List[bytes], first_line: int) -> pd.DataFrame:
+    """Convierte un lote de líneas JSON en un DataFrame con un solo parseo."""
+    try:
+        records = _loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        # Reparseo línea a línea solo para reportar cuál está mal formada
+        for offset, line in enumerate(lines):
+            try:
+                _loads(line)
+            except ValueError as e:
+                raise ValueError(f"Línea {first_line + offset} no es JSON válido: {e}")
+        raise
+    return pd.DataFrame(records)
+
+
+class NDJSONIngest:
+    """Acumula las filas del stream en lotes de DataFrame por dataset."""
+
+    def __init__(self, default_field: Callable[[Dict[str, Any]], str], batch_rows: int = BATCH_ROWS, header_key: str = "tool_name"):
+        self.default_field = default_field
+        self.header_key = header_key
+        self.batch_rows = batch_rows
+        self.header: Optional[Dict[str, Any]] = None
+        self.rows = 0
+        self.bytes = 0
+        self._field: Optional[str] = None
+        self._chunks: Dict[str, List[pd.DataFrame]] = {}
+        self._pending: List[bytes] = []
+        self._pending_start = 0
+        self._line_no = 0
+
+    def feed_line(self, line: bytes) -> None:
+        line = line.strip()
+        self._line_no += 1
+        if not line:
+            return
+
+        if self.header is None:
+            header = _loads(line)
+            if not isinstance(header, dict) or self.header_key not in header:
+                raise ValueError(f"La primera línea debe ser el encabezado con '{self.header_key}'.")
+            self.header = header
+            self._field = self.default_field(header)
+            return
+
+        # Marcador de cambio de dataset (líneas cortas: evitar parsear cada fila)
+        if len(line) < 256 and DATASET_MARKER.encode() in line:
+            marker = _loads(line)
+            if isinstance(marker, dict) and DATASET_MARKER in marker:
+                self._flush()
+                self._field = str(marker[DATASET_MARKER])
+                return
+
+        if not self._pending:
+            self._pending_start = self._line_no
+        self._pending.append(line)
+        self.rows += 1
+        if len(self._pending) >= self.batch_rows:
+            self._flush()
+
+    def feed_lines(self, lines: List[bytes]) -> None:
+        for line in lines:
+            self.feed_line(line)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        frame = _parse_batch(self._pending, self._pending_start)
+        self._chunks.setdefault(self._field, []).append(frame)
+        self._pending = []
+        # Sin Content-Length el presupuesto se verifica lote a lote (falla antes de leer todo)
+        nbytes = frame_bytes(frame)
+        self.bytes += nbytes
+        track_allocation(nbytes)
+
+    def finish(self) -> Tuple[Dict[str, Any], Dict[str, pd.DataFrame]]:
+        """Cierra la ingesta y devuelve (encabezado, {campo: DataFrame})."""
+        self._flush()
+        if self.header is None:
+            raise ValueError("El cuerpo está vacío: falta el encabezado.")
+        frames = {
+            field: compact_frame(chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True), COMPACT_MIN_ROWS)
+            for field, chunks in self._chunks.items()
+        }
+        return self.header, frames
+
+
+async def read_ndjson(stream: AsyncIterator[bytes], default_field: Callable[[Dict[str, Any]], str], batch_rows: int = BATCH_ROWS, header_key: str = "tool_name") -> Tuple[Dict[str, Any], Dict[str, pd.DataFrame], int]:
+    """
+    Lee un cuerpo NDJSON desde un iterador asíncrono de bytes (`request.stream()`).
+
+    Returns:
+        (encabezado, {campo: DataFrame}, filas leídas)
+    """
+    ingest = NDJSONIngest(default_field, batch_rows, header_key)
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if lines:
+            # El parseo de cada lote corre en el threadpool para no bloquear el event loop
+            await run_in_threadpool(ingest.feed_lines, lines)
+    ingest.feed_line(buffer)
+    header, frames = ingest.finish()
+    return header, frames, ingest.rows
@@ -0,0 +1,227 @@
+"""
+Instrumentación por request: tiempos por etapa, métricas y header Server-Timing.
+
+Etapas que se registran:
+- validate:  lectura del body + parseo JSON + validación pydantic (antes del handler)
+- frame:     construcción de DataFrames (`utils.processor.build_frame`)
+- queue:     espera de un slot en el scheduler de cómputo (`utils.scheduler`)
+- engine:    ejecución del handler / tool (incluye frame y render, excluye queue y serialize)
+- render:    dibujo y codificación de gráficos
+- serialize: serialización de la respuesta (en el handler o después de él)
+
+El estado vive en un ContextVar, que Starlette propaga al threadpool de las
+rutas síncronas y LangChain a su executor, así que los engines pueden
+registrar etapas con `stage(...)` sin recibir nada por parámetro. Fuera de un
+request (benchmarks, scripts) `stage` no hace nada.
+"""
+
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi import Request
+from pydantic import BaseModel
+
+from utils.metrics import REGISTRY, BYTE_BUCKETS, ROW_BUCKETS
+
+# ==========================================
+# 1. MÉTRICAS
+# ==========================================
+REQUEST_DURATION = REGISTRY.histogram(
+    "analytics_request_duration_seconds", "Duración total del request.", ("route", "method", "status"))
+STAGE_DURATION = REGISTRY.histogram(
+    "analytics_stage_duration_seconds", "Duración por etapa del request.", ("route", "tool", "stage"))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "analytics_requests_in_flight", "Requests HTTP en curso.")
+TOOL_IN_FLIGHT = REGISTRY.gauge(
+    "analytics_tool_in_flight", "Ejecuciones en curso por tool.", ("tool",))
+ROWS_RECEIVED = REGISTRY.histogram(
+    "analytics_rows_received", "Filas recibidas por ejecución.", ("route", "tool"), buckets=ROW_BUCKETS)
+REQUEST_BYTES = REGISTRY.histogram(
+    "analytics_request_bytes", "Tamaño del body del request (Content-Length).", ("route",), buckets=BYTE_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "analytics_response_bytes", "Tamaño del body de la respuesta.", ("route",), buckets=BYTE_BUCKETS)
+
+# Orden de aparición en Server-Timing
+STAGE_ORDER = ("validate", "queue", "frame", "engine", "render", "serialize")
+
+# Etapas que pueden ocurrir dentro del handler pero no son trabajo del engine
+NON_ENGINE_STAGES = ("ingest", "queue", "serialize")
+
+
+# ==========================================
+# 2. ESTADO POR REQUEST
+# ==========================================
+class RequestTimings:
+    __slots__ = ("started", "handler_started", "handler_ended", "stages", "tool", "rows")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.handler_started: Optional[float] = None
+        self.handler_ended: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.tool = ""
+        self.rows = 0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("analytics_request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Acumula el tiempo del bloque en la etapa `name` del request actual."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+@contextmanager
+def track_tool(tool: str, rows: int = 0) -> Iterator[None]:
+    """Etiqueta el request con la tool ejecutada y cuenta la ejecución como en curso."""
+    timings = _current.get()
+    if timings is not None:
+        timings.tool = tool
+        timings.rows = rows
+    TOOL_IN_FLIGHT.inc(tool=tool)
+    try:
+        yield
+    finally:
+        TOOL_IN_FLIGHT.dec(tool=tool)
+
+
+def count_rows(*values: Any) -> int:
+    """Cuenta registros en los campos tipo lista (data, data_a, data_b...) de payloads o modelos."""
+    total = 0
+    for value in values:
+        if isinstance(value, BaseModel):
+            value = value.__dict__
+        if isinstance(value, dict):
+            total += sum(len(v) for v in value.values() if isinstance(v, list))
+    return total
+
+
+# ==========================================
+# 3. DECORADOR PARA ENDPOINTS
+# ==========================================
+def _non_engine_time(timings: RequestTimings) -> float:
+    return sum(timings.stages.get(name, 0.0) for name in NON_ENGINE_STAGES)
+
+
+def instrumented(tool: Optional[str] = None) -> Callable:
+    """
+    Marca inicio/fin del handler y mide la etapa 'engine'.
+    Con `tool` el endpoint queda etiquetado con esa tool; sin él (ej: /execute)
+    el handler debe etiquetarse con `track_tool`.
+    Conserva la firma (FastAPI la lee vía __wrapped__) y el tipo sync/async.
+    """
+    def decorator(func: Callable) -> Callable:
+        def _enter(kwargs: Dict[str, Any]):
+            timings = _current.get()
+            outside_before = 0.0
+            if timings is not None:
+                timings.handler_started = perf_counter()
+                outside_before = _non_engine_time(timings)
+            if tool is None:
+                return None, outside_before
+            tracker = track_tool(tool, count_rows(*kwargs.values()))
+            tracker.__enter__()
+            return tracker, outside_before
+
+        def _exit(state) -> None:
+            tracker, outside_before = state
+            if tracker is not None:
+                tracker.__exit__(None, None, None)
+            timings = _current.get()
+            if timings is not None and timings.handler_started is not None:
+                timings.handler_ended = perf_counter()
+                # Si el handler serializa su respuesta o espera en cola, ese tiempo no es del engine
+                outside = _non_engine_time(timings) - outside_before
+                timings.add("engine", timings.handler_ended - timings.handler_started - outside)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                state = _enter(kwargs)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _exit(state)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            state = _enter(kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _exit(state)
+        return sync_wrapper
+
+    return decorator
+
+
+# ==========================================
+# 4. MIDDLEWARE HTTP
+# ==========================================
+def server_timing_header(timings: RequestTimings, total: float) -> str:
+    parts = [f"{name};dur={timings.stages[name] * 1000:.2f}" for name in STAGE_ORDER if name in timings.stages]
+    parts += [f"{name};dur={value * 1000:.2f}" for name, value in timings.stages.items() if name not in STAGE_ORDER]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _route_label(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def instrumentation_middleware(request: Request, call_next):
+    timings = RequestTimings()
+    token = _current.set(timings)
+    REQUESTS_IN_FLIGHT.inc()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        _current.reset(token)
+        ready = perf_counter()
+        total = ready - timings.started
+        if timings.handler_started is not None:
+            timings.add("validate", timings.handler_started - timings.started)
+        if timings.handler_ended is not None:
+            timings.add("serialize", ready - timings.handler_ended)
+
+        route = _route_label(request)
+        tool = timings.tool or "-"
+        REQUEST_DURATION.observe(total, route=route, method=request.method, status=status)
+        for name, seconds in timings.stages.items():
+            STAGE_DURATION.observe(seconds, route=route, tool=tool, stage=name)
+        if timings.rows:
+            ROWS_RECEIVED.observe(timings.rows, route=route, tool=tool)
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            REQUEST_BYTES.observe(int(content_length), route=route)
+
+    response_length = response.headers.get("content-length")
+    if response_length and response_length.isdigit():
+        RESPONSE_BYTES.observe(int(response_length), route=route)
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    return response
@@ -0,0 +1,215 @@
+"""
+Trabajos asíncronos para análisis largos (POST /jobs).
+
+Una reconciliación de millones de filas o una agrupación grande puede tardar
+más que el timeout del gateway en `/execute`. Un trabajo se admite en el
+mismo pool de cómputo (`utils.scheduler`, con su cola acotada y 429), se
+responde de inmediato con su `job_id` y el cliente consulta el estado, el
+progreso y finalmente el resultado.
+
+- Progreso: los engines que recorren bloques o particiones llaman
+  `report_progress(filas)` por bloque (ContextVar, como `stage(...)`; fuera de
+  un trabajo no hace nada). Los engines en memoria no reportan progreso
+  intermedio: el trabajo pasa de 'running' a terminado.
+- Cancelación: cooperativa. Un trabajo en cola no llega a ejecutarse y uno en
+  curso se detiene en el siguiente `report_progress` (`JobCancelled`).
+- Retención: los trabajos terminados expiran a los `ANALYTICS_JOB_TTL_SECONDS`
+  y, por encima de `ANALYTICS_JOB_MAX_ENTRIES`, se desalojan los terminados
+  menos usados. Los activos nunca se desalojan.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.memory_budget import MemoryBudgetError
+from utils.metrics import REGISTRY
+from utils.scheduler import COMPUTE
+
+MAX_ENTRIES = int(os.getenv("ANALYTICS_JOB_MAX_ENTRIES", "128"))
+TTL_SECONDS = float(os.getenv("ANALYTICS_JOB_TTL_SECONDS", "3600"))
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+JOBS_FINISHED = REGISTRY.counter(
+    "analytics_jobs_finished_total", "Trabajos asíncronos terminados por estado.", ("tool", "status"))
+
+
+class JobCancelled(BaseException):
+    """
+    El trabajo fue cancelado por el cliente. Hereda de BaseException (como
+    asyncio.CancelledError) para atravesar los `except Exception` de las tools.
+    """
+
+
+class Job:
+    __slots__ = (
+        "job_id", "tool", "status", "rows_total", "rows_processed", "chunks", "error",
+        "result", "result_id", "created_at", "started_at", "finished_at", "expires_at",
+        "_cancel",
+    )
+
+    def __init__(self, job_id: str, tool: str, rows_total: Optional[int]):
+        self.job_id = job_id
+        self.tool = tool
+        self.status = "queued"
+        self.rows_total = rows_total
+        self.rows_processed = 0
+        self.chunks = 0
+        self.error: Optional[str] = None
+        self.result: Any = None
+        # Resultados con filas quedan en el RESULT_STORE bajo este id
+        self.result_id: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, rows: int) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(f"Trabajo '{self.job_id}' cancelado.")
+        self.rows_processed += rows
+        self.chunks += 1
+
+    def describe(self) -> Dict[str, Any]:
+        now = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "tool": self.tool,
+            "status": self.status,
+            "progress": {
+                "rows_processed": self.rows_processed,
+                "chunks": self.chunks,
+                "rows_total": self.rows_total,
+            },
+            "cancel_requested": self.cancel_requested,
+            "error": self.error,
+            "result_id": self.result_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(now - self.started_at, 3) if self.started_at else None,
+            "expires_at": self.expires_at,
+        }
+
+
+_current: ContextVar[Optional[Job]] = ContextVar("analytics_current_job", default=None)
+
+
+def current_job() -> Optional[Job]:
+    return _current.get()
+
+
+def report_progress(rows: int) -> None:
+    """
+    Registra un bloque de `rows` filas procesadas en el trabajo actual y
+    detiene el engine (JobCancelled) si el trabajo fue cancelado.
+    """
+    job = _current.get()
+    if job is not None:
+        job.report(rows)
+
+
+class JobStore:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, tool: str = "", rows: int = 0, **kwargs: Any) -> Job:
+        """
+        Admite `fn` en el pool de cómputo como trabajo; lanza ComputeOverloaded
+        si la cola está llena. `fn` corre en un contexto limpio: el request que
+        lo envía termina antes que el trabajo.
+        """
+        job = Job(uuid.uuid4().hex, tool, rows or None)
+        contextvars.Context().run(
+            COMPUTE.submit, self._run, job, fn, args, kwargs, tool=tool, rows=rows
+        )
+        with self._lock:
+            self._entries[job.job_id] = job
+            self._evict()
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+        _current.set(job)
+        try:
+            # Cancelado mientras esperaba en la cola
+            if job.cancel_requested:
+                raise JobCancelled(f"Trabajo '{job.job_id}' cancelado.")
+            job.status = "running"
+            job.started_at = time.time()
+            job.result = fn(*args, **kwargs)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+        except (Exception, MemoryBudgetError) as e:
+            job.error = str(e)
+            status = "failed"
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.ttl
+        job.status = status
+        JOBS_FINISHED.inc(tool=job.tool or "-", status=status)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._entries.get(job_id)
+            if job is None:
+                return None
+            if job.finished and job.expires_at < time.time():
+                del self._entries[job_id]
+                return None
+            self._entries.move_to_end(job_id)
+            return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job._cancel.set()
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Elimina un trabajo terminado (los activos se cancelan primero)."""
+        with self._lock:
+            job = self._entries.get(job_id)
+            if job is None or not job.finished:
+                return False
+            del self._entries[job_id]
+            return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict()
+            return [job.describe() for job in self._entries.values()]
+
+    def _evict(self) -> None:
+        """Debe llamarse con el lock tomado."""
+        now = time.time()
+        finished = [job_id for job_id, job in self._entries.items() if job.finished]
+        for job_id in finished:
+            if self._entries[job_id].expires_at < now:
+                del self._entries[job_id]
+        # Por tamaño solo salen terminados, del menos al más usado
+        for job_id in finished:
+            if len(self._entries) <= self.max_entries:
+                break
+            self._entries.pop(job_id, None)
+
+
+# Almacén global del proceso
+JOBS = JobStore()
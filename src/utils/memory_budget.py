@@ -0,0 +1,395 @@
+"""
+Presupuesto de memoria por request y global del proceso.
+
+Un solo payload gigante (ej: un año de documentos en `/transform/aggregate`
+o en la reconciliación) puede llevar el proceso al OOM-kill y tumbar todos los
+requests en curso. Aquí cada request reserva memoria ANTES de construir sus
+estructuras y falla rápido si no cabe:
+
+- Al llegar (middleware): `Content-Length x ANALYTICS_BODY_MEMORY_FACTOR`,
+  antes de leer el body (parseo JSON + validación + DataFrame).
+- Antes del engine (rutas): filas x columnas x bytes por celda x peso de la
+  tool (la reconciliación mantiene dos frames y el merge).
+- Durante la ejecución: `build_frame` y la ingesta NDJSON reportan el tamaño
+  real de los frames construidos (`track_allocation`, que los suma: un request
+  puede construir varios) y se revisa el RSS del proceso (`checkpoint`).
+
+La reserva dura hasta terminar de enviar la respuesta: en los modos en
+streaming (ndjson/arrow) las filas se producen mientras se envía el body.
+
+Límites:
+- `ANALYTICS_REQUEST_MEMORY_BYTES`: máximo por request. Excederlo es un error
+  del cliente -> `MemoryBudgetExceeded` (HTTP 413); el dataset debe reducirse
+  o procesarse por partes.
+- `ANALYTICS_MEMORY_LIMIT_BYTES`: memoria total del proceso (por defecto 80%
+  del límite del cgroup o de la RAM, dividido entre los workers). Si la suma
+  de reservas no cabe -> `MemoryOverloaded` (HTTP 429 + Retry-After, como la
+  cola de cómputo llena): es transitorio.
+
+Ambos rechazos heredan de BaseException (como `JobCancelled`) para atravesar
+los `except Exception` de tools y rutas; `MemoryBudgetRoute` los convierte en
+la respuesta HTTP antes de salir de la ruta.
+
+Las estimaciones son deliberadamente conservadoras; el RSS real se usa como
+cota adicional, no por request (los hilos comparten el heap).
+"""
+
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+import pandas as pd
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from utils.metrics import REGISTRY, BYTE_BUCKETS
+from utils.serialization import FastJSONResponse, respond
+
+
+def _system_memory() -> int:
+    """Límite del cgroup (contenedores) o RAM física."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+            if raw.isdigit() and int(raw) < 1 << 60:
+                return int(raw)
+        except OSError:
+            continue
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8 << 30
+
+
+def _default_limit() -> int:
+    workers = max(1, int(os.getenv("ANALYTICS_WORKERS", "1")))
+    return int(_system_memory() * 0.8 / workers)
+
+
+MEMORY_LIMIT_BYTES = int(os.getenv("ANALYTICS_MEMORY_LIMIT_BYTES", str(_default_limit())))
+REQUEST_MEMORY_BYTES = int(os.getenv("ANALYTICS_REQUEST_MEMORY_BYTES", str(min(2 << 30, MEMORY_LIMIT_BYTES // 2))))
+# Un body JSON ocupa ~4x al parsearse, otro tanto en la validación y ~2x como DataFrame
+BODY_MEMORY_FACTOR = float(os.getenv("ANALYTICS_BODY_MEMORY_FACTOR", "8"))
+# Bytes por celda de un DataFrame de trabajo (textos incluidos)
+CELL_BYTES = 32
+# Celdas de columnas object: puntero + objeto Python
+OBJECT_CELL_BYTES = 64
+MEMORY_RETRY_AFTER = 5
+
+# Copias de trabajo que hace cada familia de tool sobre su dataset (por prefijo del nombre)
+TOOL_MEMORY_FACTORS = {
+    "analytics_reconcile": 3.0,
+    "analytics_transform": 2.0,
+    "analytics_chart": 1.5,
+    "analytics_linear": 1.5,
+    "analytics_stat": 1.0,
+}
+DEFAULT_MEMORY_FACTOR = 1.5
+
+RESERVED = REGISTRY.gauge(
+    "analytics_memory_reserved_bytes", "Memoria reservada por los requests en curso.")
+PROCESS_RSS = REGISTRY.gauge(
+    "analytics_memory_rss_bytes", "RSS del proceso en el último checkpoint.")
+REJECTED = REGISTRY.counter(
+    "analytics_memory_rejected_total", "Requests rechazados por presupuesto de memoria.", ("scope",))
+REQUEST_RESERVED = REGISTRY.histogram(
+    "analytics_memory_request_bytes", "Memoria reservada por request (máximo alcanzado).", ("tool",), buckets=BYTE_BUCKETS)
+
+
+class MemoryBudgetError(BaseException):
+    """Rechazo por presupuesto de memoria (ver el docstring del módulo)."""
+
+    status_code = 413
+    retry_after: Optional[int] = None
+
+    def response(self) -> FastJSONResponse:
+        response = respond(error=str(self), status_code=self.status_code)
+        if self.retry_after is not None:
+            response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class MemoryBudgetExceeded(MemoryBudgetError):
+    """El request por sí solo excede ANALYTICS_REQUEST_MEMORY_BYTES (HTTP 413)."""
+
+    def __init__(self, message: str, requested: int, limit: int):
+        super().__init__(message)
+        self.requested = requested
+        self.limit = limit
+
+
+class MemoryOverloaded(MemoryBudgetError):
+    """No hay memoria libre en el proceso ahora mismo (HTTP 429 + Retry-After)."""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def process_rss() -> int:
+    """RSS actual del proceso (0 si /proc no está disponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _mib(nbytes: float) -> str:
+    return f"{nbytes / (1 << 20):,.0f} MiB"
+
+
+# ==========================================
+# 1. ESTIMACIONES
+# ==========================================
+def memory_factor(tool: str) -> float:
+    for prefix, factor in TOOL_MEMORY_FACTORS.items():
+        if tool.startswith(prefix):
+            return factor
+    return DEFAULT_MEMORY_FACTOR
+
+
+def estimate_body_bytes(content_length: int) -> int:
+    return int(content_length * BODY_MEMORY_FACTOR)
+
+
+def estimate_tool_bytes(tool: str, rows: int, cols: int) -> int:
+    """Memoria de trabajo estimada del engine para `rows` x `cols` celdas."""
+    return int(rows * max(cols, 1) * CELL_BYTES * memory_factor(tool))
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Tamaño aproximado y barato (sin recorrer textos) de un DataFrame."""
+    total = 0
+    for position in range(df.shape[1]):
+        column = df.iloc[:, position]
+        total += int(column.memory_usage(index=False, deep=False))
+        if column.dtype == object:
+            total += len(column) * OBJECT_CELL_BYTES
+    return total
+
+
+def payload_shape(payload: Dict[str, Any], frames: Optional[Dict[str, pd.DataFrame]] = None) -> tuple:
+    """(filas, columnas máximas) de los campos de datos del payload y de los frames."""
+    rows, cols = 0, 0
+    for value in payload.values():
+        if isinstance(value, list):
+            rows += len(value)
+            if value and isinstance(value[0], dict):
+                cols = max(cols, len(value[0]))
+    for frame in (frames or {}).values():
+        rows += len(frame)
+        cols = max(cols, frame.shape[1])
+    return rows, cols
+
+
+# ==========================================
+# 2. RESERVAS
+# ==========================================
+class Reservation:
+    """Memoria reservada por un request; puede crecer a medida que se conoce mejor."""
+
+    __slots__ = ("budget", "label", "nbytes", "peak", "allocated", "released")
+
+    def __init__(self, budget: "MemoryBudget", label: str):
+        self.budget = budget
+        self.label = label
+        self.nbytes = 0
+        self.peak = 0
+        # Memoria ya construida por el request (suma de `track_allocation`)
+        self.allocated = 0
+        self.released = False
+
+    def ensure(self, nbytes: int) -> None:
+        """Garantiza al menos `nbytes` reservados; lanza si no caben."""
+        if nbytes > self.nbytes:
+            self.budget._grow(self, nbytes)
+
+    def release(self) -> None:
+        """Libera la reserva (idempotente: el middleware puede liberarla por dos caminos)."""
+        if not self.released:
+            self.released = True
+            self.budget._shrink(self)
+
+
+class MemoryBudget:
+    def __init__(self, limit: int = MEMORY_LIMIT_BYTES, request_limit: int = REQUEST_MEMORY_BYTES):
+        self.limit = limit
+        self.request_limit = request_limit
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._rejected = 0
+        # Memoria del proceso sin requests (librerías, registro de tools)
+        self._baseline = process_rss()
+
+    def _grow(self, reservation: Reservation, nbytes: int) -> None:
+        if nbytes > self.request_limit:
+            self._reject("request")
+            raise MemoryBudgetExceeded(
+                f"El request requiere ~{_mib(nbytes)} de memoria y el máximo por request es "
+                f"{_mib(self.request_limit)} (ANALYTICS_REQUEST_MEMORY_BYTES). "
+                "Envía solo las columnas necesarias o procesa el dataset desde archivo (tools analytics_file_*).",
+                nbytes, self.request_limit,
+            )
+        with self._lock:
+            extra = nbytes - reservation.nbytes
+            in_use = max(self._baseline + self._reserved, process_rss())
+            # Un request siempre entra si no hay otros reservando (si no, nunca correría)
+            others = self._reserved - reservation.nbytes
+            if others > 0 and in_use + extra > self.limit:
+                self._rejected += 1
+                REJECTED.inc(scope="global")
+                raise MemoryOverloaded(
+                    f"Memoria insuficiente: ~{_mib(in_use)} en uso de {_mib(self.limit)} y el request "
+                    f"requiere ~{_mib(nbytes)}. Reintenta en {MEMORY_RETRY_AFTER}s.",
+                    MEMORY_RETRY_AFTER,
+                )
+            self._reserved += extra
+            RESERVED.set(self._reserved)
+        reservation.nbytes = nbytes
+        reservation.peak = max(reservation.peak, nbytes)
+
+    def _shrink(self, reservation: Reservation) -> None:
+        with self._lock:
+            self._reserved -= reservation.nbytes
+            RESERVED.set(self._reserved)
+        if reservation.peak:
+            REQUEST_RESERVED.observe(reservation.peak, tool=reservation.label or "-")
+        reservation.nbytes = 0
+
+    def _reject(self, scope: str) -> None:
+        with self._lock:
+            self._rejected += 1
+        REJECTED.inc(scope=scope)
+
+    def checkpoint(self) -> None:
+        """Revisa el RSS real: si el proceso ya pasó el límite, aborta el request actual."""
+        rss = process_rss()
+        if not rss:
+            return
+        PROCESS_RSS.set(rss)
+        if rss > self.limit:
+            REJECTED.inc(scope="rss")
+            raise MemoryOverloaded(
+                f"El proceso usa ~{_mib(rss)} (límite {_mib(self.limit)}); se aborta el request "
+                f"para evitar el OOM. Reintenta en {MEMORY_RETRY_AFTER}s.",
+                MEMORY_RETRY_AFTER,
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit_bytes": self.limit,
+                "request_limit_bytes": self.request_limit,
+                "reserved_bytes": self._reserved,
+                "baseline_bytes": self._baseline,
+                "rss_bytes": process_rss(),
+                "rejected_total": self._rejected,
+            }
+
+
+# Presupuesto global del proceso
+MEMORY = MemoryBudget()
+
+_current: ContextVar[Optional[Reservation]] = ContextVar("analytics_memory_reservation", default=None)
+
+
+@contextmanager
+def reserve(nbytes: int = 0, label: str = "") -> Iterator[Reservation]:
+    """Reserva memoria para el bloque; las llamadas anidadas reutilizan la reserva del request."""
+    current = _current.get()
+    if current is not None:
+        current.ensure(nbytes)
+        yield current
+        return
+    reservation = Reservation(MEMORY, label)
+    token = _current.set(reservation)
+    try:
+        reservation.ensure(nbytes)
+        yield reservation
+    finally:
+        _current.reset(token)
+        reservation.release()
+
+
+def ensure_for_tool(tool: str, payload: Dict[str, Any], frames: Optional[Dict[str, pd.DataFrame]] = None) -> None:
+    """Amplía la reserva del request actual según filas x columnas antes de ejecutar la tool."""
+    reservation = _current.get()
+    if reservation is None:
+        return
+    reservation.label = tool
+    rows, cols = payload_shape(payload, frames)
+    reservation.ensure(estimate_tool_bytes(tool, rows, cols))
+
+
+def track_allocation(nbytes: int, transient: bool = False) -> None:
+    """
+    Registra en la reserva del request actual la memoria ya construida (ej: el
+    tamaño real de sus frames, ver `frame_bytes`) y revisa el RSS del proceso.
+    Las asignaciones se suman; con `transient` (bloques de un recorrido, que se
+    liberan antes del siguiente) cuentan sobre lo acumulado sin sumarse.
+    """
+    reservation = _current.get()
+    if reservation is None:
+        return
+    reservation.ensure(reservation.allocated + nbytes)
+    if not transient:
+        reservation.allocated += nbytes
+    MEMORY.checkpoint()
+
+
+# ==========================================
+# 3. HTTP
+# ==========================================
+class MemoryBudgetRoute(APIRoute):
+    """Ruta que responde 413 / 429 + Retry-After cuando el request excede el presupuesto."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def budgeted_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            except MemoryBudgetError as e:
+                return e.response()
+
+        return budgeted_handler
+
+
+async def _release_when_sent(body: AsyncIterator[bytes], reservation: Reservation) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        reservation.release()
+
+
+async def memory_budget_middleware(request: Request, call_next):
+    """Reserva la memoria del request según su Content-Length antes de leer el body."""
+    content_length = request.headers.get("content-length")
+    estimate = estimate_body_bytes(int(content_length)) if content_length and content_length.isdigit() else 0
+    reservation = Reservation(MEMORY, "")
+    token = _current.set(reservation)
+    try:
+        reservation.ensure(estimate)
+        response = await call_next(request)
+    except MemoryBudgetError as e:
+        reservation.release()
+        return e.response()
+    except BaseException:
+        reservation.release()
+        raise
+    finally:
+        _current.reset(token)
+    # El body (y las filas de los modos en streaming) se produce al enviarlo
+    body = _release_when_sent(response.body_iterator, reservation)
+    # Si el envío falla antes de empezar a iterar, la reserva se libera con el iterador
+    weakref.finalize(body, reservation.release)
+    response.body_iterator = body
+    return response
@@ -0,0 +1,337 @@
+"""
+Parseo vectorizado de números y fechas con caché de tipos por dataset.
+
+Los extractos de SAP/DIAN traen montos como texto en formato colombiano
+("$1.234.567,89", "1.234,56-") o estadounidense ("$1,234.56") y fechas como
+"20240131", "31.01.2024", "31/01/2024" o "/Date(1706659200000)/" (OData).
+Este módulo:
+
+- infiere el tipo de cada columna una sola vez (sobre una muestra),
+- la parsea con operaciones de texto vectorizadas (`Series.str`),
+- guarda la columna tipada en caché ligada al DataFrame de origen: los
+  datasets registrados o ingeridos (que se reutilizan entre requests) solo se
+  parsean la primera vez.
+
+Los DataFrames de origen se consideran inmutables: los engines trabajan
+sobre la copia superficial de `build_frame`, que se asocia a su origen con
+`link_copy` para compartir la caché.
+"""
+
+import os
+import re
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_SIZE = 1000
+# Fracción mínima de la muestra que debe parsear para inferir el tipo
+INFER_THRESHOLD = 0.9
+
+# Símbolos de moneda y espacios (incluye el espacio duro de los exportes de Excel)
+_CURRENCY_RE = r"[\$\s ]|COP|USD"
+# Montos en pesos: con "$" o "COP" (y sin "USD") un "45.000" es de miles
+_PESO_RE = r"\$|COP"
+# Separador decimal cuando todos los valores admiten ambas lecturas y no hay marca de pesos
+DEFAULT_DECIMAL = os.getenv("ANALYTICS_DEFAULT_DECIMAL", ".")
+if DEFAULT_DECIMAL not in (".", ","):
+    raise ValueError("ANALYTICS_DEFAULT_DECIMAL debe ser '.' o ','.")
+# Solo separadores de miles sin parte decimal: "1.234.567" / "1,234,567"
+# (un primer grupo "0" no es de miles: "0.125" solo admite la lectura decimal)
+_THOUSANDS_DOT = re.compile(r"^[1-9]\d{0,2}(\.\d{3})+$")
+_THOUSANDS_COMMA = re.compile(r"^[1-9]\d{0,2}(,\d{3})+$")
+
+_DATE_FORMATS = (
+    # (nombre, regex de detección, formato de pd.to_datetime)
+    ("odata", re.compile(r"^/Date\(-?\d+([+-]\d{4})?\)/$"), None),
+    ("sap_compact", re.compile(r"^\d{8}$"), "%Y%m%d"),
+    ("iso", re.compile(r"^\d{4}-\d{2}-\d{2}([ T].*)?$"), "ISO8601"),
+    ("sap_dotted", re.compile(r"^\d{2}\.\d{2}\.\d{4}$"), "%d.%m.%Y"),
+    ("day_first", re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$"), "%d/%m/%Y"),
+)
+
+
+# ==========================================
+# 1. NÚMEROS
+# ==========================================
+def _is_textual(series: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(series.dtype) or series.dtype == object
+
+
+def ambiguous_decimal(raw: pd.Series) -> str:
+    """
+    Separador decimal para cuando todo admite ambas lecturas, según el texto
+    original: los montos en pesos ("$45.000", "45.000 COP") usan coma decimal
+    (punto de miles); si no, `ANALYTICS_DEFAULT_DECIMAL`.
+    """
+    pesos = raw.str.contains(_PESO_RE, regex=True).fillna(False)
+    if pesos.any() and not raw.str.contains("USD", regex=False).fillna(False).any():
+        return ","
+    return DEFAULT_DECIMAL
+
+
+def detect_decimal_separator(text: pd.Series, default: Optional[str] = None) -> str:
+    """
+    Decide el separador decimal de una columna ya limpia de símbolos.
+    Cuenta los valores que solo admiten una lectura ("1.234,5", "0,5",
+    "1.234.567" -> coma; "1,234.5", "0.5", "0.125" -> punto). Si todo admite
+    ambas lecturas ("1.234", "1,234") decide `default` (ver `ambiguous_decimal`).
+    """
+    last_dot = text.str.rfind(".")
+    last_comma = text.str.rfind(",")
+    has_dot = last_dot >= 0
+    has_comma = last_comma >= 0
+
+    # Con ambos separadores, el último es el decimal
+    both = has_dot & has_comma
+    comma_votes = int((both & (last_comma > last_dot)).sum())
+    dot_votes = int((both & (last_dot > last_comma)).sum())
+
+    # Un solo tipo de separador: es decimal si no deja exactamente grupos de 3 dígitos
+    only_dot = text[has_dot & ~has_comma]
+    only_comma = text[has_comma & ~has_dot]
+    dot_votes += int((~only_dot.str.match(_THOUSANDS_DOT)).sum())
+    comma_votes += int((~only_comma.str.match(_THOUSANDS_COMMA)).sum())
+    # Varios separadores iguales solo pueden ser de miles: "1.234.567", "1,234,567"
+    comma_votes += int((only_dot.str.count(r"\.") > 1).sum())
+    dot_votes += int((only_comma.str.count(",") > 1).sum())
+
+    if comma_votes > dot_votes:
+        return ","
+    if dot_votes > comma_votes:
+        return "."
+    # Ambiguo o empate: lo decide la marca de moneda o la configuración
+    return default or DEFAULT_DECIMAL
+
+
+def parse_numeric(series: pd.Series, decimal: Optional[str] = None) -> pd.Series:
+    """
+    Convierte una columna a float64 de forma vectorizada. Acepta montos con
+    símbolo de moneda, separadores de miles de ambos formatos, negativos con
+    signo, entre paréntesis "(1.234)" o con signo al final "1.234,56-" (SAP).
+    Lo que no se puede interpretar queda como NaN.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype("float64")
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return _by_categories(series, lambda categories: parse_numeric(categories, decimal)).astype("float64")
+    if not _is_textual(series):
+        return pd.to_numeric(series, errors="coerce")
+
+    # Columnas mixtas (object): los valores que no son texto (números, bools) se
+    # convierten tal cual; todo el texto pasa por el mismo parseo con separador
+    textual = None
+    if series.dtype == object:
+        textual = np.fromiter((isinstance(v, str) for v in series.to_numpy()), dtype=bool, count=len(series))
+    raw = series.astype("string").str.strip()
+    text = raw.str.replace(_CURRENCY_RE, "", regex=True)
+
+    negative = text.str.startswith("(") & text.str.endswith(")")
+    trailing = text.str.endswith("-")
+    negative = (negative | trailing).fillna(False)
+    text = text.str.strip("()").str.rstrip("-")
+
+    if decimal is None:
+        has_separator = text.str.contains(r"[.,]", regex=True).fillna(False)
+        if textual is not None:
+            has_separator &= textual
+        candidates = text[has_separator]
+        default = ambiguous_decimal(raw[has_separator])
+        decimal = detect_decimal_separator(candidates, default) if len(candidates) else "."
+    thousands = "." if decimal == "," else ","
+    text = text.str.replace(thousands, "", regex=False)
+    if decimal == ",":
+        text = text.str.replace(",", ".", regex=False)
+
+    parsed = pd.to_numeric(text, errors="coerce").astype("float64")
+    parsed = parsed.where(~negative, -parsed)
+    if textual is not None and not textual.all():
+        direct = pd.to_numeric(series.where(~textual), errors="coerce")
+        parsed = parsed.where(textual, direct.astype("float64"))
+    return pd.Series(parsed.to_numpy(dtype="float64", na_value=np.nan), index=series.index, name=series.name)
+
+
+def _by_categories(series: pd.Series, parse) -> pd.Series:
+    """Parsea solo las categorías (valores distintos) y expande por códigos."""
+    categories = pd.Series(series.cat.categories)
+    parsed = parse(categories)
+    codes = series.cat.codes.to_numpy()
+    values = parsed.to_numpy()[codes]
+    result = pd.Series(values, index=series.index, name=series.name)
+    # Código -1 = faltante
+    return result.where(codes >= 0)
+
+
+# ==========================================
+# 2. FECHAS
+# ==========================================
+def detect_date_format(series: pd.Series) -> Optional[str]:
+    """Nombre del formato de fecha dominante en la muestra (ver _DATE_FORMATS) o None."""
+    sample = series.dropna().astype(str).str.strip()
+    sample = sample[sample != ""].head(SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    for name, pattern, _ in _DATE_FORMATS:
+        if sample.str.match(pattern).mean() >= INFER_THRESHOLD:
+            return name
+    return None
+
+
+def parse_dates(series: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """Convierte una columna a datetime64 (NaT si no es interpretable)."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.to_datetime(_by_categories(series, lambda categories: parse_dates(categories, date_format)))
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        # SAP exporta fechas como enteros YYYYMMDD
+        return pd.to_datetime(series.astype("Int64").astype("string"), format="%Y%m%d", errors="coerce")
+
+    date_format = date_format or detect_date_format(series)
+    text = series.astype("string").str.strip()
+    if date_format == "odata":
+        millis = pd.to_numeric(text.str.extract(r"(-?\d+)", expand=False), errors="coerce")
+        return pd.to_datetime(millis, unit="ms", errors="coerce")
+    for name, _, fmt in _DATE_FORMATS:
+        if name == date_format:
+            return pd.to_datetime(text, format=fmt, errors="coerce")
+    return pd.to_datetime(text, format="mixed", dayfirst=True, errors="coerce")
+
+
+# ==========================================
+# 3. INFERENCIA DE TIPOS
+# ==========================================
+def infer_column_type(series: pd.Series) -> Tuple[str, Dict[str, Any]]:
+    """
+    Tipo lógico de la columna: "number", "date" o "text", más los parámetros
+    de parseo detectados (separador decimal, formato de fecha).
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "text", {}
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return "number", {}
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return "date", {}
+
+    sample = series.dropna().head(SAMPLE_SIZE)
+    if sample.empty:
+        return "text", {}
+
+    date_format = detect_date_format(sample)
+    if date_format is not None and date_format != "sap_compact":
+        return "date", {"date_format": date_format}
+
+    raw = sample.astype("string").str.strip()
+    text = raw.str.replace(_CURRENCY_RE, "", regex=True)
+    has_separator = text.str.contains(r"[.,]", regex=True).fillna(False)
+    separators = text[has_separator]
+    decimal = detect_decimal_separator(separators, ambiguous_decimal(raw[has_separator])) if len(separators) else "."
+    if parse_numeric(sample, decimal).notna().mean() >= INFER_THRESHOLD:
+        # "20240131" es numérico y fecha a la vez: lo decide el nombre de la columna
+        if date_format == "sap_compact" and _looks_like_date_name(series.name):
+            return "date", {"date_format": date_format}
+        return "number", {"decimal": decimal}
+    return "text", {}
+
+
+def _looks_like_date_name(name: Any) -> bool:
+    name = str(name).lower()
+    return any(k in name for k in ("date", "fecha", "time", "docdate", "taxdate"))
+
+
+# ==========================================
+# 4. CACHÉ POR DATASET
+# ==========================================
+class TypedColumnCache:
+    """
+    Columnas ya tipadas por DataFrame de origen. La entrada vive lo mismo que
+    el DataFrame (weakref), así que los datasets registrados conservan su
+    caché entre requests y los frames de un request se liberan con él.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Dict[Tuple[str, str], Any]] = {}
+        self._sources: Dict[int, "weakref.ref"] = {}
+        self._lock = threading.Lock()
+
+    def link_copy(self, copy: pd.DataFrame, source: pd.DataFrame) -> None:
+        """Asocia una copia superficial a su origen para compartir la caché."""
+        source = self.source_of(source)
+        key = id(copy)
+        with self._lock:
+            self._sources[key] = weakref.ref(source)
+        weakref.finalize(copy, self._forget_copy, key)
+
+    def _forget_copy(self, key: int) -> None:
+        with self._lock:
+            self._sources.pop(key, None)
+
+    def source_of(self, df: pd.DataFrame) -> pd.DataFrame:
+        with self._lock:
+            ref = self._sources.get(id(df))
+        source = ref() if ref is not None else None
+        return source if source is not None else df
+
+    def get_or_compute(self, df: pd.DataFrame, column: str, kind: str, compute) -> Any:
+        source = self.source_of(df)
+        # Si la copia ya reemplazó la columna, la caché del origen no aplica
+        if source is not df and (column not in source.columns or source[column].dtype != df[column].dtype):
+            return compute(df[column])
+
+        key = id(source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (column, kind) in entry:
+                return entry[(column, kind)]
+        value = compute(source[column])
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = {}
+                weakref.finalize(source, self._entries.pop, key, None)
+            self._entries[key][(column, kind)] = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+TYPED_COLUMNS = TypedColumnCache()
+
+
+def column_type(df: pd.DataFrame, column: str) -> Tuple[str, Dict[str, Any]]:
+    return TYPED_COLUMNS.get_or_compute(df, column, "type", infer_column_type)
+
+
+def numeric_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Columna como float64 (NaN donde no es numérica), parseada una vez por dataset."""
+    series = df[column]
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        # Los float32 de frames compactos se operan en float64 (acumulación exacta)
+        return series.astype("float64") if series.dtype == "float32" else series
+
+    def compute(values: pd.Series) -> pd.Series:
+        _, params = column_type(df, column)
+        return parse_numeric(values, params.get("decimal"))
+
+    parsed = TYPED_COLUMNS.get_or_compute(df, column, "number", compute)
+    # La caché es del origen: se realinea al índice de la copia (tras filtros/dropna)
+    return parsed if parsed.index.equals(series.index) else parsed.reindex(series.index)
+
+
+def date_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Columna como datetime64 (NaT donde no es fecha), parseada una vez por dataset."""
+    series = df[column]
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+
+    def compute(values: pd.Series) -> pd.Series:
+        _, params = column_type(df, column)
+        return parse_dates(values, params.get("date_format"))
+
+    parsed = TYPED_COLUMNS.get_or_compute(df, column, "date", compute)
+    return parsed if parsed.index.equals(series.index) else parsed.reindex(series.index)
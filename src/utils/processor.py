@@ -1,14 +1,45 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+
+from utils.compaction import COMPACT_MIN_ROWS, compact_frame
+from utils.instrumentation import stage
+from utils.memory_budget import frame_bytes, track_allocation
+from utils.parsing import TYPED_COLUMNS, date_column, numeric_column
+
+# Los engines aceptan registros JSON o un DataFrame ya construido
+# (ingesta por streaming, datasets registrados)
+TabularData = Union[List[Dict[str, Any]], pd.DataFrame]
+
+
+def build_frame(data: TabularData) -> pd.DataFrame:
+    """
+    Punto único de construcción de DataFrames para los engines.
+    Registra el tiempo en la etapa 'frame' del request actual.
+    Si ya recibe un DataFrame devuelve una copia superficial: los engines
+    pueden reasignar columnas sin alterar el frame del llamador, y la copia
+    comparte con el original la caché de columnas tipadas (utils.parsing).
+    Los frames grandes se construyen compactos (categorías, enteros angostos;
+    ver utils.compaction). El tamaño real del frame se descuenta del
+    presupuesto de memoria del request (utils.memory_budget).
+    """
+    with stage("frame"):
+        if isinstance(data, pd.DataFrame):
+            frame = data.copy(deep=False)
+            TYPED_COLUMNS.link_copy(frame, data)
+            return frame
+        frame = compact_frame(pd.DataFrame(data), COMPACT_MIN_ROWS)
+    track_allocation(frame_bytes(frame))
+    return frame
+
 
 def process_data_for_chart(data: List[Dict[str, Any]], x_col: str, y_col: str) -> pd.DataFrame:
     """
     Convierte lista de diccionarios a DataFrame y limpia tipos de datos.
     """
-    if not data:
+    if data is None or len(data) == 0:
         raise ValueError("El dataset está vacío.")
 
-    df = pd.DataFrame(data)
+    df = build_frame(data)
 
     # 1. Validar columnas
     if x_col not in df.columns:
@@ -24,13 +55,12 @@ def process_data_for_chart(data: List[Dict[str, Any]], x_col: str, y_col: str) -
     # 2. Limpieza de Fechas (Eje X)
     # Si parece fecha (contiene 'date' o 'fecha'), intentamos formatear corto
     if any(k in x_col.lower() for k in ['date', 'fecha', 'time']):
-        try:
-            df[x_col] = pd.to_datetime(df[x_col]).dt.strftime('%Y-%m-%d')
-        except:
-            pass # Si falla, se queda como texto original
+        dates = date_column(df, x_col)
+        if dates.notna().any():
+            df[x_col] = dates.dt.strftime('%Y-%m-%d')  # Si falla, se queda como texto original
 
     # 3. Limpieza Numérica (Eje Y)
-    # Forzamos conversión a número. Si hay basura ("$100", "N/A"), se convierte en NaN y luego en 0
-    df[y_col] = pd.to_numeric(df[y_col], errors='coerce').fillna(0)
+    # Montos como texto ("$1.234,56", "N/A") se parsean; lo no numérico queda en 0
+    df[y_col] = numeric_column(df, y_col).fillna(0)
 
     return df, x_col, y_col
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Profiling opt-in por request para /execute.
+
+Se activa por request con el header `X-Profile` (`1`/`cprofile` para el
+profiler determinista, `sample` para el muestreador de stacks; solo con el
+token de administración) o de forma aleatoria con
+`ANALYTICS_PROFILE_SAMPLE_RATE` (0.0 = nunca). Cuando está desactivado el
+costo es una lectura de header y una comparación.
+
+Los perfiles se guardan en `ANALYTICS_PROFILE_DIR` con el request ID como
+nombre base (un ID ya usado recibe un sufijo; nunca se sobrescribe un perfil):
+- <id>.pstats     -> cProfile (abrir con `python -m pstats` o snakeviz)
+- <id>.txt        -> resumen legible (top funciones por tiempo acumulado)
+- <id>.collapsed  -> stacks colapsados (flamegraph.pl / speedscope)
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_DIR = os.getenv("ANALYTICS_PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+SAMPLE_RATE = float(os.getenv("ANALYTICS_PROFILE_SAMPLE_RATE", "0"))
+MAX_PROFILES = int(os.getenv("ANALYTICS_PROFILE_MAX_FILES", "200"))
+SAMPLER_INTERVAL = float(os.getenv("ANALYTICS_PROFILE_SAMPLER_INTERVAL_MS", "5")) / 1000
+
+PROFILE_HEADER = "x-profile"
+REQUEST_ID_HEADER = "x-request-id"
+MODES = ("cprofile", "sample")
+EXTENSIONS = {"pstats": ".pstats", "txt": ".txt", "collapsed": ".collapsed"}
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def profiling_mode(headers: Any, allow_header: bool = True) -> Optional[str]:
+    """
+    Devuelve el modo de profiling pedido para el request, o None si no aplica.
+    Sin `allow_header` el header se ignora (solo aplica el muestreo aleatorio).
+    """
+    requested = headers.get(PROFILE_HEADER) if allow_header else None
+    if requested:
+        requested = requested.strip().lower()
+        if requested in ("0", "false", "off"):
+            return None
+        return requested if requested in MODES else "cprofile"
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return "cprofile"
+    return None
+
+
+def request_id_from(headers: Any) -> str:
+    """
+    Usa el X-Request-ID del cliente si es seguro como nombre de archivo; si no,
+    genera uno. Un ID que ya tiene perfil guardado recibe un sufijo.
+    """
+    candidate = headers.get(REQUEST_ID_HEADER)
+    if not candidate or not _SAFE_ID.match(candidate):
+        return uuid.uuid4().hex
+    if any(os.path.exists(_path(candidate, kind)) for kind in EXTENSIONS):
+        # Dentro del largo que acepta _SAFE_ID (la descarga valida el mismo patrón)
+        return f"{candidate[:55]}-{uuid.uuid4().hex[:8]}"
+    return candidate
+
+
+# ==========================================
+# 1. PROFILERS
+# ==========================================
+class StackSampler:
+    """Muestrea periódicamente el stack de un hilo y acumula stacks colapsados."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLER_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="analytics-stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def run_profiled(fn: Callable[[], Any], mode: str, request_id: str) -> Any:
+    """Ejecuta `fn` en el hilo actual bajo el profiler indicado y guarda el perfil."""
+    started = time.perf_counter()
+    if mode == "sample":
+        with StackSampler(threading.get_ident()) as sampler:
+            try:
+                return fn()
+            finally:
+                elapsed = time.perf_counter() - started
+                header = f"# request={request_id} mode=sample interval_ms={sampler.interval * 1000:g} wall_ms={elapsed * 1000:.1f}\n"
+                _write(request_id, "collapsed", header + sampler.collapsed())
+                _prune()
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn)
+    finally:
+        elapsed = time.perf_counter() - started
+        _ensure_dir()
+        # Dos requests simultáneos con el mismo ID: el primero conserva su perfil
+        if not os.path.exists(_path(request_id, "pstats")):
+            profiler.dump_stats(_path(request_id, "pstats"))
+        summary = io.StringIO()
+        summary.write(f"# request={request_id} mode=cprofile wall_ms={elapsed * 1000:.1f}\n")
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(60)
+        _write(request_id, "txt", summary.getvalue())
+        _prune()
+
+
+# ==========================================
+# 2. ALMACÉN LOCAL
+# ==========================================
+def _ensure_dir() -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+
+def _path(request_id: str, kind: str) -> str:
+    return os.path.join(PROFILE_DIR, request_id + EXTENSIONS[kind])
+
+
+def _write(request_id: str, kind: str, content: str) -> None:
+    _ensure_dir()
+    try:
+        # "x": nunca sobrescribe el perfil de otro request
+        with open(_path(request_id, kind), "x", encoding="utf-8") as fh:
+            fh.write(content)
+    except FileExistsError:
+        pass
+
+
+def _prune() -> None:
+    """Conserva solo los MAX_PROFILES perfiles más recientes."""
+    profiles = list_profiles()
+    for entry in profiles[MAX_PROFILES:]:
+        for kind in entry["formats"]:
+            try:
+                os.remove(_path(entry["request_id"], kind))
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Perfiles guardados, del más reciente al más antiguo."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for filename in os.listdir(PROFILE_DIR):
+        request_id, ext = os.path.splitext(filename)
+        kind = next((k for k, e in EXTENSIONS.items() if e == ext), None)
+        if kind is None:
+            continue
+        entry = by_id.setdefault(request_id, {"request_id": request_id, "formats": [], "created_at": 0.0})
+        entry["formats"].append(kind)
+        entry["created_at"] = max(entry["created_at"], os.path.getmtime(os.path.join(PROFILE_DIR, filename)))
+    return sorted(by_id.values(), key=lambda e: e["created_at"], reverse=True)
+
+
+def profile_path(request_id: str, kind: Optional[str] = None) -> Optional[str]:
+    """Ruta del perfil pedido (o del primer formato disponible), o None si no existe."""
+    if not _SAFE_ID.match(request_id):
+        return None
+    kinds = [kind] if kind else ["txt", "collapsed", "pstats"]
+    for k in kinds:
+        if k in EXTENSIONS and os.path.exists(_path(request_id, k)):
+            return _path(request_id, k)
+    return None
@@ -0,0 +1,136 @@
+"""
+Almacén local y acotado de resultados grandes (paginación por cursor).
+
+Los resultados se guardan tal como salen del engine (DataFrame o lista de
+registros) y se sirven por páginas; expiran por TTL y, si se supera el
+límite de entradas o de filas, se desalojan los menos usados (LRU).
+"""
+
+import base64
+import binascii
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from utils.serialization import frame_to_records
+
+MAX_ENTRIES = int(os.getenv("ANALYTICS_RESULT_STORE_MAX_ENTRIES", "64"))
+MAX_ROWS = int(os.getenv("ANALYTICS_RESULT_STORE_MAX_ROWS", "20000000"))
+TTL_SECONDS = float(os.getenv("ANALYTICS_RESULT_TTL_SECONDS", "900"))
+
+Rows = Union[pd.DataFrame, List[Dict[str, Any]]]
+
+
+class StoredResult:
+    __slots__ = ("result_id", "rows", "meta", "created_at", "expires_at")
+
+    def __init__(self, result_id: str, rows: Rows, meta: Dict[str, Any], ttl: float):
+        self.result_id = result_id
+        self.rows = rows
+        self.meta = meta
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        if isinstance(self.rows, pd.DataFrame):
+            return frame_to_records(self.rows.iloc[offset:offset + limit])
+        return self.rows[offset:offset + limit]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "result_id": self.result_id,
+            "row_count": self.row_count,
+            "meta": self.meta,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+
+def encode_cursor(result_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{result_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        result_id, offset = base64.urlsafe_b64decode(padded.encode()).decode().rsplit(":", 1)
+        return result_id, int(offset)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("Cursor inválido.")
+
+
+class ResultStore:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_rows: int = MAX_ROWS, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, rows: Rows, meta: Optional[Dict[str, Any]] = None, ttl: Optional[float] = None, result_id: Optional[str] = None) -> StoredResult:
+        if len(rows) > self.max_rows:
+            raise ValueError(f"El resultado ({len(rows)} filas) excede el máximo almacenable ({self.max_rows}).")
+        entry = StoredResult(result_id or uuid.uuid4().hex, rows, meta or {}, ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[entry.result_id] = entry
+            self._entries.move_to_end(entry.result_id)
+            self._evict()
+        return entry
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            if entry.expires_at < time.time():
+                del self._entries[result_id]
+                return None
+            self._entries.move_to_end(result_id)
+            return entry
+
+    def delete(self, result_id: str) -> bool:
+        with self._lock:
+            return self._entries.pop(result_id, None) is not None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict()
+            return [entry.describe() for entry in self._entries.values()]
+
+    def page(self, result_id: str, offset: int, limit: int) -> Dict[str, Any]:
+        entry = self.get(result_id)
+        if entry is None:
+            raise KeyError(result_id)
+        offset = max(0, offset)
+        rows = entry.page(offset, limit)
+        next_offset = offset + len(rows)
+        return {
+            "result_id": result_id,
+            "row_count": entry.row_count,
+            "offset": offset,
+            "data": rows,
+            "next_cursor": encode_cursor(result_id, next_offset) if next_offset < entry.row_count else None,
+        }
+
+    def _evict(self) -> None:
+        """Debe llamarse con el lock tomado."""
+        now = time.time()
+        for result_id in [rid for rid, e in self._entries.items() if e.expires_at < now]:
+            del self._entries[result_id]
+        total_rows = sum(e.row_count for e in self._entries.values())
+        while self._entries and (len(self._entries) > self.max_entries or total_rows > self.max_rows):
+            _, oldest = self._entries.popitem(last=False)
+            total_rows -= oldest.row_count
+
+
+# Almacén global del proceso
+RESULT_STORE = ResultStore()
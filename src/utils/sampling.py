@@ -0,0 +1,179 @@
+"""
+Muestras reservorio de datasets para respuestas aproximadas.
+
+Una pregunta exploratoria sobre decenas de millones de filas se responde
+dentro de ±1% en milisegundos con una muestra. Las muestras son "bottom-k":
+cada fila recibe una prioridad uniforme en [0, 1) que depende solo de su
+posición y del dataset (splitmix64), y la muestra son las k filas de menor
+prioridad:
+
+- uniforme: las `ANALYTICS_SAMPLE_ROWS` de menor prioridad del dataset;
+- estratificada por una columna: las `ANALYTICS_SAMPLE_PER_STRATUM` de menor
+  prioridad de cada valor (los grupos pequeños quedan completos), más el
+  tamaño real de cada estrato.
+
+Como la prioridad de una fila no cambia, la muestra de un dataset que crece
+se mantiene incremental (solo se procesan las filas nuevas, igual que un
+reservorio) y todos los workers obtienen la misma. Los datasets registrados
+conservan sus muestras por proceso mientras su DataFrame esté adjuntado; los
+datos enviados en el request se muestrean en cada llamada.
+"""
+
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.datasets import DATASETS
+from utils.parsing import TYPED_COLUMNS
+
+SAMPLE_ROWS = int(os.getenv("ANALYTICS_SAMPLE_ROWS", "100000"))
+SAMPLE_PER_STRATUM = int(os.getenv("ANALYTICS_SAMPLE_PER_STRATUM", "2000"))
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def priorities(start: int, stop: int, seed: int = 0) -> np.ndarray:
+    """Prioridad uniforme en [0, 1) de las filas start..stop-1 (splitmix64, determinista)."""
+    z = np.arange(start, stop, dtype=np.uint64) * _GOLDEN + np.uint64(seed)
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def _bottom_k(positions: np.ndarray, prio: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(positions) > k:
+        keep = np.argpartition(prio, k - 1)[:k]
+        positions, prio = positions[keep], prio[keep]
+    order = np.argsort(positions)
+    return positions[order], prio[order]
+
+
+def _bottom_k_per_stratum(positions: np.ndarray, prio: np.ndarray, keys: pd.Series,
+                          m: int) -> Tuple[np.ndarray, np.ndarray, pd.Series]:
+    codes, _ = pd.factorize(keys)
+    order = np.lexsort((prio, codes))
+    sorted_codes = codes[order]
+    # Rango de cada fila dentro de su estrato (ya ordenado por prioridad)
+    starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1) != 0)
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.append(starts, len(order))))
+    keep = np.sort(order[rank < m])
+    return positions[keep], prio[keep], keys.iloc[keep].reset_index(drop=True)
+
+
+class Sample:
+    """Posiciones muestreadas (ascendentes) de las primeras `population` filas de un frame."""
+
+    __slots__ = ("positions", "priorities", "population", "stratify", "keys", "strata")
+
+    def __init__(self, positions: np.ndarray, prio: np.ndarray, population: int,
+                 stratify: Optional[str] = None, keys: Optional[pd.Series] = None,
+                 strata: Optional[pd.Series] = None):
+        self.positions = positions
+        self.priorities = prio
+        self.population = population
+        self.stratify = stratify
+        # Estratificada: valor de la columna en cada fila muestreada y filas por valor en el dataset
+        self.keys = keys
+        self.strata = strata
+
+    @property
+    def exact(self) -> bool:
+        return len(self.positions) == self.population
+
+    def frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.iloc[self.positions]
+
+    def describe(self) -> Dict[str, Any]:
+        info = {
+            "sample_rows": int(len(self.positions)),
+            "population_rows": int(self.population),
+            "method": "stratified" if self.stratify else "uniform",
+        }
+        if self.stratify:
+            info["stratify"] = self.stratify
+            info["strata"] = int(len(self.strata))
+        return info
+
+
+def build_sample(df: pd.DataFrame, stratify: Optional[str] = None, seed: int = 0,
+                 previous: Optional[Sample] = None) -> Sample:
+    """
+    Muestra de `df`. Con `previous` (muestra de las primeras filas del mismo
+    dataset) solo se procesan las filas agregadas después.
+    """
+    start = previous.population if previous is not None else 0
+    positions = np.arange(start, len(df), dtype=np.int64)
+    prio = priorities(start, len(df), seed)
+
+    if stratify is None:
+        if previous is not None:
+            positions = np.concatenate([previous.positions, positions])
+            prio = np.concatenate([previous.priorities, prio])
+        positions, prio = _bottom_k(positions, prio, SAMPLE_ROWS)
+        return Sample(positions, prio, len(df))
+
+    keys = df[stratify].iloc[start:].reset_index(drop=True)
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        # Valores planos: las categorías de cada parte del dataset pueden diferir
+        keys = keys.astype(keys.cat.categories.dtype)
+    # Las filas sin valor en la columna no pertenecen a ningún estrato (groupby las descarta)
+    valid = keys.notna().to_numpy()
+    positions, prio, keys = positions[valid], prio[valid], keys[valid].reset_index(drop=True)
+    strata = keys.value_counts(sort=False)
+    if previous is not None:
+        positions = np.concatenate([previous.positions, positions])
+        prio = np.concatenate([previous.priorities, prio])
+        keys = pd.concat([previous.keys, keys], ignore_index=True)
+        strata = pd.concat([previous.strata, strata]).groupby(level=0, sort=False).sum()
+    positions, prio, keys = _bottom_k_per_stratum(positions, prio, keys, SAMPLE_PER_STRATUM)
+    return Sample(positions, prio, len(df), stratify, keys, strata)
+
+
+class SampleRegistry:
+    """Muestras por dataset registrado (y columna de estratificación), por proceso."""
+
+    def __init__(self):
+        # id del DataFrame adjuntado -> {estratificación: muestra}; dataset_id -> última muestra
+        self._entries: Dict[int, Dict[Optional[str], Sample]] = {}
+        self._latest: Dict[Tuple[str, Optional[str]], Sample] = {}
+        self._lock = threading.RLock()
+
+    def sample(self, df: pd.DataFrame, stratify: Optional[str] = None) -> Sample:
+        columns = [stratify] if stratify else []
+        dataset_id = DATASETS.registered_id(df, columns)
+        if dataset_id is None:
+            return build_sample(df, stratify)
+
+        # Las copias de `build_frame` comparten la muestra de su origen (mismas filas)
+        source = TYPED_COLUMNS.source_of(df)
+        key = id(source)
+        with self._lock:
+            cached = self._entries.get(key, {}).get(stratify)
+            previous = self._latest.get((dataset_id, stratify))
+        if cached is not None and cached.population == len(df):
+            return cached
+        # Dataset que creció (append): se extiende la muestra de sus filas previas
+        if previous is not None and previous.population > len(df):
+            previous = None
+        sample = build_sample(df, stratify, seed=int(dataset_id[:16], 16), previous=previous)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = {}
+                weakref.finalize(source, self._entries.pop, key, None)
+            self._entries[key][stratify] = sample
+            self._latest[(dataset_id, stratify)] = sample
+            # Las muestras de datasets eliminados o expirados ya no se extenderán
+            for stale in [k for k in self._latest if not DATASETS.exists(k[0])]:
+                del self._latest[stale]
+        return sample
+
+
+# Registro global del proceso
+SAMPLES = SampleRegistry()
@@ -0,0 +1,209 @@
+"""
+Scheduler de cómputo: pool dedicado, cola acotada y control de admisión.
+
+Todo el trabajo pesado (pandas, matplotlib, reconciliación) se ejecuta en un
+pool propio de `ANALYTICS_COMPUTE_SLOTS` hilos. Antes de encolar un trabajo
+se estima su costo (filas x peso de la tool, en "filas equivalentes") y si la
+cola ya tiene `ANALYTICS_COMPUTE_MAX_QUEUE` trabajos o excedería
+`ANALYTICS_COMPUTE_MAX_QUEUE_COST`, el trabajo se rechaza de inmediato con
+`ComputeOverloaded` (HTTP 429 + Retry-After) en vez de acumular latencia y
+memoria hasta el OOM.
+
+- Rutas async:  `await COMPUTE.run(fn, tool=..., rows=...)`
+- Rutas sync:   decorador `@scheduled()` (bajo `@instrumented(...)`), que
+                ejecuta el handler completo en el pool.
+
+El contexto (ContextVars) se copia al hilo de cómputo, así que `stage(...)`
+sigue registrando en el request actual. El tiempo en cola se registra en la
+etapa 'queue'.
+"""
+
+import asyncio
+import contextvars
+import functools
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional
+
+from utils.instrumentation import current_timings, count_rows
+from utils.metrics import REGISTRY
+
+SLOTS = int(os.getenv("ANALYTICS_COMPUTE_SLOTS", str(min(4, os.cpu_count() or 1))))
+MAX_QUEUE = int(os.getenv("ANALYTICS_COMPUTE_MAX_QUEUE", "32"))
+MAX_QUEUE_COST = float(os.getenv("ANALYTICS_COMPUTE_MAX_QUEUE_COST", "20000000"))
+MAX_RETRY_AFTER = 60
+# Solo los trabajos grandes alimentan la estimación de segundos por fila
+# (en los pequeños domina el overhead fijo)
+MIN_SAMPLE_COST = 10_000
+
+# Costo = costo fijo + filas x peso, por familia de tool (prefijo del nombre).
+# Los gráficos tienen un costo fijo alto (render), la reconciliación recorre dos datasets.
+TOOL_COSTS = {
+    "analytics_chart": (50_000, 1.0),
+    # Lectura por bloques de archivos: las filas no llegan en el payload
+    "analytics_file": (1_000_000, 1.0),
+    "analytics_reconcile": (0, 2.0),
+    "analytics_transform": (0, 1.5),
+    "analytics_linear": (1_000, 1.0),
+    "analytics_stat": (0, 1.0),
+}
+DEFAULT_COST = (1_000, 1.0)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "analytics_compute_queue_depth", "Trabajos esperando un slot de cómputo.")
+QUEUE_COST = REGISTRY.gauge(
+    "analytics_compute_queue_cost", "Costo estimado (filas equivalentes) de los trabajos en cola.")
+RUNNING = REGISTRY.gauge(
+    "analytics_compute_running", "Trabajos ejecutándose en el pool de cómputo.")
+REJECTED = REGISTRY.counter(
+    "analytics_compute_rejected_total", "Trabajos rechazados por cola llena.", ("tool",))
+QUEUE_WAIT = REGISTRY.histogram(
+    "analytics_compute_queue_wait_seconds", "Tiempo de espera en cola antes de ejecutar.", ("tool",))
+
+
+class ComputeOverloaded(Exception):
+    """La cola de cómputo está llena; el cliente debe reintentar tras `retry_after` segundos."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_cost(tool: str, rows: int) -> float:
+    for prefix, (fixed, per_row) in TOOL_COSTS.items():
+        if tool.startswith(prefix):
+            return fixed + rows * per_row
+    fixed, per_row = DEFAULT_COST
+    return fixed + rows * per_row
+
+
+class ComputeScheduler:
+    def __init__(self, slots: int = SLOTS, max_queue: int = MAX_QUEUE, max_queue_cost: float = MAX_QUEUE_COST):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_queue_cost = max_queue_cost
+        self._executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="analytics-compute")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._queued_cost = 0.0
+        self._running = 0
+        self._running_cost = 0.0
+        self._rejected = 0
+        # Promedio móvil de segundos por unidad de costo, para estimar Retry-After
+        self._seconds_per_unit = 1e-6
+
+    # ------------------------------------------
+    # Admisión
+    # ------------------------------------------
+    def _admit(self, tool: str, cost: float) -> None:
+        with self._lock:
+            queue_full = self._queued >= self.max_queue
+            # Un trabajo caro siempre entra si la cola está vacía (si no, nunca correría)
+            too_costly = self._queued > 0 and self._queued_cost + cost > self.max_queue_cost
+            if (queue_full or too_costly) and self._running >= self.slots:
+                self._rejected += 1
+                retry_after = self._retry_after_locked()
+                REJECTED.inc(tool=tool or "-")
+                raise ComputeOverloaded(
+                    f"Servicio saturado: {self._queued} trabajos en cola "
+                    f"({self._queued_cost:,.0f} filas equivalentes). Reintenta en {retry_after}s.",
+                    retry_after,
+                )
+            self._queued += 1
+            self._queued_cost += cost
+            self._publish_locked()
+
+    def _retry_after_locked(self) -> int:
+        pending = self._queued_cost + self._running_cost
+        seconds = pending * self._seconds_per_unit / self.slots
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(seconds))))
+
+    def _publish_locked(self) -> None:
+        QUEUE_DEPTH.set(self._queued)
+        QUEUE_COST.set(self._queued_cost)
+        RUNNING.set(self._running)
+
+    # ------------------------------------------
+    # Ejecución
+    # ------------------------------------------
+    def submit(self, fn: Callable[..., Any], *args: Any, tool: str = "", rows: int = 0, **kwargs: Any) -> Future:
+        """Admite y encola `fn`; lanza ComputeOverloaded si la cola está llena."""
+        cost = estimate_cost(tool, rows)
+        self._admit(tool, cost)
+        context = contextvars.copy_context()
+        enqueued = perf_counter()
+        try:
+            return self._executor.submit(context.run, self._execute, fn, args, kwargs, tool, cost, enqueued)
+        except RuntimeError:
+            with self._lock:
+                self._queued -= 1
+                self._queued_cost -= cost
+                self._publish_locked()
+            raise
+
+    def _execute(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any], tool: str, cost: float, enqueued: float) -> Any:
+        started = perf_counter()
+        waited = started - enqueued
+        with self._lock:
+            self._queued -= 1
+            self._queued_cost -= cost
+            self._running += 1
+            self._running_cost += cost
+            self._publish_locked()
+        QUEUE_WAIT.observe(waited, tool=tool or "-")
+        timings = current_timings()
+        if timings is not None:
+            timings.add("queue", waited)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._running_cost -= cost
+                if cost >= MIN_SAMPLE_COST:
+                    self._seconds_per_unit = 0.8 * self._seconds_per_unit + 0.2 * (elapsed / cost)
+                self._publish_locked()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, tool: str = "", rows: int = 0, **kwargs: Any) -> Any:
+        """Versión async de `call`: el event loop no se bloquea mientras el trabajo espera."""
+        return await asyncio.wrap_future(self.submit(fn, *args, tool=tool, rows=rows, **kwargs))
+
+    def call(self, fn: Callable[..., Any], *args: Any, tool: str = "", rows: int = 0, **kwargs: Any) -> Any:
+        """Ejecuta `fn` en el pool y espera el resultado (para código síncrono)."""
+        return self.submit(fn, *args, tool=tool, rows=rows, **kwargs).result()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queued": self._queued,
+                "queued_cost": self._queued_cost,
+                "max_queue": self.max_queue,
+                "max_queue_cost": self.max_queue_cost,
+                "rejected_total": self._rejected,
+                "estimated_wait_s": self._retry_after_locked() if self._queued else 0,
+            }
+
+
+# Scheduler global del proceso
+COMPUTE = ComputeScheduler()
+
+
+def scheduled(tool: Optional[str] = None) -> Callable:
+    """
+    Ejecuta un handler síncrono en el pool de cómputo. Sin `tool`, usa la
+    etiqueta que dejó `@instrumented(...)` en el request actual.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = current_timings()
+            name = tool or (timings.tool if timings is not None else "")
+            return COMPUTE.call(func, *args, tool=name, rows=count_rows(*kwargs.values()), **kwargs)
+        return wrapper
+    return decorator
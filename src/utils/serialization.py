@@ -0,0 +1,168 @@
+"""
+Serialización rápida de resultados.
+
+- `frame_to_records`: reemplazo de `df.to_dict(orient="records")` que arma las
+  filas a partir de columnas ya convertidas (`Series.tolist`), varias veces
+  más rápido en frames grandes y con los mismos valores Python.
+- `frame_to_columnar`: forma columnar `{"columns": [...], "data": {col: [...]}}`
+  que evita un dict por fila.
+- `FastJSONResponse`: respuesta JSON codificada con orjson (numpy, NaN/NaT ->
+  null, Timestamps -> ISO 8601) sin pasar por `jsonable_encoder`.
+"""
+
+import datetime
+import decimal
+import json
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from utils.instrumentation import stage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional, con fallback a json estándar
+    orjson = None
+
+OUTPUT_SHAPES = ("records", "columnar")
+
+
+# ==========================================
+# 1. DATAFRAME -> ESTRUCTURAS JSON
+# ==========================================
+def _iso_datetimes(series: pd.Series) -> pd.Series:
+    """Fechas como texto ISO, igual que `Timestamp.isoformat` (el formato de `_default`)."""
+    whole_seconds = series.dt.tz is None and not (series.dt.microsecond.any() or series.dt.nanosecond.any())
+    if whole_seconds:
+        # Camino vectorizado: sin fracción ni zona horaria el ISO es exactamente este formato
+        return series.dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return series.map(lambda value: value.isoformat(), na_action="ignore")
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """Valores de una columna como lista Python, con fechas en ISO y faltantes como None."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return _iso_datetimes(series).astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Equivalente rápido de `df.to_dict(orient="records")`."""
+    columns = list(df.columns)
+    if not columns:
+        return [{} for _ in range(len(df))]
+    # Mismos valores que la forma columnar (fechas en ISO con el mismo formato)
+    values = [_column_values(df.iloc[:, i]) for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def frame_to_columnar(df: pd.DataFrame) -> Dict[str, Any]:
+    """Forma columnar: una lista de valores por columna."""
+    columns = [str(c) for c in df.columns]
+    return {
+        "columns": columns,
+        "row_count": len(df),
+        "data": {name: _column_values(df.iloc[:, i]) for i, name in enumerate(columns)},
+    }
+
+
+def records_to_columnar(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Forma columnar a partir de registros (columnas = unión de llaves, en orden de aparición)."""
+    columns: Dict[str, None] = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    return {
+        "columns": list(columns),
+        "row_count": len(records),
+        "data": {col: [record.get(col) for record in records] for col in columns},
+    }
+
+
+def shape_frame(df: pd.DataFrame, output_shape: str = "records") -> Any:
+    """Convierte el frame resultado de un engine a la forma de salida pedida."""
+    if output_shape == "columnar":
+        return frame_to_columnar(df)
+    if output_shape == "records":
+        return frame_to_records(df)
+    raise ValueError(f"output_shape '{output_shape}' no soportado. Usa: {', '.join(OUTPUT_SHAPES)}.")
+
+
+def shape_records(records: List[Dict[str, Any]], output_shape: str = "records") -> Any:
+    """Igual que `shape_frame` para engines que producen registros directamente."""
+    if output_shape == "columnar":
+        return records_to_columnar(records)
+    if output_shape == "records":
+        return records
+    raise ValueError(f"output_shape '{output_shape}' no soportado. Usa: {', '.join(OUTPUT_SHAPES)}.")
+
+
+# ==========================================
+# 2. CODIFICACIÓN JSON
+# ==========================================
+def _default(obj: Any) -> Any:
+    """Tipos que orjson/json no conocen: escalares numpy/pandas, fechas, decimales."""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return frame_to_records(obj)
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+def _sanitize(obj: Any) -> Any:
+    """Fallback sin orjson: convierte NaN/Inf a None y aplica `_default` recursivamente."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {str(k): _sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_sanitize(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    return _sanitize(_default(obj))
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:  # pragma: no cover
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(_sanitize(obj), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse codificada con orjson; registra el tiempo en la etapa 'serialize'."""
+
+    def render(self, content: Any) -> bytes:
+        with stage("serialize"):
+            return dumps(content)
+
+
+def respond(data: Any = None, error: str = None, status: str = None, status_code: int = 200) -> FastJSONResponse:
+    """Respuesta con la forma de `StandardResponse` (status, data, error) por el camino rápido."""
+    status = status or ("error" if error else "success")
+    return FastJSONResponse({"status": status, "data": data, "error": error}, status_code=status_code)
@@ -0,0 +1,91 @@
+"""
+Respuestas en streaming para resultados grandes.
+
+- NDJSON (`application/x-ndjson`): una línea `{"_meta": {...}}` con el resumen
+  del resultado, una línea por registro y una línea final `{"_end": {"row_count": N}}`
+  que permite al cliente detectar respuestas truncadas.
+- Arrow IPC stream (`application/vnd.apache.arrow.stream`): record batches de
+  `chunk_size` filas; el resumen va en la metadata del schema. Requiere pyarrow.
+
+Los generadores son síncronos: StreamingResponse los consume en el threadpool,
+así que convertir cada bloque no bloquea el event loop.
+"""
+
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+from fastapi.responses import StreamingResponse
+
+from utils.result_store import Rows
+from utils.serialization import dumps, frame_to_records
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+CHUNK_SIZE = int(os.getenv("ANALYTICS_STREAM_CHUNK_SIZE", "5000"))
+STREAM_FORMATS = ("ndjson", "arrow")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def iter_record_chunks(rows: Rows, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Recorre el resultado en bloques de registros sin materializarlo completo."""
+    for start in range(0, len(rows), chunk_size):
+        if isinstance(rows, pd.DataFrame):
+            yield frame_to_records(rows.iloc[start:start + chunk_size])
+        else:
+            yield rows[start:start + chunk_size]
+
+
+def ndjson_stream(rows: Rows, meta: Optional[Dict[str, Any]] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    yield dumps({"_meta": meta or {}}) + b"\n"
+    for chunk in iter_record_chunks(rows, chunk_size):
+        yield b"\n".join(dumps(record) for record in chunk) + b"\n"
+    yield dumps({"_end": {"row_count": len(rows)}}) + b"\n"
+
+
+def arrow_stream(rows: Rows, meta: Optional[Dict[str, Any]] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    if pa is None:
+        raise ValueError("El formato 'arrow' requiere pyarrow instalado.")
+
+    schema = None
+    sink = io.BytesIO()
+    writer = None
+    for start in range(0, max(len(rows), 1), chunk_size):
+        if isinstance(rows, pd.DataFrame):
+            chunk = rows.iloc[start:start + chunk_size]
+        else:
+            chunk = pd.DataFrame(rows[start:start + chunk_size])
+        batch = pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            # El schema del primer bloque fija el de todo el stream
+            schema = batch.schema.with_metadata({"analytics_meta": dumps(meta or {})})
+            batch = batch.replace_schema_metadata(schema.metadata)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(batch)
+        yield _drain(sink)
+    writer.close()
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """Entrega lo escrito hasta ahora y reinicia el buffer."""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def stream_response(rows: Rows, meta: Optional[Dict[str, Any]] = None, fmt: str = "ndjson", chunk_size: int = CHUNK_SIZE) -> StreamingResponse:
+    if fmt == "ndjson":
+        return StreamingResponse(ndjson_stream(rows, meta, chunk_size), media_type=NDJSON_MEDIA_TYPE)
+    if fmt == "arrow":
+        if pa is None:
+            raise ValueError("El formato 'arrow' requiere pyarrow instalado.")
+        return StreamingResponse(arrow_stream(rows, meta, chunk_size), media_type=ARROW_MEDIA_TYPE)
+    raise ValueError(f"Formato de streaming '{fmt}' no soportado. Usa: {', '.join(STREAM_FORMATS)}.")
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Los módulos se importan como en el servicio (src/ en el path) y los datasets van a un directorio temporal
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+os.environ.setdefault("ANALYTICS_DATASET_DIR", tempfile.mkdtemp(prefix="analytics-tests-"))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engines.chunked import file_engine
+from engines.chunked.file_engine import file_reconcile
+from engines.reconcile import reconcile_datasets
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_engine, "DATA_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def test_csv_keys_match_in_memory_shape(data_root):
+    (data_root / "a.csv").write_text("CUFE,valor\n36581,1\n00123,2\n")
+    (data_root / "b.csv").write_text("CUFE,valor\n36581,3\n999,4\n")
+    result = file_reconcile("a.csv", "b.csv", mode="intersection")
+    expected = reconcile_datasets(
+        [{"CUFE": "36581", "valor": 1}, {"CUFE": "00123", "valor": 2}],
+        [{"CUFE": "36581", "valor": 3}, {"CUFE": "999", "valor": 4}],
+        mode="intersection",
+    )
+    assert result["data"] == expected["data"] == [{"CUFE": "36581", "valor": 1}]
+    missing = file_reconcile("a.csv", "b.csv", mode="missing_in_b")
+    assert missing["data"] == [{"CUFE": "00123", "valor": 2}]
+
+
+def test_intersection_confirms_hash_matches(data_root, monkeypatch):
+    # Hash de mala calidad (largo de la clave): 'abc' y 'xyz' colisionan
+    fake_hash = lambda values, categorize=False: np.array([len(v) for v in values], dtype=np.uint64)
+    monkeypatch.setattr(file_engine.pd.util, "hash_array", fake_hash)
+    pd.DataFrame({"CUFE": ["abc", "de"], "valor": [1, 2]}).to_parquet(data_root / "a.parquet")
+    pd.DataFrame({"CUFE": ["xyz", "de"], "valor": [3, 4]}).to_parquet(data_root / "b.parquet")
+    result = file_reconcile("a.parquet", "b.parquet", mode="intersection")
+    assert result["data"] == [{"CUFE": "de", "valor": 2}]
+    assert result["match_count"] == 1
@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from utils import memory_budget
+from utils.memory_budget import MEMORY, Reservation, reserve, track_allocation
+
+ROWS = [{"g": f"c{i % 7}", "v": i * 1.5} for i in range(5000)]
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def request_limit(monkeypatch):
+    """Límite por request que solo superan los frames construidos (no las estimaciones previas)."""
+    monkeypatch.setattr(memory_budget, "BODY_MEMORY_FACTOR", 0)
+    monkeypatch.setattr(memory_budget, "CELL_BYTES", 0)
+    monkeypatch.setattr(MEMORY, "request_limit", 1024)
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    """Proceso sin memoria libre y otro request con memoria reservada."""
+    other = Reservation(MEMORY, "other")
+    other.ensure(1)
+    monkeypatch.setattr(MEMORY, "limit", 1)
+    yield
+    other.release()
+
+
+# ==========================================
+# CÓDIGOS HTTP
+# ==========================================
+def test_route_over_request_budget_is_413(client, request_limit):
+    response = client.post("/stats/mean", json={"data": ROWS, "column": "v"})
+    assert response.status_code == 413
+    assert "ANALYTICS_REQUEST_MEMORY_BYTES" in response.json()["error"]
+
+
+def test_tool_over_request_budget_is_413(client, request_limit):
+    # La tool atrapa Exception: el rechazo no debe quedar como {"status": "error"} con 200
+    response = client.post("/execute", json={"tool_name": "analytics_stat_mean", "payload": {"data": ROWS, "column": "v"}})
+    assert response.status_code == 413
+
+
+def test_streaming_over_request_budget_is_413(client, request_limit):
+    body = {"tool_name": "analytics_transform_top_n", "payload": {"data": ROWS, "column": "v", "n": 3}, "response_mode": "ndjson"}
+    assert client.post("/execute", json=body).status_code == 413
+
+
+def test_overloaded_process_is_429(client, overloaded):
+    response = client.post("/stats/mean", json={"data": ROWS, "column": "v"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_within_budget_is_200(client):
+    response = client.post("/stats/mean", json={"data": ROWS, "column": "v"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+
+
+# ==========================================
+# RESERVAS
+# ==========================================
+def test_allocations_accumulate():
+    with reserve() as reservation:
+        track_allocation(1000)
+        track_allocation(500)
+        assert reservation.nbytes == 1500
+        # Los bloques de un recorrido no se suman entre sí
+        track_allocation(800, transient=True)
+        track_allocation(800, transient=True)
+        assert reservation.nbytes == 2300
+    assert reservation.nbytes == 0
+
+
+def test_streaming_response_releases_after_body(client):
+    body = {"tool_name": "analytics_transform_top_n", "payload": {"data": ROWS, "column": "v", "n": 3}, "response_mode": "ndjson"}
+    response = client.post("/execute", json=body)
+    assert response.status_code == 200
+    assert response.text.count("\n") >= 4
+    assert MEMORY.snapshot()["reserved_bytes"] == 0
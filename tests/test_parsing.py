@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from engines.descriptive.central import get_smart_mean
+from engines.transform.filtering import apply_filter
+from utils import parsing
+from utils.parsing import detect_decimal_separator, parse_numeric
+
+
+# ==========================================
+# SEPARADOR DECIMAL
+# ==========================================
+@pytest.mark.parametrize("values, expected", [
+    (["0.125", "0.250", "0.500"], "."),   # un primer grupo "0" no es de miles
+    (["1,234", "2,500"], "."),            # ambas lecturas posibles: punto decimal por defecto
+    (["1.234.567", "2.000"], ","),        # varios puntos solo pueden ser de miles
+    (["1,234,567", "2,000"], "."),
+    (["1.234,56", "0,5"], ","),
+    (["1,234.56", "0.5"], "."),
+])
+def test_detect_decimal_separator(values, expected):
+    assert detect_decimal_separator(pd.Series(values, dtype="string")) == expected
+
+
+def test_ambiguous_values_follow_the_default():
+    assert detect_decimal_separator(pd.Series(["45.000", "12.500"], dtype="string"), default=",") == ","
+
+
+# ==========================================
+# MONTOS EN PESOS
+# ==========================================
+@pytest.mark.parametrize("values, expected", [
+    (["$45.000", "$12.500", "$7.300"], [45000.0, 12500.0, 7300.0]),
+    (["45.000 COP", "12.500 COP"], [45000.0, 12500.0]),
+    (["$45.000", "$1.250.000"], [45000.0, 1250000.0]),
+    (["$ 1.234,56", "$12.500"], [1234.56, 12500.0]),
+])
+def test_peso_amounts_use_dot_thousands(values, expected):
+    assert parse_numeric(pd.Series(values)).tolist() == expected
+
+
+def test_peso_mean():
+    assert get_smart_mean([{"p": "$45.000"}, {"p": "$12.500"}], "p")["mean"] == 28750.0
+
+
+def test_configured_default_decimal(monkeypatch):
+    monkeypatch.setattr(parsing, "DEFAULT_DECIMAL", ",")
+    assert parse_numeric(pd.Series(["45.000", "12.500"])).tolist() == [45000.0, 12500.0]
+    # Sin marca de pesos, los valores que solo admiten una lectura no cambian
+    assert parse_numeric(pd.Series(["0.125", "0.5"])).tolist() == [0.125, 0.5]
+
+
+def test_leading_zero_decimals_are_not_thousands():
+    parsed = parse_numeric(pd.Series(["0.125", "0.250", "0.500"]))
+    assert parsed.tolist() == [0.125, 0.25, 0.5]
+    assert get_smart_mean([{"p": "0.125"}, {"p": "0.250"}, {"p": "0.500"}], "p")["mean"] == 0.29
+
+
+def test_thousands_only_when_unambiguous():
+    assert parse_numeric(pd.Series(["1.234.567", "2.000"])).tolist() == [1234567.0, 2000.0]
+    assert parse_numeric(pd.Series(["$1.234,56", "2.000"])).tolist() == [1234.56, 2000.0]
+
+
+# ==========================================
+# MISMO TEXTO, MISMO RESULTADO (object o str)
+# ==========================================
+@pytest.mark.parametrize("values", [["1.234", "2.5"], ["$45.000", "$12.500"], ["1.234,5", "2"]])
+def test_text_parses_the_same_for_any_dtype(values):
+    as_object = parse_numeric(pd.Series(values, dtype=object))
+    as_str = parse_numeric(pd.Series(values, dtype="str"))
+    pd.testing.assert_series_equal(as_object, as_str)
+
+
+def test_mixed_object_column():
+    series = pd.Series([True, 2.5, "1.234,5", None, "x", 3], dtype=object)
+    parsed = parse_numeric(series)
+    assert parsed.tolist()[:3] == [1.0, 2.5, 1234.5]
+    assert parsed.isna().tolist()[3:5] == [True, True]
+    assert parsed.iloc[5] == 3.0
+
+
+# ==========================================
+# BOOLS
+# ==========================================
+def test_filter_keeps_bool_column():
+    rows = [{"activo": True, "x": 1}, {"activo": False, "x": 2}]
+    result = apply_filter(rows, "activo", "==", 1)
+    assert result == [{"activo": True, "x": 1}]
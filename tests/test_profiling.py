@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import routes
+from utils import profiling
+
+BODY = {"tool_name": "analytics_stat_mean", "payload": {"data": [{"v": 1}, {"v": 3}], "column": "v"}}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return TestClient(app)
+
+
+def test_admin_endpoints_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", None)
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "secreto")
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "otro"}).status_code == 403
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "secreto"}).status_code == 200
+
+
+def test_profile_header_needs_admin_token(client, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "secreto")
+    response = client.post("/execute", json=BODY, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_reused_request_id_does_not_overwrite(client, monkeypatch):
+    monkeypatch.setattr(routes, "ADMIN_TOKEN", "secreto")
+    headers = {"X-Profile": "1", "X-Admin-Token": "secreto", "X-Request-ID": "reporte-1"}
+    first = client.post("/execute", json=BODY, headers=headers).headers["X-Profile-Id"]
+    second = client.post("/execute", json=BODY, headers=headers).headers["X-Profile-Id"]
+    assert first == "reporte-1"
+    assert second.startswith("reporte-1-") and second != first
+    listed = {entry["request_id"] for entry in client.get("/admin/profiles", headers={"X-Admin-Token": "secreto"}).json()["profiles"]}
+    assert {first, second} <= listed
@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+
+from utils.serialization import dumps, frame_to_columnar, frame_to_records
+
+
+@pytest.mark.parametrize("dates", [
+    pd.to_datetime(["2024-01-31", None]),
+    pd.to_datetime(["2024-01-31 10:00:00.5", None]),
+    pd.to_datetime(["2024-01-31 08:30"]).tz_localize("UTC"),
+])
+def test_datetimes_format_the_same_in_every_shape(dates):
+    df = pd.DataFrame({"d": dates, "v": range(len(dates))})
+    records = [row["d"] for row in frame_to_records(df)]
+    assert records == frame_to_columnar(df)["data"]["d"]
+    # Y como los codifica el encoder genérico (Timestamp.isoformat)
+    assert dumps(records) == dumps(df["d"].tolist())